@@ -0,0 +1,8 @@
+"""
+Benchmarks package initializer.
+
+Purpose:
+- Standalone throughput benchmarks for performance-sensitive helpers.
+- Run from the repository root, e.g.: python -m benchmarks.bench_hashing
+- Not imported by the application; no side-effects at import time.
+"""
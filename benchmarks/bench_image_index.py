@@ -0,0 +1,81 @@
+"""
+Near-duplicate grouping benchmark for image_deduper.
+
+Purpose:
+- Show how HammingIndex-based grouping scales from 10k to 1M synthetic 64-bit perceptual hashes,
+  and check it against the original pairwise scan on the sizes where that is still feasible.
+
+Usage:
+- python -m benchmarks.bench_image_index [--sizes 10000,100000,1000000] [--threshold 5] [--naive-max 20000]
+- About 10% of the synthetic hashes are near-copies of another hash (1-4 bits flipped).
+
+Dependencies:
+- Internal: modules.filesystem.image_deduper
+- External: argparse, random, time
+"""
+
+import argparse
+import random
+import time
+from modules.filesystem.image_deduper import group_near_duplicates
+
+BITS = 64
+
+
+def _synthetic(count: int, seed: int) -> list[int]:
+    rng = random.Random(seed)
+    values: list[int] = []
+    for _ in range(count):
+        if values and rng.random() < 0.1:
+            value = rng.choice(values)
+            for bit in rng.sample(range(BITS), rng.randint(1, 4)):
+                value ^= 1 << bit
+        else:
+            value = rng.getrandbits(BITS)
+        values.append(value)
+    return values
+
+
+def _naive(values: list[int], threshold: int) -> list[list[int]]:
+    used = bytearray(len(values))
+    groups: list[list[int]] = []
+    for i in range(len(values)):
+        if used[i]:
+            continue
+        used[i] = 1
+        group = [i]
+        for j in range(i + 1, len(values)):
+            if not used[j] and (values[i] ^ values[j]).bit_count() <= threshold:
+                used[j] = 1
+                group.append(j)
+        if len(group) > 1:
+            groups.append(group)
+    return groups
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="image_deduper grouping scalability")
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--threshold", type=int, default=5)
+    parser.add_argument("--naive-max", type=int, default=20000, help="largest size to also run the O(n^2) scan on")
+    parser.add_argument("--seed", type=int, default=1)
+    opts = parser.parse_args(argv)
+
+    print(f"threshold={opts.threshold}, {BITS}-bit hashes")
+    print(f"{'hashes':>10} {'groups':>8} {'index_s':>10} {'naive_s':>10} {'match':>6}")
+    for size in [int(s) for s in opts.sizes.split(",") if s]:
+        values = _synthetic(size, opts.seed)
+        start = time.perf_counter()
+        groups = group_near_duplicates(values, BITS, opts.threshold)
+        indexed = time.perf_counter() - start
+        naive_s, match = "-", "-"
+        if size <= opts.naive_max:
+            start = time.perf_counter()
+            expected = _naive(values, opts.threshold)
+            naive_s = f"{time.perf_counter() - start:.2f}"
+            match = "yes" if expected == groups else "NO"
+        print(f"{size:>10} {len(groups):>8} {indexed:>10.2f} {naive_s:>10} {match:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+ZIP archiving throughput benchmark.
+
+Purpose:
+- Compare utils.archive.ZipArchiveWriter (parallel deflate pipeline) against a serial zipfile baseline
+  for increasing worker counts and compression levels on a generated, partly compressible file set.
+
+Usage:
+- python -m benchmarks.bench_zip [--files 16] [--size-mb 16] [--levels 1,6] [--workers 1,2,4] [--repeat 2]
+  [--dir PATH]
+- Results are best-of-N MB/s of input; the per-core column divides by the worker count. The first pass
+  warms the page cache, so numbers reflect compression cost rather than disk speed.
+
+Dependencies:
+- Internal: utils.archive
+- External: argparse, os, random, shutil, tempfile, time, zipfile
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+import zipfile
+from utils.archive import ZipArchiveWriter
+
+
+def _generate(root: str, files: int, size: int) -> list[tuple[str, str, int, int]]:
+    rng = random.Random(0)
+    words = [bytes(rng.choice(b"abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 9))) for _ in range(2000)]
+    text = b" ".join(rng.choice(words) for _ in range(400_000))[:2 * 1024 * 1024]
+    noise = os.urandom(256 * 1024)
+    items = []
+    for i in range(files):
+        p = os.path.join(root, f"bench_{i}.dat")
+        with open(p, "wb") as f:
+            remaining = size
+            while remaining > 0:
+                # Mostly text with some incompressible stretches, like a typical document tree
+                block = text + noise
+                n = min(remaining, len(block))
+                f.write(block[:n])
+                remaining -= n
+        st = os.stat(p)
+        items.append((os.path.basename(p), p, st.st_size, st.st_mtime_ns))
+    return items
+
+
+def _serial(items, out: str, level: int) -> None:
+    method = zipfile.ZIP_DEFLATED if level else zipfile.ZIP_STORED
+    with zipfile.ZipFile(out, "w", compression=method, compresslevel=level or None) as zf:
+        for name, path, _, _ in items:
+            zf.write(path, name)
+
+
+def _parallel(items, out: str, level: int, workers: int) -> None:
+    with ZipArchiveWriter(out, level=level, workers=workers) as writer:
+        writer.add_files(items)
+
+
+def _measure(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Parallel ZIP archiving throughput")
+    parser.add_argument("--files", type=int, default=16)
+    parser.add_argument("--size-mb", type=int, default=16)
+    parser.add_argument("--levels", default="1,6", help="comma-separated zlib levels")
+    parser.add_argument("--workers", default=None, help="comma-separated worker counts (default: 1,2,4..cores)")
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--dir", default=None, help="directory for the generated files (default: temp dir)")
+    opts = parser.parse_args(argv)
+
+    cores = os.cpu_count() or 1
+    if opts.workers:
+        counts = [int(w) for w in opts.workers.split(",")]
+    else:
+        counts = sorted({1, cores} | {n for n in (2, 4, 8, 16, 32) if n < cores})
+    levels = [int(level) for level in opts.levels.split(",")]
+
+    root = tempfile.mkdtemp(prefix="bench_zip_", dir=opts.dir)
+    try:
+        src = os.path.join(root, "src")
+        os.makedirs(src)
+        items = _generate(src, opts.files, opts.size_mb * 1024 * 1024)
+        total_mb = sum(item[2] for item in items) / 1e6
+        out = os.path.join(root, "out.zip")
+        _parallel(items, out, 0, 1)  # warm page cache
+
+        print(f"{opts.files} files x {opts.size_mb} MiB, {cores} core(s), best of {opts.repeat}")
+        print(f"{'level':>5} {'writer':<10} {'workers':>7} {'MB/s':>10} {'MB/s/core':>10} {'ratio':>7}")
+        for level in levels:
+            elapsed = _measure(lambda: _serial(items, out, level), opts.repeat)
+            ratio = total_mb * 1e6 / os.path.getsize(out)
+            print(f"{level:>5} {'zipfile':<10} {1:>7} {total_mb / elapsed:>10.1f} {total_mb / elapsed:>10.1f} "
+                  f"{ratio:>7.2f}")
+            for workers in counts:
+                elapsed = _measure(lambda: _parallel(items, out, level, workers), opts.repeat)
+                ratio = total_mb * 1e6 / os.path.getsize(out)
+                mbps = total_mb / elapsed
+                print(f"{level:>5} {'pipeline':<10} {workers:>7} {mbps:>10.1f} {mbps / min(workers, cores):>10.1f} "
+                      f"{ratio:>7.2f}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,21 +2,247 @@
 Full Backup feature.
 
 Purpose:
-- Create a full copy (optionally compressed) of a source directory.
+- Create a full copy (optionally compressed) of a source directory, or a deduplicated snapshot of it in
+  a backup repository.
 
 API:
 - run(args, ctx) -> dict
-    - args: {"source": str, "dest": str, "compress": bool}
-    - return: {"success": True, "data": {"backup_path": str}, "message": None}
+    - args: {"source": str, "dest": str|None, "compress": bool, "level": int = 6, "repo": str|None,
+             "exclude": list[str]|None, "init": bool = True, "workers": int|None, "readers": int = 2,
+             "check_space": bool = True, "hardlink": bool = False, "io_workers": int|None,
+             "io_order": "auto"|"inode"|"none", "overwrite": bool}
+    - return (dest): {"success": True, "data": {"backup_path": str, "files": int, "bytes": int}, "message": None}
+      (folder copies add "parent", "linked", "copied", "bytes_copied", "methods", "devices")
+      (compress adds "index", "compressed_bytes", "stored", "deflated", "errors", "elapsed", "mb_per_s")
+    - return (repo): {"success": True, "data": {"snapshot": {"id", "time", "source", "parent", "files", "dirs",
+                      "bytes", "new_bytes", "stored_bytes", "elapsed"}, "stats": {...}, "dedup_ratio": float},
+                      "message": None}
 
 Implementation notes:
-- Check disk space before starting.
-- Use utils.file_helpers.safe_copy and zipfile for compression.
+- With `repo`, the source is stored in a deduplicating repository (utils.backup_repo): files are split
+  into content-defined chunks and only chunks the repository does not hold yet are compressed and
+  written. Every file is read (a full backup trusts no metadata), but repeated backups of large, mostly
+  unchanged files cost only the changed regions in space. init=True creates the repository if needed.
+- With `dest`, files are copied with utils.file_helpers.safe_copy into a timestamped folder, or written
+  into a timestamped .zip when compress=True. The archive is built by utils.archive: reader threads feed
+  one deflate worker per core (`workers`) and a single writer appends members in order. `level` is the
+  zlib level (0 stores everything); files that are already compressed (jpg, mp4, zip, gz, ...) are
+  stored as-is. A side index (`<archive>.zip.idx`, see utils.archive) listing every member's offset,
+  sizes and CRC-32 is written next to the archive for random-access restore.
+- Sparse files (VM images, databases) are detected with SEEK_DATA/SEEK_HOLE: archives read only their
+  data extents and record the extent map in the side index, so restore recreates the holes; folder
+  copies copy only the data extents and keep the destination sparse.
+- Folder copies go through FileHelpers.safe_copy, which copies in the kernel (reflink, copy_file_range or
+  sendfile, with a userspace fallback). With hardlink=True the folder becomes a hardlink-forest snapshot
+  (Time Machine / rsync --link-dest style): files whose size and mtime match the previous folder backup
+  of the same source (found through the catalog) are hardlinked to it instead of copied, so each
+  snapshot is a complete tree that costs only the changed files in time and space. If a link cannot be
+  made (other device, link-count limit) the file is copied.
+- Folder copies run through FileHelpers.copy_many on a per-device scheduler (utils.io_scheduler):
+  source files are grouped by device, each device gets its own workers (`io_workers`, default 1 for
+  rotational disks and 4 otherwise) and rotational disks are read in inode order. Per-device files,
+  bytes and MB/s are returned under "devices" and reported as progress events.
+- Each completed copy is added to the snapshot catalog in `dest` (<dest>/catalog.sqlite3,
+  utils.snapshot_catalog) that snapshot_list reads; repository snapshots are cataloged by the repository.
+- Before copying, the free space at `dest` is compared with the total size of the source files that will
+  be written (an archive is never assumed to be smaller than its input; hardlinked files cost nothing);
+  check_space=False skips the check.
 
 Dependencies:
-- Internal: utils.file_helpers, utils.logger
-- External: zipfile, shutil
+- Internal: utils.archive, utils.backup_repo, utils.file_helpers, utils.io_scheduler, utils.logger,
+  utils.progress, utils.snapshot_catalog
+- External: os, shutil, stat, time
 
 Safety:
 - Do not delete source files; confirm before overwriting dest.
+- Hardlinked snapshots share inodes: never edit files inside a snapshot in place, and a file whose content
+  changed while keeping its size and mtime is linked, not copied (the same trade-off as rsync).
 """
+
+import os
+import shutil
+import stat
+import time
+from utils.archive import ZipArchiveWriter, write_index
+from utils.backup_repo import BackupRepository, RepositoryError
+from utils.file_helpers import FileHelpers
+from utils.io_scheduler import IOScheduler
+from utils.logger import get_logger
+from utils.progress import report_progress
+from utils.snapshot_catalog import CATALOG_NAME, SnapshotCatalog
+
+
+def _backup_to_repo(source: str, repo_path: str, args: dict, ctx: dict | None, reuse_unchanged: bool,
+                    feature: str) -> dict:
+    """
+    Add a snapshot of `source` to the repository at `repo_path`; shared with incremental_backup.
+    """
+    repo = None
+    try:
+        if args.get("init", True):
+            repo = BackupRepository.open_or_init(repo_path)
+        else:
+            repo = BackupRepository(repo_path)
+        result = repo.backup(source, exclude=args.get("exclude"), reuse_unchanged=reuse_unchanged,
+                             workers=args.get("workers"),
+                             progress=lambda stats: report_progress(ctx, {"feature": feature, "event": "progress",
+                                                                          **stats}))
+    except (OSError, RepositoryError, ValueError) as exc:
+        return {"success": False, "data": None, "message": f"Backup failed: {exc}"}
+    finally:
+        if repo is not None:
+            repo.close()
+    stats = result.pop("stats")
+    ratio = round(result["bytes"] / result["stored_bytes"], 2) if result["stored_bytes"] else None
+    return {"success": True, "data": {"snapshot": result, "stats": stats, "dedup_ratio": ratio}, "message": None}
+
+
+def _catalog(dest: str, backup_path: str, source: str, started: float, kind: str, files: int, size: int,
+             stored: int, parent: str | None = None) -> None:
+    with SnapshotCatalog(os.path.join(dest, CATALOG_NAME)) as catalog:
+        catalog.add({"id": os.path.basename(backup_path), "time": started, "source": os.path.abspath(source),
+                     "parent": parent, "files": files, "bytes": size, "stored_bytes": stored, "kind": kind,
+                     "location": os.path.abspath(backup_path)})
+
+
+def _previous_folder(dest: str, source: str) -> dict | None:
+    """
+    Catalog row of the newest folder backup of `source` in `dest` that still exists.
+    """
+    catalog = SnapshotCatalog(os.path.join(dest, CATALOG_NAME))
+    if not catalog.exists:
+        return None
+    with catalog:
+        for row in reversed(catalog.query(source=os.path.abspath(source))):
+            if row["kind"] == "folder" and row["location"] and os.path.isdir(row["location"]):
+                return row
+    return None
+
+
+def _link_source(entry, parent_path: str | None, rel: str) -> str | None:
+    """
+    The parent snapshot's copy of `entry` if it is unchanged (same size and mtime), else None.
+    """
+    if parent_path is None:
+        return None
+    candidate = os.path.join(parent_path, rel)
+    try:
+        st = os.lstat(candidate)
+    except OSError:
+        return None
+    if stat.S_ISREG(st.st_mode) and st.st_size == entry.size and st.st_mtime_ns == entry.mtime_ns:
+        return candidate
+    return None
+
+
+def _check_free_space(dest: str, needed: int) -> str | None:
+    free = shutil.disk_usage(dest).free
+    if free < needed:
+        return f"Not enough free space in {dest}: {needed} bytes needed, {free} available"
+    return None
+
+
+def _backup_to_dest(helpers: FileHelpers, source: str, dest: str, args: dict, ctx: dict | None) -> dict:
+    logger = get_logger(__name__)
+    compress = bool(args.get("compress", False))
+    overwrite = bool(args.get("overwrite", False))
+    started = time.time()
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(started))
+    name = f"{os.path.basename(source.rstrip(os.sep)) or 'backup'}-{stamp}"
+    backup_path = os.path.join(dest, name + (".zip" if compress else ""))
+    if os.path.exists(backup_path) and not overwrite:
+        return {"success": False, "data": None, "message": f"Destination exists: {backup_path}"}
+    os.makedirs(dest, exist_ok=True)
+    entries = list(helpers.scan_entries(source, exclude=args.get("exclude"), sort=True))
+    size = sum(entry.size for entry in entries)
+    parent = _previous_folder(dest, source) if args.get("hardlink") and not compress else None
+    if parent is not None and parent["location"] == os.path.abspath(backup_path):
+        parent = None
+    parent_path = parent["location"] if parent else None
+    plan = []
+    for entry in entries:
+        rel = os.path.relpath(entry.path, source)
+        plan.append((entry, rel, _link_source(entry, parent_path, rel)))
+    if args.get("check_space", True):
+        message = _check_free_space(dest, sum(entry.size for entry, _, link in plan if link is None))
+        if message:
+            return {"success": False, "data": None, "message": message}
+    if compress:
+        writer = ZipArchiveWriter(backup_path, level=int(args.get("level", 6)), workers=args.get("workers"),
+                                  readers=int(args.get("readers", 2)))
+        try:
+            writer.add_files((os.path.relpath(entry.path, source), entry.path, entry.size, entry.mtime_ns)
+                             for entry in entries)
+            members = writer.close()
+            index = write_index(backup_path, members, source=os.path.abspath(source))
+        except BaseException:
+            writer.abort()
+            raise
+        stats = writer.stats
+        for error in stats["errors"]:
+            logger.warning(f"Skipped {error['path']}: {error['error']}")
+        elapsed = stats["elapsed"]
+        data = {"backup_path": backup_path, "index": index, "files": stats["files"], "bytes": stats["bytes_in"],
+                "compressed_bytes": stats["bytes_out"], "stored": stats["stored"], "deflated": stats["deflated"],
+                "errors": stats["errors"], "elapsed": round(elapsed, 3),
+                "mb_per_s": round(stats["bytes_in"] / elapsed / 1e6, 1) if elapsed else None}
+        report_progress(ctx, {"feature": "full_backup", "event": "archived", "path": backup_path,
+                              "files": data["files"], "mb_per_s": data["mb_per_s"]})
+        _catalog(dest, backup_path, source, started, "archive", data["files"], data["bytes"],
+                 data["compressed_bytes"])
+        return {"success": True, "data": data, "message": None}
+    stats = {"linked": 0, "copied": 0, "bytes_copied": 0, "methods": {}}
+    copies = []
+    for entry, rel, link in plan:
+        dst = os.path.join(backup_path, rel)
+        if link is not None:
+            try:
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                if overwrite and os.path.lexists(dst):
+                    os.remove(dst)
+                os.link(link, dst)
+                stats["linked"] += 1
+                continue
+            except OSError as exc:
+                logger.debug(f"Cannot hardlink {rel}, copying instead: {exc}")
+        copies.append((entry, dst))
+    scheduler = IOScheduler(workers_per_device=args.get("io_workers"), order=args.get("io_order", "auto"))
+    failed = []
+    for entry, _, res in helpers.copy_many(copies, overwrite=overwrite, scheduler=scheduler):
+        if isinstance(res, Exception) or not res.get("success"):
+            failed.append(f"{entry.path}: {res if isinstance(res, Exception) else res.get('message')}")
+            continue
+        stats["copied"] += 1
+        stats["bytes_copied"] += entry.size
+        stats["methods"][res["method"]] = stats["methods"].get(res["method"], 0) + 1
+    stats["devices"] = scheduler.stats()
+    for device, row in stats["devices"].items():
+        report_progress(ctx, {"feature": "full_backup", "event": "device", "device": device, **row})
+    if failed:
+        return {"success": False, "data": None, "message": f"{len(failed)} file(s) failed, first: {failed[0]}"}
+    parent_id = parent["id"] if parent else None
+    _catalog(dest, backup_path, source, started, "folder", len(entries), size, stats["bytes_copied"], parent_id)
+    return {"success": True, "data": {"backup_path": backup_path, "files": len(entries), "bytes": size,
+                                      "parent": parent_id, **stats}, "message": None}
+
+
+def run(args: dict | None = None, ctx: dict | None = None) -> dict:
+    logger = get_logger(__name__)
+    helpers = FileHelpers()
+
+    args = args or {}
+    source = args.get("source")
+    dest = args.get("dest")
+    repo = args.get("repo")
+
+    if not source or not os.path.isdir(source):
+        return {"success": False, "data": None, "message": f"Invalid source directory: {source}"}
+    if repo:
+        logger.info(f"Backing up {source} to repository {repo}")
+        return _backup_to_repo(source, repo, args, ctx, reuse_unchanged=False, feature="full_backup")
+    if not dest:
+        return {"success": False, "data": None, "message": "dest or repo is required"}
+    try:
+        return _backup_to_dest(helpers, source, dest, args, ctx)
+    except OSError as exc:
+        return {"success": False, "data": None, "message": f"Backup failed: {exc}"}
@@ -6,13 +6,166 @@ Purpose:
 
 API:
 - run(args, ctx) -> dict
-    - args: {"source": str, "dest": str, "manifest": str|null}
-    - return: {"success": True, "data": {"copied": [...]} , "message": None}
+    - args: {"source": str, "dest": str|None, "manifest": str|null, "repo": str|None, "exclude": list[str]|None,
+             "algorithm": str = "sha256", "delta": bool = True, "inplace": bool = True,
+             "min_delta_size": int = 65536, "verify": bool = False, "init": bool = True, "workers": int|None}
+    - return (dest): {"success": True, "data": {"copied": [{"path", "mode", "size", "bytes_written", "bytes_saved"}],
+                      "summary": {"files", "unchanged", "copied", "delta", "missing", "errors", "bytes",
+                      "bytes_written", "bytes_saved"}, "manifest": str}, "message": None}
+    - return (repo): {"success": True, "data": {"snapshot": {...}, "stats": {...}, "dedup_ratio": float},
+                      "message": None}
 
 Implementation notes:
-- Use file_integrity-like hashing to detect changed files.
-- Save updated manifest via ctx["config_manager"].
+- With `dest`, the destination is a mirror of the source. The previous run's checksum manifest
+  (utils.manifest; by default one per destination under config/backup_manifests/, or `manifest`) is
+  merged with a sorted walk of the source: files whose size and mtime match the manifest and whose
+  mirror copy still has that size are skipped without being read.
+- Changed files that already exist in the mirror are updated by rsync-style delta (utils.delta): the old
+  copy's block signatures (Adler-32 weak, BLAKE2b strong) are matched against the new file with a
+  rolling checksum and only the changed blocks are written; in-place edits and appends patch the mirror
+  copy directly (inplace=True), shifted content rebuilds it under a temporary name. Per-file bytes
+  saved are reported. Files smaller than min_delta_size, new files, or delta=False are copied whole.
+- Whole-file copies go through FileHelpers.copy_hashed: the source is read once, each buffer is hashed
+  and written, and the digest goes straight into the new manifest. verify=True re-reads every written
+  mirror file from disk (O_DIRECT where available) and compares it with the source digest; a mismatch
+  counts as an error and the file is left out of the manifest.
+- The manifest is rewritten with the new digests during the run (the delta pass computes them too).
+- With `repo`, a snapshot is added to the deduplicating repository (utils.backup_repo) with the latest
+  snapshot of the same source as parent: files whose size, mtime and inode are unchanged reuse the
+  parent's chunk list without being read, changed files are re-chunked and only their new chunks are
+  stored. The result is a complete snapshot that restores on its own.
 
 Dependencies:
-- Internal: utils.file_helpers, utils.config_manager, utils.logger
+- Internal: modules.backup.full_backup (repository snapshots), utils.delta, utils.manifest, utils.file_helpers, utils.constants, utils.logger,
+  utils.progress
+- External: hashlib, os, shutil
+
+Safety:
+- Never deletes or modifies the source. Files missing from the source stay in the mirror (counted as missing).
+- An interrupted in-place update leaves that mirror file partially updated; it is not in the new manifest,
+  so the next run re-syncs it.
 """
+
+import hashlib
+import os
+import shutil
+from modules.backup.full_backup import _backup_to_repo
+from utils.constants import Constants
+from utils.delta import sync_file
+from utils.file_helpers import FileHelpers, resolve_algorithm
+from utils.logger import get_logger
+from utils.manifest import ManifestWriter, merge_walk, open_manifest
+from utils.progress import report_progress
+
+DEFAULT_MIN_DELTA_SIZE = 64 * 1024
+# Per-file rows kept in the result; the summary still counts every file
+_MAX_FILES_REPORTED = 1000
+
+
+def _manifest_path(dest: str) -> str:
+    digest = hashlib.sha1(os.path.normcase(os.path.abspath(dest)).encode("utf-8")).hexdigest()
+    return os.path.join(Constants.BACKUP_MANIFEST_DIR, f"{digest}.jsonl")
+
+
+def _sync_file(helpers: FileHelpers, entry, rel: str, dest_path: str, writer: ManifestWriter, algorithm: str,
+               use_delta: bool, inplace: bool, min_delta_size: int, verify: bool) -> dict:
+    try:
+        dest_size = os.path.getsize(dest_path)
+    except OSError:
+        dest_size = None
+    if use_delta and dest_size and entry.size >= min_delta_size:
+        result = sync_file(entry.path, dest_path, algorithm=algorithm, inplace=inplace)
+        shutil.copystat(entry.path, dest_path)
+        verified = not verify or result["mode"] == "unchanged"
+        if not verified and helpers.read_back_hash(dest_path, algorithm) != result["digest"]:
+            raise OSError(f"Verification failed for {dest_path}")
+        writer.write(rel, entry.size, entry.mtime_ns, result["digest"])
+        mode = "unchanged" if result["mode"] == "unchanged" else "delta"
+        return {"mode": mode, "size": entry.size, "bytes_written": result["bytes_written"],
+                "bytes_saved": result["bytes_saved"]}
+    result = helpers.copy_hashed(entry.path, dest_path, algorithm=algorithm, verify=verify, manifest=writer, rel=rel)
+    return {"mode": "copied", "size": result["size"], "bytes_written": result["size"], "bytes_saved": 0}
+
+
+def _backup_to_dest(helpers: FileHelpers, source: str, dest: str, args: dict, ctx: dict | None) -> dict:
+    logger = get_logger(__name__)
+    source = os.path.abspath(source)
+    manifest_path = args.get("manifest") or _manifest_path(dest)
+    use_delta = bool(args.get("delta", True))
+    inplace = bool(args.get("inplace", True))
+    min_delta_size = int(args.get("min_delta_size", DEFAULT_MIN_DELTA_SIZE))
+    verify = bool(args.get("verify", False))
+    algorithm = args.get("algorithm")
+
+    previous = open_manifest(manifest_path) if os.path.exists(manifest_path) else None
+    if previous is not None and algorithm and resolve_algorithm(algorithm) != previous.algorithm:
+        # Digests in another algorithm cannot be compared; fall back to metadata + full re-sync
+        logger.info(f"Manifest algorithm {previous.algorithm} differs from {algorithm}; ignoring stored digests")
+        previous.close()
+        previous = None
+    algorithm = resolve_algorithm(algorithm or (previous.algorithm if previous is not None else "sha256"))
+
+    summary = {"files": 0, "unchanged": 0, "copied": 0, "delta": 0, "missing": 0, "errors": 0, "bytes": 0,
+               "bytes_written": 0, "bytes_saved": 0}
+    copied = []
+    os.makedirs(dest, exist_ok=True)
+    try:
+        with ManifestWriter(manifest_path, algorithm, root=source) as writer:
+            records = previous if previous is not None else ()
+            entries = helpers.scan_entries(source, exclude=args.get("exclude"), sort=True)
+            for rel, record, entry in merge_walk(records, entries, source):
+                if entry is None:
+                    summary["missing"] += 1
+                    continue
+                summary["files"] += 1
+                summary["bytes"] += entry.size
+                dest_path = os.path.join(dest, *rel.split("/"))
+                if (record is not None and record.size == entry.size and record.mtime_ns == entry.mtime_ns
+                        and os.path.isfile(dest_path) and os.path.getsize(dest_path) == entry.size):
+                    summary["unchanged"] += 1
+                    summary["bytes_saved"] += entry.size
+                    writer.write(rel, entry.size, entry.mtime_ns, record.hash)
+                    continue
+                try:
+                    row = _sync_file(helpers, entry, rel, dest_path, writer, algorithm, use_delta, inplace,
+                                     min_delta_size, verify)
+                except OSError as exc:
+                    logger.warning(f"Cannot back up {entry.path}: {exc}")
+                    summary["errors"] += 1
+                    continue
+                summary[row["mode"]] += 1
+                summary["bytes_written"] += row["bytes_written"]
+                summary["bytes_saved"] += row["bytes_saved"]
+                if row["mode"] != "unchanged" and len(copied) < _MAX_FILES_REPORTED:
+                    copied.append({"path": rel, **row})
+                    report_progress(ctx, {"feature": "incremental_backup", "event": "file", "path": rel, **row})
+    finally:
+        if previous is not None:
+            previous.close()
+    return {"success": True, "data": {"copied": copied, "summary": summary, "manifest": manifest_path},
+            "message": None}
+
+
+def run(args: dict | None = None, ctx: dict | None = None) -> dict:
+    logger = get_logger(__name__)
+    helpers = FileHelpers()
+
+    args = args or {}
+    source = args.get("source")
+    dest = args.get("dest")
+    repo_path = args.get("repo")
+
+    if not source or not os.path.isdir(source):
+        return {"success": False, "data": None, "message": f"Invalid source directory: {source}"}
+    if repo_path:
+        logger.info(f"Incremental backup of {source} to repository {repo_path}")
+        return _backup_to_repo(source, repo_path, args, ctx, reuse_unchanged=True, feature="incremental_backup")
+    if not dest:
+        return {"success": False, "data": None, "message": "dest or repo is required"}
+    if os.path.abspath(dest).startswith(os.path.abspath(source).rstrip(os.sep) + os.sep):
+        return {"success": False, "data": None, "message": "dest must not be inside source"}
+    logger.info(f"Incremental backup of {source} to {dest}")
+    try:
+        return _backup_to_dest(helpers, source, dest, args, ctx)
+    except (OSError, ValueError) as exc:
+        return {"success": False, "data": None, "message": f"Backup failed: {exc}"}
@@ -6,13 +6,103 @@ Purpose:
 
 API:
 - run(args, ctx) -> dict
-    - args: {"backup_path": str, "restore_to": str, "preview": bool}
-    - return: {"success": True, "data": {"restored": [...]} , "message": None}
+    - args: {"repo": str, "archive": str, "snapshot": str = "latest", "restore_to": str, "preview": bool,
+             "paths": list[str]|None, "overwrite": bool, "workers": int|None}
+    - return: {"success": True, "data": {"restored": [...], "skipped": [...], "failed": [...], "bytes": int,
+               "snapshot": str}, "message": None}
+    - preview: {"success": True, "data": {"snapshot": str, "entries": [{"path", "type", "size", "mtime"}]},
+               "message": None}
 
 Implementation notes:
-- Provide dry-run preview and confirm step.
-- Use safe move/copy helpers.
+- Snapshots come from a deduplicating repository (utils.backup_repo); `paths` limits the restore (or
+  preview) to files and directory prefixes relative to the snapshot root.
+- Every chunk is verified against its digest while restoring; files are written under a temporary name
+  and renamed into place, then directory permissions and mtimes are applied.
+- `archive` (or a `backup_path` that is a file) restores from a full_backup .zip through its side index
+  (utils.archive): `paths` are found by binary search in the sorted index and extracted by seeking
+  straight to their data, so restoring one file costs a few index reads plus that member; a full restore
+  extracts members in parallel (`workers`) in archive order through the per-device scheduler and adds
+  per-device throughput under "devices". Preview reads only the index. A missing or stale index is
+  rebuilt from the archive's central directory first. Every member's CRC-32 is checked. Members backed
+  up from sparse files (an extent map in the index) are restored sparse.
+- Existing files are skipped unless overwrite is set.
 
 Dependencies:
-- Internal: utils.file_helpers, utils.logger
+- Internal: utils.archive, utils.backup_repo, utils.logger, utils.progress
+- External: os, zipfile
 """
+
+import os
+import zipfile
+from utils.archive import extract, load_index
+from utils.backup_repo import BackupRepository, RepositoryError
+from utils.logger import get_logger
+from utils.progress import report_progress
+
+
+def _restore_archive(archive_path: str, args: dict, ctx: dict | None) -> dict:
+    with load_index(archive_path) as index:
+        members = index.select(args.get("paths"))
+    if args.get("preview", False):
+        entries = [{"path": m.name, "type": "file", "size": m.size, "mtime": m.mtime_ns // 1_000_000_000}
+                   for m in members]
+        return {"success": True, "data": {"snapshot": archive_path, "entries": entries}, "message": None}
+    restore_to = args.get("restore_to")
+    if not restore_to:
+        return {"success": False, "data": None, "message": "restore_to is required"}
+    result = extract(archive_path, members, restore_to, overwrite=bool(args.get("overwrite", False)),
+                     workers=args.get("workers"),
+                     progress=lambda event: report_progress(ctx, {"feature": "restore", "event": "progress",
+                                                                  **event}))
+    return {"success": True, "data": {"snapshot": archive_path, **result}, "message": None}
+
+
+def run(args: dict | None = None, ctx: dict | None = None) -> dict:
+    logger = get_logger(__name__)
+
+    args = args or {}
+    archive_path = args.get("archive")
+    if not archive_path and os.path.isfile(args.get("backup_path") or ""):
+        archive_path = args["backup_path"]
+    if archive_path:
+        try:
+            result = _restore_archive(archive_path, args, ctx)
+        except (OSError, ValueError, zipfile.BadZipFile) as exc:
+            logger.error(f"Restore failed: {exc}")
+            return {"success": False, "data": None, "message": f"Restore failed: {exc}"}
+        if result["success"] and result["data"].get("failed"):
+            logger.warning(f"{len(result['data']['failed'])} item(s) failed to restore")
+        return result
+
+    repo_path = args.get("repo") or args.get("backup_path")
+    snapshot_id = args.get("snapshot", "latest")
+    restore_to = args.get("restore_to")
+    paths = args.get("paths")
+    preview = bool(args.get("preview", False))
+
+    if not repo_path or not os.path.isdir(repo_path):
+        return {"success": False, "data": None, "message": f"Invalid repository: {repo_path}"}
+    repo = None
+    try:
+        repo = BackupRepository(repo_path)
+        if preview:
+            snapshot = repo.load_snapshot(snapshot_id)
+            prefixes = [p.replace(os.sep, "/").strip("/") for p in paths or []]
+            entries = [{"path": e.path, "type": e.type, "size": e.size, "mtime": e.mtime_ns // 1_000_000_000}
+                       for e in repo.iter_tree(snapshot["id"])
+                       if not prefixes or any(e.path == p or e.path.startswith(p + "/") for p in prefixes)]
+            return {"success": True, "data": {"snapshot": snapshot["id"], "entries": entries}, "message": None}
+        if not restore_to:
+            return {"success": False, "data": None, "message": "restore_to is required"}
+        result = repo.restore(snapshot_id, restore_to, paths=paths, overwrite=bool(args.get("overwrite", False)),
+                              progress=lambda event: report_progress(ctx, {"feature": "restore", "event": "progress",
+                                                                           **event}))
+    except (OSError, RepositoryError) as exc:
+        logger.error(f"Restore failed: {exc}")
+        return {"success": False, "data": None, "message": f"Restore failed: {exc}"}
+    finally:
+        if repo is not None:
+            repo.close()
+    if result["failed"]:
+        logger.warning(f"{len(result['failed'])} item(s) failed to restore")
+    return {"success": True, "data": result, "message": None}
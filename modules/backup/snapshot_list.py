@@ -6,9 +6,83 @@ Purpose:
 
 API:
 - run(args, ctx) -> dict
-    - args: {"repo": str}
-    - return: {"success": True, "data": [{"backup_path":..., "timestamp":...}], "message": None}
+    - args: {"action": "list"|"rebuild_catalog" = "list", "repo": str|None, "dest": str|None,
+             "source": str|None, "since": float|str|None, "until": float|str|None, "limit": int|None}
+    - return (list): {"success": True, "data": [{"id", "timestamp", "source", "parent", "files", "dirs", "bytes",
+                      "new_bytes", "stored_bytes", "kind", "location"}], "message": None}
+    - return (rebuild_catalog): {"success": True, "data": {"catalog": str, "snapshots": int}, "message": None}
 
 Implementation notes:
-- Read backup folder structures and parse timestamps.
+- Listings come from the snapshot catalog (utils.snapshot_catalog), a SQLite table indexed by time and
+  source that every backup adds its row to on completion: `repo` reads the repository's catalog,
+  `dest` the catalog full_backup keeps next to its timestamped copies. No backup folder is walked.
+- `since`/`until` bound the snapshot time (epoch seconds or ISO-8601, e.g. "2026-03-01T00:00"),
+  `source` keeps only snapshots of that source directory and `limit` keeps the newest N; results are
+  oldest first.
+- rebuild_catalog recreates the catalog from the backups themselves: repository snapshot metadata files,
+  or the folders/archives in `dest` (archives through their side index). Use it after the catalog is
+  lost or snapshots were added or removed by hand.
+
+Dependencies:
+- Internal: utils.backup_repo, utils.snapshot_catalog, utils.logger
+- External: os, sqlite3
 """
+
+import os
+import sqlite3
+from utils.backup_repo import BackupRepository, RepositoryError
+from utils.logger import get_logger
+from utils.snapshot_catalog import CATALOG_NAME, SnapshotCatalog, scan_backup_dir
+
+
+def _query(catalog: SnapshotCatalog, args: dict) -> list[dict]:
+    source = args.get("source")
+    rows = catalog.query(source=os.path.abspath(source) if source else None, since=args.get("since"),
+                         until=args.get("until"), limit=args.get("limit"))
+    return [{"id": s["id"], "timestamp": s["time"], "source": s["source"], "parent": s["parent"],
+             "files": s["files"], "dirs": s["dirs"], "bytes": s["bytes"], "new_bytes": s["new_bytes"],
+             "stored_bytes": s["stored_bytes"], "kind": s["kind"], "location": s["location"]} for s in rows]
+
+
+def _run_repo(repo_path: str, action: str, args: dict) -> dict:
+    repo = BackupRepository(repo_path)
+    try:
+        if action == "rebuild_catalog":
+            count = repo.rebuild_catalog()
+            return {"success": True, "data": {"catalog": repo.catalog().path, "snapshots": count}, "message": None}
+        return {"success": True, "data": _query(repo.catalog(), args), "message": None}
+    finally:
+        repo.close()
+
+
+def _run_dest(dest: str, action: str, args: dict) -> dict:
+    logger = get_logger(__name__)
+    with SnapshotCatalog(os.path.join(dest, CATALOG_NAME)) as catalog:
+        if action == "rebuild_catalog" or not catalog.exists:
+            count = catalog.rebuild(scan_backup_dir(dest))
+            logger.info(f"Catalog of {dest} rebuilt with {count} backup(s)")
+            if action == "rebuild_catalog":
+                return {"success": True, "data": {"catalog": catalog.path, "snapshots": count}, "message": None}
+        return {"success": True, "data": _query(catalog, args), "message": None}
+
+
+def run(args: dict | None = None, ctx: dict | None = None) -> dict:
+    logger = get_logger(__name__)
+
+    args = args or {}
+    action = args.get("action", "list")
+    repo_path = args.get("repo")
+    dest = args.get("dest")
+
+    if action not in ("list", "rebuild_catalog"):
+        return {"success": False, "data": None, "message": f"Unsupported action: {action}"}
+    target = repo_path or dest
+    if not target or not os.path.isdir(target):
+        return {"success": False, "data": None, "message": f"Invalid repository: {target}"}
+    try:
+        if repo_path:
+            return _run_repo(repo_path, action, args)
+        return _run_dest(dest, action, args)
+    except (OSError, RepositoryError, ValueError, sqlite3.Error) as exc:
+        logger.error(f"Cannot list snapshots in {target}: {exc}")
+        return {"success": False, "data": None, "message": str(exc)}
@@ -0,0 +1,48 @@
+"""
+Shared pytest setup for the backup package tests.
+
+Purpose:
+- Make the repository root importable (utils.*, modules.*) when pytest is run from any directory.
+- make_sparse: build sparse test files for the extent-aware copy, archive and restore paths.
+"""
+
+import os
+import sys
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+SPARSE_SIZE = 32 * 1024 * 1024
+# (offset, data) regions written into an otherwise empty (all-hole) file
+SPARSE_LAYOUT = [(0, b"head" * 1024), (8 * 1024 * 1024 + 123, b"middle" * 5000),
+                 (SPARSE_SIZE - 4096, b"t" * 4096)]
+
+
+def allocated(path):
+    return os.stat(path).st_blocks * 512
+
+
+@pytest.fixture
+def make_sparse():
+    """
+    Factory writing a 32 MiB file with three small data regions; returns its full contents.
+    Skips the test when the filesystem does not keep holes or cannot report them (SEEK_DATA).
+    """
+    def _make(path):
+        if not hasattr(os, "SEEK_DATA") or not hasattr(os.stat_result, "st_blocks"):
+            pytest.skip("SEEK_DATA/SEEK_HOLE not available")
+        content = bytearray(SPARSE_SIZE)
+        with open(path, "wb") as f:
+            for offset, data in SPARSE_LAYOUT:
+                f.seek(offset)
+                f.write(data)
+                content[offset:offset + len(data)] = data
+            f.truncate(SPARSE_SIZE)
+        if allocated(path) >= SPARSE_SIZE // 2:
+            pytest.skip("filesystem does not keep sparse files sparse")
+        return bytes(content)
+
+    return _make
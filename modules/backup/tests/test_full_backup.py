@@ -0,0 +1,197 @@
+"""
+Unit tests for modules.backup.full_backup and its parallel ZIP pipeline (utils.archive).
+
+Purpose:
+- Round-trip files of every shape (empty, multi-block, incompressible, already-compressed extensions)
+  through ZipArchiveWriter with one and several deflate workers, and read the result back with zipfile.
+- Run full_backup with compress=True and check the archive against the source tree.
+- Take hardlink-forest folder snapshots (hardlink=True) and check that unchanged files share inodes with
+  the parent snapshot found through the catalog, while changed, new and deleted files do not.
+- Copy and archive sparse files: only data extents are read and written, holes stay holes.
+- Run the per-device I/O scheduler (utils.io_scheduler) without os.major/os.minor, as on Windows.
+"""
+
+import os
+import random
+import zipfile
+import pytest
+from modules.backup import full_backup, restore
+from modules.backup.tests.conftest import SPARSE_SIZE, allocated
+from utils.archive import ZIP_DEFLATED, ZIP_STORED, ZipArchiveWriter
+from utils.file_helpers import FileHelpers
+from utils.io_scheduler import IOScheduler
+
+BLOCK = 64 * 1024
+
+
+def _files(root):
+    rng = random.Random(0)
+    text = b" ".join(rng.choice([b"alpha", b"beta", b"gamma", b"delta"]) for _ in range(200_000))
+    files = {
+        "empty.txt": b"",
+        "small.txt": b"hello",
+        "text/multi_block.txt": text[:5 * BLOCK + 123],
+        "text/exact_blocks.txt": text[:3 * BLOCK],
+        "noise.bin": rng.randbytes(2 * BLOCK + 7),
+        "photo.jpg": rng.randbytes(BLOCK // 2),
+        "nested/deeper/unicode-é.txt": "ünïcödé".encode(),
+    }
+    for rel, data in files.items():
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    return files
+
+
+def _items(root, files):
+    for rel in sorted(files):
+        st = os.stat(root / rel)
+        yield rel, str(root / rel), st.st_size, st.st_mtime_ns
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+@pytest.mark.parametrize("level", [0, 1, 6])
+def test_parallel_deflate_round_trip(tmp_path, workers, level):
+    src = tmp_path / "src"
+    files = _files(src)
+    out = tmp_path / "out.zip"
+    writer = ZipArchiveWriter(str(out), level=level, workers=workers, block_size=BLOCK)
+    writer.add_files(_items(src, files))
+    members = writer.close()
+    assert [m.name for m in members] == sorted(files)
+    assert writer.stats["files"] == len(files) and writer.stats["errors"] == []
+    with zipfile.ZipFile(out) as zf:
+        assert zf.testzip() is None
+        assert {name: zf.read(name) for name in zf.namelist()} == files
+        methods = {info.filename: info.compress_type for info in zf.infolist()}
+    assert methods["photo.jpg"] == ZIP_STORED
+    assert methods["text/multi_block.txt"] == (ZIP_DEFLATED if level else ZIP_STORED)
+    if level:
+        assert os.path.getsize(out) < sum(len(d) for d in files.values())
+
+
+def test_unreadable_member_is_dropped(tmp_path):
+    src = tmp_path / "src"
+    files = _files(src)
+    items = list(_items(src, files))
+    items.insert(1, ("gone.txt", str(src / "gone.txt"), 10, 0))
+    with ZipArchiveWriter(str(tmp_path / "out.zip"), workers=2, block_size=BLOCK) as writer:
+        writer.add_files(items)
+    assert [e["path"] for e in writer.stats["errors"]] == [str(src / "gone.txt")]
+    with zipfile.ZipFile(tmp_path / "out.zip") as zf:
+        assert zf.testzip() is None
+        assert sorted(zf.namelist()) == sorted(files)
+
+
+def test_compressed_full_backup(tmp_path):
+    src, dest = tmp_path / "src", tmp_path / "dest"
+    files = _files(src)
+    result = full_backup.run({"source": str(src), "dest": str(dest), "compress": True, "workers": 3})
+    assert result["success"], result["message"]
+    data = result["data"]
+    assert data["files"] == len(files) and data["bytes"] == sum(len(d) for d in files.values())
+    assert os.path.exists(data["index"])
+    with zipfile.ZipFile(data["backup_path"]) as zf:
+        assert {name: zf.read(name) for name in zf.namelist()} == files
+
+
+def _snapshot(src, dest, monkeypatch, offset):
+    # Snapshot folders are named to the second: shift the clock so back-to-back runs get distinct names
+    real_time = full_backup.time.time
+    with monkeypatch.context() as patch:
+        patch.setattr(full_backup.time, "time", lambda: real_time() + offset)
+        result = full_backup.run({"source": str(src), "dest": str(dest), "hardlink": True})
+    assert result["success"], result["message"]
+    return result["data"]
+
+
+def test_hardlink_forest_reuses_unchanged_files(tmp_path, monkeypatch):
+    src, dest = tmp_path / "src", tmp_path / "dest"
+    files = _files(src)
+    first = _snapshot(src, dest, monkeypatch, 0)
+    assert first["parent"] is None and first["linked"] == 0 and first["copied"] == len(files)
+
+    (src / "small.txt").write_bytes(b"changed, and longer")
+    os.remove(src / "noise.bin")
+    (src / "new.txt").write_text("new")
+    second = _snapshot(src, dest, monkeypatch, 10)
+    assert second["parent"] == os.path.basename(first["backup_path"])
+    assert (second["linked"], second["copied"]) == (len(files) - 2, 2)
+
+    old, new = first["backup_path"], second["backup_path"]
+    for rel in files:
+        if rel in ("small.txt", "noise.bin"):
+            continue
+        assert os.path.samestat(os.stat(os.path.join(old, rel)), os.stat(os.path.join(new, rel))), rel
+    assert not os.path.samefile(os.path.join(old, "small.txt"), os.path.join(new, "small.txt"))
+    assert open(os.path.join(new, "small.txt"), "rb").read() == b"changed, and longer"
+    assert open(os.path.join(old, "small.txt"), "rb").read() == b"hello"
+    assert not os.path.exists(os.path.join(new, "noise.bin"))
+    assert os.path.exists(os.path.join(old, "noise.bin"))
+
+    # The parent is found through the catalog, newest folder first
+    third = _snapshot(src, dest, monkeypatch, 20)
+    assert third["parent"] == os.path.basename(new)
+    assert (third["linked"], third["copied"]) == (len(files), 0)
+
+
+def test_hardlink_forest_without_catalog_copies_everything(tmp_path, monkeypatch):
+    src, dest = tmp_path / "src", tmp_path / "dest"
+    files = _files(src)
+    _snapshot(src, dest, monkeypatch, 0)
+    os.remove(dest / "catalog.sqlite3")
+    second = _snapshot(src, dest, monkeypatch, 10)
+    assert second["parent"] is None and second["copied"] == len(files)
+
+
+def test_sparse_folder_copy_keeps_holes(tmp_path, make_sparse):
+    src, dest = tmp_path / "src", tmp_path / "dest"
+    src.mkdir()
+    content = make_sparse(src / "disk.img")
+    result = full_backup.run({"source": str(src), "dest": str(dest)})
+    assert result["success"], result["message"]
+    assert set(result["data"]["methods"]) <= {"sparse", "reflink"}
+    copy = os.path.join(result["data"]["backup_path"], "disk.img")
+    assert os.path.getsize(copy) == SPARSE_SIZE
+    assert allocated(copy) < SPARSE_SIZE // 2
+    assert open(copy, "rb").read() == content
+
+
+def test_sparse_member_skips_hole_blocks(tmp_path, make_sparse):
+    src = tmp_path / "src"
+    src.mkdir()
+    content = make_sparse(src / "disk.img")
+    out = tmp_path / "out.zip"
+    with ZipArchiveWriter(str(out), workers=2, block_size=BLOCK) as writer:
+        writer.add_files(_items(src, {"disk.img": content}))
+    # Blocks holding no data extent are emitted without being read
+    assert writer.stats["holes"] >= SPARSE_SIZE - 4 * BLOCK
+    with zipfile.ZipFile(out) as zf:
+        assert zf.testzip() is None
+        assert zf.read("disk.img") == content
+
+
+def test_scheduler_without_device_numbers(tmp_path, monkeypatch):
+    src, dest = tmp_path / "src", tmp_path / "dest"
+    files = _files(src)
+    monkeypatch.delattr(os, "major")
+    monkeypatch.delattr(os, "minor")
+    scheduler = IOScheduler()
+    helpers = FileHelpers()
+    pairs = [(str(src / rel), str(tmp_path / "copy" / rel)) for rel in files]
+    results = list(helpers.copy_many(pairs, scheduler=scheduler))
+    assert not [r for _, _, r in results if isinstance(r, Exception)]
+    stats = scheduler.stats()
+    device = str(os.stat(src).st_dev)
+    assert list(stats) == [device]
+    assert stats[device]["rotational"] is None and stats[device]["files"] == len(files)
+
+    # Folder copies and archive restores both schedule through device_info
+    result = full_backup.run({"source": str(src), "dest": str(dest)})
+    assert result["success"], result["message"]
+    archive = full_backup.run({"source": str(src), "dest": str(dest / "zip"), "compress": True})
+    assert archive["success"], archive["message"]
+    restored = restore.run({"archive": archive["data"]["backup_path"], "restore_to": str(tmp_path / "out")})
+    assert restored["success"] and not restored["data"]["failed"]
+    for rel, data in files.items():
+        assert (tmp_path / "out" / rel).read_bytes() == data
@@ -0,0 +1,215 @@
+"""
+Unit tests for modules.backup.incremental_backup and its rsync-style delta engine (utils.delta).
+
+Purpose:
+- Check the rolling weak-checksum search (pure Python and numpy) against zlib.adler32 and find blocks at
+  unaligned offsets.
+- Apply deltas in place (edits, appends, truncation) and by rebuild (shifted data), byte for byte.
+- Run two incremental backups into a tmp_path mirror and check the second one goes through the delta path.
+- Cut identical content-defined chunks (utils.chunker) with and without numpy, and check an insertion
+  only changes the chunks around it.
+- Snapshot into a deduplicating repository (repo=...; utils.backup_repo): unchanged files reuse the
+  parent's chunk lists, edits store only new chunks, and the repository lock keeps writers apart.
+- Copy sparse files extent by extent (FileHelpers.copy_hashed): holes are hashed as zeros, never read, and
+  stay unallocated in the copy.
+"""
+
+import hashlib
+import io
+import os
+import random
+import zlib
+import pytest
+from modules.backup import incremental_backup
+from modules.backup.tests.conftest import SPARSE_SIZE, allocated
+from utils import chunker, delta
+from utils.backup_repo import BackupRepository, _RepoLock
+from utils.file_helpers import FileHelpers
+
+BLOCK = 2048
+
+
+def _data(size, seed=0):
+    return random.Random(seed).randbytes(size)
+
+
+def _write(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+SEARCHES = [delta._search_python] + ([delta._search_numpy] if delta._np is not None else [])
+
+
+@pytest.mark.parametrize("search", SEARCHES, ids=lambda f: f.__name__)
+def test_weak_search_finds_unaligned_block(tmp_path, search):
+    basis = _data(8 * BLOCK)
+    sig = delta.signature(_write(tmp_path / "basis", basis), BLOCK)
+    # Block 5 shows up after 777 bytes of noise
+    data = _data(777, seed=1) + basis[5 * BLOCK:6 * BLOCK] + _data(100, seed=2)
+    assert search(data, sig, 0, len(data)) == (777, 5)
+    assert search(data, sig, 778, len(data)) is None
+    assert search(_data(4 * BLOCK, seed=3), sig, 0, 4 * BLOCK) is None
+
+
+@pytest.mark.parametrize("search", SEARCHES, ids=lambda f: f.__name__)
+def test_rolling_weak_sum_matches_adler32(search):
+    data = _data(BLOCK + 300, seed=4)
+    window = data[300:300 + BLOCK]
+    # A one-block signature: only the rolled weak sum at offset 300 can lead the search there
+    sig = delta.Signature(BLOCK, BLOCK, [zlib.adler32(window)], [delta._strong(window)])
+    assert search(data, sig, 0, len(data)) == (300, 0)
+
+
+def test_inplace_patch_for_edits_appends_and_truncation(tmp_path):
+    basis = _data(20 * BLOCK)
+    for name, source in {
+        "edit": basis[:5 * BLOCK + 10] + b"X" * 50 + basis[5 * BLOCK + 60:],
+        "append": basis + _data(3000, seed=5),
+        "truncate": basis[:12 * BLOCK + 7],
+    }.items():
+        dest = _write(tmp_path / f"{name}.dst", basis)
+        inode = os.stat(dest).st_ino
+        src = _write(tmp_path / f"{name}.src", source)
+        result = delta.sync_file(src, dest, algorithm="sha256", block_size=BLOCK)
+        assert result["mode"] == "inplace", name
+        assert open(dest, "rb").read() == source
+        assert os.stat(dest).st_ino == inode
+        assert result["bytes_written"] == result["literal_bytes"] < len(source)
+        assert result["digest"] == hashlib.sha256(source).hexdigest()
+
+
+def test_shifted_data_is_rebuilt_from_basis_blocks(tmp_path):
+    basis = _data(20 * BLOCK)
+    source = basis[:3 * BLOCK + 5] + b"inserted" * 40 + basis[3 * BLOCK + 5:]
+    dest = _write(tmp_path / "dst", basis)
+    src = _write(tmp_path / "src", source)
+    d = delta.compute_delta(src, delta.signature(dest, BLOCK))
+    assert not d.aligned
+    # Only the block around the insertion is sent as literals
+    assert d.literal_bytes < 2 * BLOCK + 320
+    assert delta.apply_delta(d, src, dest) == "rebuilt"
+    assert open(dest, "rb").read() == source
+    assert delta.sync_file(src, dest, block_size=BLOCK)["mode"] == "unchanged"
+
+
+def test_incremental_backup_uses_delta_for_changed_files(tmp_path):
+    source, mirror = tmp_path / "src", tmp_path / "mirror"
+    source.mkdir()
+    big = _data(200 * 1024)
+    (source / "big.bin").write_bytes(big)
+    (source / "small.txt").write_text("small")
+    args = {"source": str(source), "dest": str(mirror), "manifest": str(tmp_path / "manifest.jsonl")}
+    first = incremental_backup.run(args)
+    assert first["success"], first["message"]
+    assert first["data"]["summary"]["copied"] == 2
+
+    changed = big[:1000] + b"Z" * 100 + big[1100:]
+    (source / "big.bin").write_bytes(changed)
+    os.utime(source / "big.bin", ns=(1, 1))
+    second = incremental_backup.run(args)
+    summary = second["data"]["summary"]
+    assert (summary["delta"], summary["unchanged"], summary["copied"]) == (1, 1, 0)
+    assert summary["bytes_written"] < 10 * 1024
+    assert (mirror / "big.bin").read_bytes() == changed
+    assert (mirror / "small.txt").read_text() == "small"
+
+
+def test_sparse_copy_reads_only_data_extents(tmp_path, make_sparse):
+    content = make_sparse(tmp_path / "disk.img")
+    result = FileHelpers().copy_hashed(str(tmp_path / "disk.img"), str(tmp_path / "copy.img"))
+    assert result["sparse"] and result["size"] == SPARSE_SIZE
+    assert result["bytes_read"] < SPARSE_SIZE // 4
+    assert result["digest"] == hashlib.sha256(content).hexdigest()
+    assert allocated(tmp_path / "copy.img") < SPARSE_SIZE // 2
+    assert (tmp_path / "copy.img").read_bytes() == content
+
+
+def test_incremental_backup_keeps_sparse_files_sparse(tmp_path, make_sparse):
+    source, mirror = tmp_path / "src", tmp_path / "mirror"
+    source.mkdir()
+    content = make_sparse(source / "disk.img")
+    manifest = tmp_path / "manifest.jsonl"
+    result = incremental_backup.run({"source": str(source), "dest": str(mirror), "manifest": str(manifest)})
+    assert result["success"], result["message"]
+    assert allocated(mirror / "disk.img") < SPARSE_SIZE // 2
+    assert (mirror / "disk.img").read_bytes() == content
+    assert hashlib.sha256(content).hexdigest() in manifest.read_text()
+
+
+CHUNK_PARAMS = {"min_size": 4096, "avg_size": 16 * 1024, "max_size": 64 * 1024}
+
+
+def _chunks(data):
+    return list(chunker.Chunker(**CHUNK_PARAMS).chunks(io.BytesIO(data), read_size=100_000))
+
+
+@pytest.mark.skipif(chunker._np is None, reason="numpy not installed")
+def test_chunker_cut_points_match_without_numpy(monkeypatch):
+    data = _data(1024 * 1024, seed=3)
+    with_numpy = _chunks(data)
+    monkeypatch.setattr(chunker, "_np", None)
+    assert _chunks(data) == with_numpy
+    assert b"".join(with_numpy) == data
+    assert all(len(c) <= CHUNK_PARAMS["max_size"] for c in with_numpy)
+    assert all(len(c) >= CHUNK_PARAMS["min_size"] for c in with_numpy[:-1])
+
+
+def test_chunker_insertion_changes_only_nearby_chunks():
+    data = _data(1024 * 1024, seed=4)
+    edited = data[:500_000] + b"inserted bytes" * 10 + data[500_000:]
+    before, after = _chunks(data), _chunks(edited)
+    assert b"".join(after) == edited
+    changed = set(after) - set(before)
+    assert 1 <= len(changed) <= 3
+    assert sum(len(c) for c in changed) < 4 * CHUNK_PARAMS["max_size"]
+
+
+def _repo_source(tmp_path):
+    source = tmp_path / "src"
+    (source / "sub").mkdir(parents=True)
+    big = _data(600 * 1024, seed=5)
+    (source / "big.bin").write_bytes(big)
+    (source / "small.txt").write_text("small")
+    (source / "sub" / "other.txt").write_text("other")
+    BackupRepository.init(str(tmp_path / "repo"), **CHUNK_PARAMS).close()
+    return source, big
+
+
+def test_repo_backup_reuses_unchanged_files(tmp_path):
+    source, big = _repo_source(tmp_path)
+    args = {"source": str(source), "repo": str(tmp_path / "repo")}
+    first = incremental_backup.run(args)
+    assert first["success"], first["message"]
+    stats = first["data"]["stats"]
+    assert (stats["files"], stats["files_reused"], stats["bytes_read"]) == (3, 0, len(big) + 10)
+
+    edited = big[:300_000] + b"edit" + big[300_000:]
+    (source / "big.bin").write_bytes(edited)
+    os.utime(source / "big.bin", ns=(1, 1))
+    second = incremental_backup.run(args)
+    assert second["success"], second["message"]
+    snapshot, stats = second["data"]["snapshot"], second["data"]["stats"]
+    assert snapshot["parent"] == first["data"]["snapshot"]["id"]
+    assert stats["files_reused"] == 2 and stats["bytes_read"] == len(edited)
+    assert 1 <= stats["new_chunks"] <= 3 and stats["new_bytes"] < len(edited) // 4
+
+    repo = BackupRepository(str(tmp_path / "repo"))
+    try:
+        assert [s["id"] for s in repo.snapshots()] == [first["data"]["snapshot"]["id"], snapshot["id"]]
+    finally:
+        repo.close()
+
+
+def test_repo_lock_rejects_a_second_writer(tmp_path):
+    source, _ = _repo_source(tmp_path)
+    repo_path = str(tmp_path / "repo")
+    args = {"source": str(source), "repo": repo_path}
+    with _RepoLock(repo_path):
+        held = incremental_backup.run(args)
+    assert not held["success"] and "locked" in held["message"]
+    # A lock file left behind by a dead process holds no OS lock
+    (tmp_path / "repo" / "lock").write_text("999999")
+    assert incremental_backup.run(args)["success"]
+    with _RepoLock(repo_path):
+        pass
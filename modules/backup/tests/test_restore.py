@@ -0,0 +1,181 @@
+"""
+Unit tests for modules.backup.restore and the ZIP side index (utils.archive).
+
+Purpose:
+- Look members up in the sorted side index: lookup, iter_prefix (including names that sort between a
+  directory and its children, like "a/b-c" and "a/b.txt") and select.
+- Restore single files and subtrees from a full_backup archive, rebuild a lost or stale index, and refuse
+  names that would escape the restore target.
+- Restore repository snapshots (repo=...; utils.backup_repo) whole or by paths, symlinks included.
+- Archive and restore sparse files: the index keeps the data extents, restored copies keep their holes, and
+  the CRC of a zero run is combined without reading it.
+"""
+
+import os
+import zipfile
+import zlib
+import pytest
+from modules.backup import full_backup, restore
+from modules.backup.tests.conftest import SPARSE_LAYOUT, SPARSE_SIZE, allocated
+from utils.archive import _crc32_zeros, index_path, load_index
+
+# "a/b-c", "a/b.txt" sort between "a/b" and "a/b/x" ('-' and '.' < '/'); "a/bz" shares the "a/b" prefix
+NAMES = ["a/b-c", "a/b.txt", "a/b/x", "a/b/y/z", "a/bz", "a/c", "top.txt"]
+
+
+def _archive(tmp_path):
+    src = tmp_path / "src"
+    for rel in NAMES:
+        path = src / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"contents of {rel}")
+    result = full_backup.run({"source": str(src), "dest": str(tmp_path / "dest"), "compress": True})
+    assert result["success"], result["message"]
+    return result["data"]["backup_path"]
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return _archive(tmp_path)
+
+
+def test_lookup_and_prefix_search(archive):
+    with load_index(archive) as index:
+        assert len(index) == len(NAMES)
+        member = index.lookup("a/b/y/z")
+        assert member is not None and member.size == len("contents of a/b/y/z")
+        assert index.lookup("a/b/y") is None
+        assert index.lookup("zzz") is None
+        assert [m.name for m in index.iter_prefix("a/b")] == ["a/b/x", "a/b/y/z"]
+        assert [m.name for m in index.iter_prefix("a/b.txt")] == ["a/b.txt"]
+        assert [m.name for m in index.iter_prefix("a")] == NAMES[:-1]
+        assert list(index.iter_prefix("b")) == []
+
+
+def test_select(archive):
+    with load_index(archive) as index:
+        assert [m.name for m in index.select()] == sorted(m.name for m in index)
+        selected = index.select(["a/b", "/a/b/x/", "top.txt", "missing"])
+        assert [m.name for m in selected] == ["a/b/x", "a/b/y/z", "top.txt"]
+
+
+def test_restore_paths_and_preview(archive, tmp_path):
+    target = tmp_path / "restored"
+    preview = restore.run({"archive": archive, "paths": ["a/b"], "preview": True})
+    assert [e["path"] for e in preview["data"]["entries"]] == ["a/b/x", "a/b/y/z"]
+    result = restore.run({"archive": archive, "restore_to": str(target), "paths": ["a/b", "top.txt"]})
+    assert result["success"], result["message"]
+    assert sorted(result["data"]["restored"]) == ["a/b/x", "a/b/y/z", "top.txt"]
+    assert (target / "a" / "b" / "y" / "z").read_text() == "contents of a/b/y/z"
+    assert not (target / "a" / "c").exists()
+    # Existing files are skipped unless overwrite is set
+    again = restore.run({"archive": archive, "restore_to": str(target), "paths": ["top.txt"]})
+    assert again["data"]["skipped"] and not again["data"]["restored"]
+
+
+def test_full_restore_matches_source(archive, tmp_path):
+    target = tmp_path / "restored"
+    result = restore.run({"backup_path": archive, "restore_to": str(target), "workers": 3})
+    assert result["success"] and not result["data"]["failed"]
+    src = tmp_path / "src"
+    for root, _, names in os.walk(src):
+        for name in names:
+            rel = os.path.relpath(os.path.join(root, name), src)
+            assert (target / rel).read_bytes() == (src / rel).read_bytes()
+
+
+def test_missing_or_stale_index_is_rebuilt(archive):
+    with load_index(archive) as index:
+        expected = [tuple(m)[:7] for m in index]
+    os.remove(index_path(archive))
+    with load_index(archive) as index:
+        assert [tuple(m)[:7] for m in index] == expected
+    with open(index_path(archive), "r+", encoding="utf-8") as f:
+        header = f.readline().replace('"archive_size":', '"archive_size":1')
+        f.seek(0)
+        f.write(header)
+    with load_index(archive) as index:
+        assert index.header["archive_size"] == os.path.getsize(archive)
+        assert index.lookup("top.txt") is not None
+
+
+def test_names_escaping_target_are_refused(tmp_path):
+    archive = tmp_path / "evil.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("../escape.txt", "x")
+        zf.writestr("ok.txt", "ok")
+    result = restore.run({"archive": str(archive), "restore_to": str(tmp_path / "out")})
+    assert result["success"]
+    assert [f["path"] for f in result["data"]["failed"]] == ["../escape.txt"]
+    assert not (tmp_path / "escape.txt").exists()
+    assert (tmp_path / "out" / "ok.txt").read_text() == "ok"
+
+
+@pytest.mark.parametrize("count", [0, 1, 31, 4096, 65536 + 3, 5 * 1024 * 1024])
+@pytest.mark.parametrize("crc", [0, 0xDEADBEEF])
+def test_crc32_of_zero_run(crc, count):
+    assert _crc32_zeros(crc, count) == zlib.crc32(bytes(count), crc)
+
+
+def test_sparse_archive_restores_holes(tmp_path, make_sparse):
+    src = tmp_path / "src"
+    src.mkdir()
+    content = make_sparse(src / "disk.img")
+    result = full_backup.run({"source": str(src), "dest": str(tmp_path / "dest"), "compress": True})
+    assert result["success"], result["message"]
+    archive = result["data"]["backup_path"]
+    with load_index(archive) as index:
+        extents = index.lookup("disk.img").extents
+    # Every written region lies inside a recorded extent
+    assert extents
+    for offset, data in SPARSE_LAYOUT:
+        assert any(start <= offset and offset + len(data) <= start + length for start, length in extents)
+    with zipfile.ZipFile(archive) as zf:
+        assert zf.read("disk.img") == content
+
+    target = tmp_path / "restored"
+    restored = restore.run({"archive": archive, "restore_to": str(target)})
+    assert restored["success"] and not restored["data"]["failed"]
+    assert (target / "disk.img").read_bytes() == content
+    assert allocated(target / "disk.img") < SPARSE_SIZE // 2
+
+
+@pytest.fixture
+def repo_snapshot(tmp_path):
+    src = tmp_path / "src"
+    for rel in NAMES:
+        path = src / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"contents of {rel}")
+    try:
+        os.symlink("b.txt", src / "a" / "link.txt")
+        os.symlink("a/b", src / "dirlink", target_is_directory=True)
+    except (OSError, NotImplementedError):
+        pytest.skip("symlinks not supported here")
+    result = full_backup.run({"source": str(src), "repo": str(tmp_path / "repo")})
+    assert result["success"], result["message"]
+    assert result["data"]["stats"]["symlinks"] == 2
+    return str(tmp_path / "repo")
+
+
+def test_repo_restore_paths_and_symlinks(repo_snapshot, tmp_path):
+    target = tmp_path / "restored"
+    result = restore.run({"repo": repo_snapshot, "restore_to": str(target), "paths": ["a/b", "a/link.txt"]})
+    assert result["success"] and not result["data"]["failed"]
+    assert sorted(result["data"]["restored"]) == ["a/b/x", "a/b/y/z", "a/link.txt"]
+    assert os.readlink(target / "a" / "link.txt") == "b.txt"
+    assert (target / "a" / "b" / "y" / "z").read_text() == "contents of a/b/y/z"
+    assert not (target / "a" / "b.txt").exists() and not (target / "top.txt").exists()
+
+
+def test_repo_full_restore_matches_source(repo_snapshot, tmp_path):
+    target = tmp_path / "restored"
+    result = restore.run({"repo": repo_snapshot, "restore_to": str(target)})
+    assert result["success"] and not result["data"]["failed"]
+    for rel in NAMES:
+        assert (target / rel).read_text() == f"contents of {rel}"
+    assert os.readlink(target / "dirlink") == "a/b"
+    assert (target / "a" / "link.txt").read_text() == "contents of a/b.txt"
+    # A second restore skips what is already there
+    again = restore.run({"repo": repo_snapshot, "restore_to": str(target), "paths": ["top.txt"]})
+    assert again["data"]["skipped"] == ["top.txt"]
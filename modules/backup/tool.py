@@ -9,5 +9,52 @@ Exports:
 - meta and run(feature_id, args, ctx)
 
 Design:
+- Import feature modules lazily inside run()
+- Standard return shape for all features
 - Heavy operations should be invoked as subprocesses in agent/service mode.
 """
+
+from importlib import import_module
+
+meta = {
+    "id": "backup",
+    "name": "Backup Tools",
+    "description": "Full and incremental backups, snapshots and restore",
+    "version": "0.1",
+    "features": [
+        {"id": "full_backup", "name": "Full Backup"},
+        {"id": "incremental_backup", "name": "Incremental Backup"},
+        {"id": "restore", "name": "Restore"},
+        {"id": "snapshot_list", "name": "Snapshot List"},
+    ],
+}
+
+
+def _result(success: bool, data: dict | list | None = None, message: str | None = None) -> dict:
+    return {"success": success, "data": data, "message": message}
+
+
+def run(feature_id: str, args: dict | None = None, ctx: dict | None = None) -> dict:
+    if not feature_id:
+        return _result(False, None, "feature_id is required")
+
+    try:
+        module = import_module(f"modules.backup.{feature_id}")
+    except ModuleNotFoundError:
+        return _result(False, None, f"Unknown feature: {feature_id}")
+    except Exception as exc:  # defensive: import errors
+        message = f"Failed to import feature {feature_id}: {exc}"
+        if ctx and ctx.get("logger"):
+            ctx["logger"].error(message)
+        return _result(False, None, message)
+
+    if not hasattr(module, "run"):
+        return _result(False, None, f"Feature module {feature_id} missing run()")
+
+    try:
+        return module.run(args=args, ctx=ctx)
+    except Exception as exc:
+        message = f"Feature {feature_id} raised an exception: {exc}"
+        if ctx and ctx.get("logger"):
+            ctx["logger"].exception(message)
+        return _result(False, None, message)
\ No newline at end of file
@@ -5,28 +5,182 @@ Purpose:
 - Batch rename files by applying rules: replace spaces, add date prefix, normalize case, etc.
 
 API:
-- run(args: dict = None, ctx: dict = None) -> dict
-    - args: {"path": str, "rule": "spaces_to_underscores"|"prefix_date"|"lowercase", "dry_run": True}
-    - return: {"success": True, "data": {"renamed": [{"old": "new"}]}, "message": None}
+- run(args: dict = None, ctx: dict = None) -> dict  (module-level; delegates to AutoRenamer().run)
+    - args: {"path": str, "rule": "spaces_to_underscores"|"prefix_date"|"lowercase", "dry_run": True,
+             "batch_size": int = 1000, "backup": bool, "action": "rename"|"recover", "direction": "forward"|"back"}
+    - return: {"success": True, "data": {"renamed": [{"old": "new"}], "plan": {...}}, "message": None}
 
 Implementation notes:
-- Use utils.file_helpers.safe_move to rename files safely.
-- Detect collisions and append counters to avoid overwrites, or report collisions in dry-run.
+- Plan, then execute. Planning lists the directory once, computes every target name, and resolves
+  collisions in one pass against a hash set of names that will be occupied afterwards (files not being
+  renamed, directories, and targets already assigned); clashes get _1, _2, ... suffixes.
+- Targets that are currently held by another file in the batch form chains and cycles (a->b, b->a).
+  Chains are ordered so each target is free when its rename runs; each cycle is broken by moving
+  one member to a temporary name first. The plan is a flat list of single-directory os.rename steps.
+- Dry runs return the plan itself: "steps" (ordered renames, including temp hops), "collisions" and
+  "cycles".
+- Execution writes the plan to a journal under config/rename_journals/ before touching anything, then
+  journals every step: a "start" record before its os.rename and a "done" record after it (flushed
+  each time, fsync'ed every `batch_size` steps). While a journal exists for a directory, new renames
+  there are refused; action="recover" with direction="forward" finishes the plan, direction="back"
+  undoes the completed steps (journaled the same way with "revert"/"reverted" records, so an
+  interrupted rollback can be recovered too).
+- Recovery never guesses from single names: the journal records give the position in the plan (or the
+  two positions around a step that was in flight), and the directory listing must match the set of
+  names the plan implies at that position. Names are reused across chained and cyclic steps, so a
+  name being present or missing on its own says nothing about progress. If the listing matches no
+  position (e.g. renames outlived journal records lost to a power failure), recovery stops and keeps
+  the journal; it is only deleted once the final names are all in place.
+- prefix_date applies the date prefix once (Formatting.apply_rule already adds it).
 
 Dependencies:
-- Internal: utils.file_helpers, utils.formatting, utils.logger
-- External: os, datetime
+- Internal: utils.file_helpers, utils.formatting, utils.logger, utils.constants
+- External: os, hashlib, json, time
 
 Safety:
 - Default to dry-run.
+- A rename never replaces an existing file: if a target appears after planning, execution stops and
+  leaves the journal for recovery.
 """
 
+import hashlib
+import json
 import os
-import datetime
+import time
+from utils.constants import Constants
 from utils.formatting import Formatting
 from utils.logger import get_logger
 from utils.file_helpers import FileHelpers
 
+RULES = {"spaces_to_underscores", "prefix_date", "lowercase"}
+JOURNAL_FORMAT = "utility-suite-rename-journal"
+DEFAULT_BATCH_SIZE = 1000
+# Suffix of the temporary names used to break rename cycles
+TEMP_MARKER = ".rename-tmp"
+
+
+def _journal_path(path: str) -> str:
+    digest = hashlib.sha1(os.path.normcase(os.path.abspath(path)).encode("utf-8")).hexdigest()
+    return os.path.join(Constants.RENAME_JOURNAL_DIR, f"{digest}.jsonl")
+
+
+class _Journal:
+    """
+    Append-only JSONL journal: a header, one line per step, then per-step progress records
+    ({"start": i}/{"done": i} while executing, {"revert": i}/{"reverted": i} while undoing).
+    """
+
+    KINDS = ("start", "done", "revert", "reverted")
+
+    def __init__(self, path: str):
+        self.path = path
+        self._f = None
+
+    def create(self, directory: str, steps: list[tuple[str, str]]):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._f = open(self.path, "w", encoding="utf-8")
+        header = {"format": JOURNAL_FORMAT, "path": os.path.abspath(directory), "steps": len(steps),
+                  "created_at": int(time.time())}
+        self._f.write(json.dumps(header) + "\n")
+        for i, (src, dst) in enumerate(steps):
+            self._f.write(json.dumps({"i": i, "src": src, "dst": dst}, ensure_ascii=False) + "\n")
+        self._sync()
+
+    def record(self, kind: str, i: int, sync: bool = False):
+        """
+        Append a progress record; flushed so it survives a process crash, fsync'ed when `sync` is set.
+        """
+        if self._f is None:
+            self._f = open(self.path, "a", encoding="utf-8")
+        self._f.write(json.dumps({kind: i}) + "\n")
+        if sync:
+            self._sync()
+        else:
+            self._f.flush()
+
+    def _sync(self):
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    @staticmethod
+    def load(path: str) -> tuple[dict, list[tuple[str, str]], dict]:
+        """
+        Returns (header, steps, marks): marks maps "start"/"done" to the highest step index recorded and
+        "revert"/"reverted" to the lowest, or None when there is no such record.
+        """
+        header, steps = {}, []
+        marks: dict = dict.fromkeys(_Journal.KINDS)
+        with open(path, "r", encoding="utf-8") as f:
+            for n, line in enumerate(f):
+                try:
+                    obj = json.loads(line)
+                except ValueError:
+                    break  # torn final line
+                if n == 0:
+                    header = obj
+                elif "src" in obj:
+                    steps.append((obj["src"], obj["dst"]))
+                else:
+                    for kind in _Journal.KINDS:
+                        if kind in obj:
+                            pick = max if kind in ("start", "done") else min
+                            marks[kind] = obj[kind] if marks[kind] is None else pick(marks[kind], obj[kind])
+        if header.get("format") != JOURNAL_FORMAT or len(steps) != header.get("steps"):
+            raise ValueError(f"Incomplete or invalid rename journal: {path}")
+        return header, steps, marks
+
+    def close(self, remove: bool = False):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+        if remove:
+            os.remove(self.path)
+
+
+def _names_at(steps: list[tuple[str, str]], position: int) -> tuple[set[str], set[str]]:
+    """
+    (names present, all names involved) once steps[:position] have run. A name is there initially if
+    its first mention in the plan is as a source; targets are always free when their step runs.
+    """
+    present, involved = set(), set()
+    for src, dst in steps:
+        if src not in involved:
+            present.add(src)
+        involved.add(src)
+        involved.add(dst)
+    for src, dst in steps[:position]:
+        present.discard(src)
+        present.add(dst)
+    return present, involved
+
+
+def _match_position(path: str, steps: list[tuple[str, str]], candidates: list[int]) -> tuple[int | None, str]:
+    """
+    The candidate position whose implied names agree with the directory listing, or (None, reason).
+    A candidate qualifies when every name it implies is present; between two qualifying positions
+    (a step in flight) the one with no leftover names wins, otherwise the state is ambiguous. Extra
+    names at a single candidate are files that appeared meanwhile; the next rename refuses to
+    overwrite them.
+    """
+    listing = set(os.listdir(path))
+    fits = []
+    for position in candidates:
+        present, involved = _names_at(steps, position)
+        missing = present - listing
+        if missing:
+            continue
+        fits.append((position, (involved - present) & listing))
+    if len(fits) == 1:
+        return fits[0][0], ""
+    exact = [position for position, extra in fits if not extra]
+    if len(exact) == 1:
+        return exact[0], ""
+    if not fits:
+        return None, (f"Directory does not match the rename journal at step {candidates[0]}"
+                      f"{' or ' + str(candidates[1]) if len(candidates) > 1 else ''}; resolve it by hand")
+    return None, f"Cannot tell whether step {candidates[0]} ran (both names exist); resolve it by hand"
+
+
 class AutoRenamer:
     def __init__(self):
         self.logger = get_logger(__name__)
@@ -47,62 +201,217 @@ class AutoRenamer:
         path = args.get("path")
         rule = args.get("rule")
         dry_run = args.get("dry_run", True)
+        action = args.get("action", "rename")
+        batch_size = max(1, int(args.get("batch_size", DEFAULT_BATCH_SIZE)))
 
         if not path or not os.path.isdir(path):
             return {"success": False, "data": {}, "message": f"Invalid path: {path}"}
 
-        if rule not in {"spaces_to_underscores", "prefix_date", "lowercase"}:
+        journal_path = _journal_path(path)
+        if action == "recover":
+            return self._recover(path, journal_path, args.get("direction", "forward"), batch_size)
+        if action != "rename":
+            return {"success": False, "data": {}, "message": f"Unsupported action: {action}"}
+
+        if rule not in RULES:
             return {"success": False, "data": {}, "message": f"Invalid rule: {rule}"}
+        if os.path.exists(journal_path):
+            return {"success": False, "data": {"journal": journal_path},
+                    "message": "An interrupted rename run exists for this directory; "
+                               "run action='recover' with direction='forward' or 'back' first"}
+
+        plan = self.plan(path, rule)
+        renamed_files = [{os.path.join(path, old): os.path.join(path, new)} for old, new in plan["renames"]]
+        if dry_run:
+            for old, new in plan["renames"]:
+                self.logger.info(f"[DRY RUN] Would rename: {os.path.join(path, old)} -> {os.path.join(path, new)}")
+            return {"success": True, "data": {"renamed": renamed_files, "plan": plan}, "message": None}
 
-        renamed_files = []
+        journal = _Journal(journal_path)
+        journal.create(path, plan["steps"])
+        error = self._execute(path, plan["steps"], 0, journal, batch_size, args.get("backup", False))
+        journal.close(remove=error is None)
+        if error:
+            return {"success": False, "data": {"journal": journal_path, "plan": plan}, "message": error}
+        return {"success": True, "data": {"renamed": renamed_files, "steps": len(plan["steps"]),
+                                          "cycles": plan["cycles"]}, "message": None}
 
-        for fname in os.listdir(path):
-            old_path = os.path.join(path, fname)
-            if not os.path.isfile(old_path):
+    def plan(self, path: str, rule: str) -> dict:
+        """
+        Compute the full rename plan for the files directly in `path`.
+        Returns {"renames": [(old, new)], "steps": [(src, dst)], "collisions": [{old: new}], "cycles": int}.
+        """
+        entries = self.file_helpers.scan_dir(path)
+        key = os.path.normcase
+        wanted: list[tuple[str, str]] = []
+        all_names = set()
+        for entry in entries:
+            name = os.path.basename(entry.path)
+            all_names.add(key(name))
+            if entry.is_dir:
                 continue
+            new_name = self._generate_new_name(name, rule)
+            if new_name != name:
+                wanted.append((name, new_name))
 
-            new_path = self._generate_new_path(old_path, rule)
+        # Names occupied once the plan has run: everything that is not renamed, plus assigned targets
+        sources = {key(old) for old, _ in wanted}
+        occupied = all_names - sources
+        renames: list[tuple[str, str]] = []
+        collisions: list[dict] = []
+        for old, new in sorted(wanted):
+            target = new
+            base, ext = os.path.splitext(new)
+            counter = 1
+            while key(target) in occupied:
+                target = f"{base}_{counter}{ext}"
+                counter += 1
+            if target != new:
+                collisions.append({old: target})
+            occupied.add(key(target))
+            if target != old:
+                renames.append((old, target))
 
-            if old_path != new_path:
-                if dry_run:
-                    self.logger.info(f"[DRY RUN] Would rename: {old_path} -> {new_path}")
-                else:
-                    self._perform_rename(old_path, new_path, args)
-                renamed_files.append({old_path: new_path})
+        steps, cycles = self._order_steps(renames, all_names | occupied)
+        return {"renames": renames, "steps": steps, "collisions": collisions, "cycles": cycles}
+
+    def _order_steps(self, renames: list[tuple[str, str]], taken: set[str]) -> tuple[list[tuple[str, str]], int]:
+        """
+        Order renames so every target is free when its step runs; break cycles via temporary names.
+        """
+        key = os.path.normcase
+        dst_of = {key(old): (old, new) for old, new in renames}
+        # wants[name] = the rename whose target is `name` (at most one, targets are unique)
+        wants = {key(new): (old, new) for old, new in renames}
+        steps: list[tuple[str, str]] = []
+        done: set[str] = set()
+
+        def _unwind(name: str):
+            # Run renames whose target was just freed, following the chain backwards
+            while key(name) in wants:
+                old, new = wants[key(name)]
+                if key(old) in done:
+                    return
+                steps.append((old, new))
+                done.add(key(old))
+                name = old
 
-        return {"success": True, "data": {"renamed": renamed_files}, "message": None}
+        for old, new in renames:
+            if key(new) not in dst_of and key(old) not in done:
+                # Chain end: the target is not held by another source
+                steps.append((old, new))
+                done.add(key(old))
+                _unwind(old)
+
+        cycles = 0
+        for old, new in renames:
+            if key(old) in done:
+                continue
+            cycles += 1
+            counter = 0
+            temp = f".{old}{TEMP_MARKER}"
+            while key(temp) in taken:
+                counter += 1
+                temp = f".{old}{TEMP_MARKER}{counter}"
+            taken.add(key(temp))
+            steps.append((old, temp))
+            done.add(key(old))
+            _unwind(old)
+            steps.append((temp, new))
+        return steps, cycles
 
-    def _generate_new_path(self, file_path: str, rule: str | None) -> str:
+    def _execute(self, path: str, steps: list[tuple[str, str]], start: int, journal: _Journal, batch_size: int,
+                 backup: bool) -> str | None:
         """
-        Generate the new file path according to the rule, handling collisions.
+        Run steps[start:], journaling each one. Returns an error message or None.
         """
-        dir_name = os.path.dirname(file_path)
-        base_name = os.path.basename(file_path)
-        new_name = self.formatting.apply_rule(base_name, rule) if rule else base_name
+        for i in range(start, len(steps)):
+            src, dst = steps[i]
+            src_path, dst_path = os.path.join(path, src), os.path.join(path, dst)
+            try:
+                if os.path.lexists(dst_path) and not os.path.samefile(src_path, dst_path):
+                    return f"Refusing to overwrite {dst_path}; run action='recover' to finish or undo"
+                journal.record("start", i)
+                os.rename(src_path, dst_path)
+            except OSError as exc:
+                self.logger.error(f"Rename failed {src_path} -> {dst_path}: {exc}")
+                return f"Rename failed at step {i}: {exc}"
+            journal.record("done", i, sync=(i + 1) % batch_size == 0 or i == len(steps) - 1)
+            if backup and TEMP_MARKER not in dst:
+                self._backup(dst_path)
+        return None
 
-        if rule == "prefix_date":
-            today = datetime.datetime.now().strftime("%Y-%m-%d_")
-            new_name = today + new_name
+    def _undo(self, path: str, steps: list[tuple[str, str]], position: int, journal: _Journal,
+              batch_size: int) -> str | None:
+        """
+        Reverse steps[:position], newest first, journaling each one. Returns an error message or None.
+        """
+        for i in range(position - 1, -1, -1):
+            src, dst = steps[i]
+            src_path, dst_path = os.path.join(path, src), os.path.join(path, dst)
+            try:
+                if os.path.lexists(src_path) and not os.path.samefile(src_path, dst_path):
+                    return f"Refusing to overwrite {src_path}; move it away and recover again"
+                journal.record("revert", i)
+                os.rename(dst_path, src_path)
+            except OSError as exc:
+                self.logger.error(f"Undo failed {dst_path} -> {src_path}: {exc}")
+                return f"Undo failed for {dst_path}: {exc}"
+            journal.record("reverted", i, sync=(position - i) % batch_size == 0 or i == 0)
+        return None
 
-        new_path = os.path.join(dir_name, new_name)
+    def _recover(self, path: str, journal_path: str, direction: str, batch_size: int) -> dict:
+        if direction not in {"forward", "back"}:
+            return {"success": False, "data": {}, "message": f"Invalid direction: {direction}"}
+        if not os.path.exists(journal_path):
+            return {"success": True, "data": {"recovered": 0}, "message": "No interrupted rename run"}
+        try:
+            _, steps, marks = _Journal.load(journal_path)
+        except (OSError, ValueError) as exc:
+            return {"success": False, "data": {}, "message": str(exc)}
 
-        # Handle collisions by appending _1, _2, etc.
-        counter = 1
-        base, ext = os.path.splitext(new_name)
-        while os.path.exists(new_path):
-            new_name = f"{base}_{counter}{ext}"
-            new_path = os.path.join(dir_name, new_name)
-            counter += 1
+        # Positions the journal allows: the last recorded one, plus the next one if a step was in flight
+        if marks["revert"] is not None:
+            if direction == "forward":
+                return {"success": False, "data": {"journal": journal_path},
+                        "message": "A rollback was started for this run; recover with direction='back'"}
+            base = marks["reverted"] if marks["reverted"] is not None else marks["revert"] + 1
+            candidates = [base, base - 1] if marks["revert"] < base else [base]
+        else:
+            base = marks["done"] + 1 if marks["done"] is not None else 0
+            candidates = [base, base + 1] if marks["start"] == base else [base]
+        position, reason = _match_position(path, steps, candidates)
+        if position is None:
+            return {"success": False, "data": {"journal": journal_path}, "message": reason}
 
-        return new_path
+        journal = _Journal(journal_path)
+        if direction == "forward":
+            error = self._execute(path, steps, position, journal, batch_size, False)
+            count, target = len(steps) - position, len(steps)
+        else:
+            error = self._undo(path, steps, position, journal, batch_size)
+            count, target = position, 0
+        if error is None:
+            # Only drop the journal once every name the plan ends with is actually there
+            reached, reason = _match_position(path, steps, [target])
+            if reached is None:
+                error = reason
+        journal.close(remove=error is None)
+        if error:
+            return {"success": False, "data": {"journal": journal_path}, "message": error}
+        return {"success": True, "data": {"recovered": count, "direction": direction}, "message": None}
 
-    def _perform_rename(self, old_path: str, new_path: str, args: dict):
+    def _generate_new_name(self, name: str, rule: str | None) -> str:
         """
-        Rename a file safely using FileHelpers, with optional backup.
+        Apply the rule to a file name (collisions are resolved by plan()).
         """
-        self.file_helpers.safe_move(old_path, new_path)
+        return self.formatting.apply_rule(name, rule) if rule else name
+
+    def _backup(self, new_path: str):
+        backup_dir = os.path.join(os.path.dirname(new_path), "backup")
+        os.makedirs(backup_dir, exist_ok=True)
+        self.file_helpers.safe_copy(new_path, os.path.join(backup_dir, os.path.basename(new_path)))
+
 
-        if args.get("backup"):
-            backup_dir = os.path.join(os.path.dirname(old_path), "backup")
-            os.makedirs(backup_dir, exist_ok=True)
-            self.file_helpers.safe_copy(new_path, os.path.join(backup_dir, os.path.basename(new_path)))
+def run(args: dict | None = None, ctx: dict | None = None) -> dict:
+    return AutoRenamer().run(args, ctx)
@@ -6,37 +6,180 @@ Purpose:
 
 API:
 - run(args: dict = None, ctx: dict = None) -> dict
-    - args: {"paths": list[str]|None, "targets": list[str], "dry_run": bool}
-    - return: {"success": True, "data": {"candidates": [paths], "deleted": [paths]}, "message": None}
+    - args: {"paths": list[str]|None, "targets": list[str], "dry_run": bool,
+             "min_age_days": float|None, "min_size": int|None, "max_size": int|None,
+             "include": list[str]|None, "exclude": list[str]|None, "sample_size": int = 50,
+             "delete_mode": "trash"|"unlink", "batch_size": int = 500, "workers": int|None}
+    - return: {"success": True, "data": {"summary": {...}, "sample": [{"path", "size", "mtime"}],
+               "deleted": int, "bytes_freed": int, "failed": [{"path", "error"}]}, "message": None}
+
+Implementation notes:
+- Candidates stream from FileHelpers.scan_entries through the filters (age by mtime, size bounds,
+  `include` name/path globs); `exclude` globs prune whole directories during the walk. Nothing holds
+  the full candidate list: the result carries per-root counts/bytes and the `sample_size` largest files.
+- Deletion consumes the same stream in batches of `batch_size` files (consecutive files, so a batch
+  mostly shares a few directories) on a bounded thread pool (`workers`); at most 2 * workers batches
+  are in flight. Each finished batch is reported through utils.progress.report_progress.
+- delete_mode="trash" sends each batch to the trash in one send2trash call. delete_mode="unlink"
+  deletes permanently (unlinking relative to an open directory fd) and is only allowed when every
+  root lies inside a known-safe temp root (SAFE_UNLINK_TARGETS, i.e. the system temp directory).
+- Overlapping roots are de-duplicated so nothing is counted or deleted twice.
+- Symlinks are candidates in their own right: filters, summaries and bytes_freed use the link's lstat
+  size and mtime, never the target's, since only the link is removed.
 
 Dependencies:
-- Internal: utils.file_helpers, utils.logger
-- External: os, shutil, tempfile
+- Internal: utils.file_helpers, utils.logger, utils.progress
+- External: os, fnmatch, heapq, re, tempfile, time, concurrent.futures
 
 Safety:
 - Avoid deleting anything without explicit confirmation. Prefer send2trash.
+- dry_run defaults to True; permanent deletion is refused outside known-safe temp roots.
 """
 
+import fnmatch
+import heapq
 import os
+import re
 import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from utils.file_helpers import FileHelpers
 from utils.logger import get_logger
+from utils.progress import report_progress
 
 
 KNOWN_TARGETS = {
     "temp": lambda: [tempfile.gettempdir()],
 }
 
-
-def _collect_candidates(paths: list[str]) -> list[str]:
-    files: list[str] = []
-    for root in paths:
-        if not os.path.isdir(root):
-            continue
-        for dirpath, dirnames, filenames in os.walk(root):
-            for name in filenames:
-                files.append(os.path.join(dirpath, name))
-    return files
+# Targets whose contents may be unlinked permanently (delete_mode="unlink")
+SAFE_UNLINK_TARGETS = {"temp"}
+
+DEFAULT_SAMPLE_SIZE = 50
+DEFAULT_BATCH_SIZE = 500
+# Failed deletions kept in the result; the rest are only counted
+_MAX_FAILURES_REPORTED = 100
+
+
+def _normalize_roots(paths: list[str]) -> list[str]:
+    """
+    Existing directories, resolved, with duplicates and roots nested inside other roots dropped.
+    """
+    roots = sorted({os.path.realpath(p) for p in paths if os.path.isdir(p)})
+    kept: list[str] = []
+    for root in roots:
+        if not any(root == k or root.startswith(k.rstrip(os.sep) + os.sep) for k in kept):
+            kept.append(root)
+    return kept
+
+
+def _within(path: str, roots: list[str]) -> bool:
+    return any(path == r or path.startswith(r.rstrip(os.sep) + os.sep) for r in roots)
+
+
+def _build_filter(min_age_days, min_size, max_size, include):
+    """
+    Predicate over (root, FileEntry); None-valued criteria are not applied.
+    """
+    cutoff_ns = None
+    if min_age_days is not None:
+        cutoff_ns = time.time_ns() - int(float(min_age_days) * 86400 * 1_000_000_000)
+    include_re = None
+    if include:
+        patterns = [include] if isinstance(include, str) else include
+        include_re = re.compile("|".join(f"(?:{fnmatch.translate(p)})" for p in patterns))
+
+    def _match(root: str, entry) -> bool:
+        if cutoff_ns is not None and entry.mtime_ns > cutoff_ns:
+            return False
+        if min_size is not None and entry.size < min_size:
+            return False
+        if max_size is not None and entry.size > max_size:
+            return False
+        if include_re is not None:
+            rel = entry.path[len(root.rstrip(os.sep)) + 1:].replace(os.sep, "/")
+            if not (include_re.match(os.path.basename(entry.path)) or include_re.match(rel)):
+                return False
+        return True
+
+    return _match
+
+
+def _iter_candidates(helpers: FileHelpers, roots: list[str], match, exclude, summary: dict, sample: list,
+                     sample_size: int):
+    """
+    Yield matching FileEntry objects under `roots`, updating `summary` and the bounded `sample` heap.
+    """
+    for root in roots:
+        per_root = summary["roots"].setdefault(root, {"files": 0, "bytes": 0})
+        for entry in helpers.scan_entries(root, exclude=exclude):
+            summary["scanned"] += 1
+            if entry.is_symlink:
+                # Trashing or unlinking a symlink frees the link, not its target: size and age it by lstat
+                try:
+                    lst = os.lstat(entry.path)
+                except OSError:
+                    continue
+                entry = entry._replace(size=lst.st_size, mtime_ns=lst.st_mtime_ns)
+            if not match(root, entry):
+                continue
+            summary["matched"] += 1
+            summary["bytes"] += entry.size
+            per_root["files"] += 1
+            per_root["bytes"] += entry.size
+            item = (entry.size, entry.path, entry.mtime_ns)
+            if len(sample) < sample_size:
+                heapq.heappush(sample, item)
+            elif sample_size and item > sample[0]:
+                heapq.heapreplace(sample, item)
+            yield entry
+
+
+def _batches(entries, batch_size: int):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _delete_batches(helpers: FileHelpers, entries, delete_mode: str, batch_size: int, workers: int, ctx) -> dict:
+    """
+    Delete `entries` in batches on a bounded pool. Returns {"deleted", "bytes_freed", "failed", "failed_count"}.
+    """
+    result = {"deleted": 0, "bytes_freed": 0, "failed": [], "failed_count": 0}
+
+    def _one(batch):
+        paths = [e.path for e in batch]
+        res = helpers.unlink_many(paths) if delete_mode == "unlink" else helpers.send_to_trash_many(paths)
+        return batch, res
+
+    def _collect(future):
+        batch, res = future.result()
+        done = set(res.get("done", []))
+        result["deleted"] += len(done)
+        result["bytes_freed"] += sum(e.size for e in batch if e.path in done)
+        for path, error in res.get("failed", []):
+            result["failed_count"] += 1
+            if len(result["failed"]) < _MAX_FAILURES_REPORTED:
+                result["failed"].append({"path": path, "error": error})
+        report_progress(ctx, {"feature": "disk_cleanup", "event": "batch", "deleted": result["deleted"],
+                              "bytes_freed": result["bytes_freed"], "failed": result["failed_count"]})
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cleanup") as pool:
+        pending = set()
+        for batch in _batches(entries, batch_size):
+            pending.add(pool.submit(_one, batch))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    _collect(future)
+        for future in pending:
+            _collect(future)
+    return result
 
 
 def run(args: dict | None = None, ctx: dict | None = None) -> dict:
@@ -47,28 +190,57 @@ def run(args: dict | None = None, ctx: dict | None = None) -> dict:
     paths = args.get("paths")
     targets = args.get("targets", ["temp"]) or ["temp"]
     dry_run = bool(args.get("dry_run", True))
+    exclude = args.get("exclude")
+    sample_size = max(0, int(args.get("sample_size", DEFAULT_SAMPLE_SIZE)))
+    delete_mode = args.get("delete_mode", "trash")
+    batch_size = max(1, int(args.get("batch_size", DEFAULT_BATCH_SIZE)))
+    workers = max(1, int(args.get("workers") or min(8, os.cpu_count() or 1)))
+
+    if delete_mode not in {"trash", "unlink"}:
+        return {"success": False, "data": None, "message": f"Unsupported delete_mode: {delete_mode}"}
 
     resolved_paths: list[str] = []
+    safe_roots: list[str] = []
     if isinstance(paths, list) and paths:
         resolved_paths.extend([p for p in paths if isinstance(p, str)])
     for t in targets:
         fn = KNOWN_TARGETS.get(t)
         if fn:
             try:
-                resolved_paths.extend([p for p in fn() if isinstance(p, str)])
+                target_paths = [p for p in fn() if isinstance(p, str)]
             except Exception:
                 logger.exception(f"Failed to resolve target {t}")
-
-    candidates = _collect_candidates(resolved_paths)
-    deleted: list[str] = []
-
-    if not dry_run:
-        for p in candidates:
-            try:
-                res = helpers.send_to_trash(p)
-                if res.get("success"):
-                    deleted.append(p)
-            except Exception:
-                logger.exception(f"Failed to trash {p}")
-
-    return {"success": True, "data": {"candidates": candidates, "deleted": deleted}, "message": None}
+                continue
+            resolved_paths.extend(target_paths)
+            if t in SAFE_UNLINK_TARGETS:
+                safe_roots.extend(os.path.realpath(p) for p in target_paths)
+
+    roots = _normalize_roots(resolved_paths)
+    if delete_mode == "unlink" and not dry_run:
+        unsafe = [r for r in roots if not _within(r, safe_roots)]
+        if unsafe:
+            return {"success": False, "data": None,
+                    "message": f"Permanent deletion is only allowed inside known temp roots; refusing: {unsafe}"}
+
+    match = _build_filter(args.get("min_age_days"), args.get("min_size"), args.get("max_size"), args.get("include"))
+    summary = {"roots": {}, "scanned": 0, "matched": 0, "bytes": 0}
+    sample: list = []
+    candidates = _iter_candidates(helpers, roots, match, exclude, summary, sample, sample_size)
+
+    deletion = {"deleted": 0, "bytes_freed": 0, "failed": [], "failed_count": 0}
+    if dry_run:
+        for _ in candidates:
+            pass
+    else:
+        deletion = _delete_batches(helpers, candidates, delete_mode, batch_size, workers, ctx)
+        if deletion["failed_count"]:
+            logger.warning(f"Failed to delete {deletion['failed_count']} file(s)")
+
+    sample_rows = [{"path": path, "size": size, "mtime": mtime_ns // 1_000_000_000}
+                   for size, path, mtime_ns in sorted(sample, reverse=True)]
+    return {
+        "success": True,
+        "data": {"summary": summary, "sample": sample_rows, "dry_run": dry_run, "delete_mode": delete_mode,
+                 **deletion},
+        "message": None,
+    }
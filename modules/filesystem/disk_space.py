@@ -7,24 +7,279 @@ Purpose:
 API:
 - meta (optional): {"id":"disk_space", "name":"Disk Space Visualizer"}
 - run(args: dict = None, ctx: dict = None) -> dict
-    - args: {"path": str, "top_n": int = 20, "depth": int|None, "human_readable": bool}
+    - args: {"path": str, "top_n": int = 20, "depth": int = 1, "human_readable": bool,
+             "exclude": list[str]|None, "progress_every": int = 0, "mode": "full"|"incremental"}
     - ctx: runtime context with logger, formatting, config_manager, service_manager, constants
-    - return: {"success": True, "data": [{"path": str, "size": int, "size_hr": str}], "message": None}
+    - return: {"success": True, "data": [{"path": str, "size": int, "size_hr": str, "type": "file"|"dir", "files": int}],
+               "message": None, "metadata": {"total_size", "total_files", "directories", "hardlinks_skipped", "largest_files",
+                                             "mode", "dirs_skipped", "dirs_rescanned", "index"}}
+
+Implementation notes:
+- One scandir traversal (FileHelpers.scan_entries) builds the whole size tree: each file adds to its
+  directory's own size/count, then directory totals are folded bottom-up, deepest first.
+- `depth` selects which level to list (1 = direct children of `path`, 2 = grandchildren, ...); totals
+  always cover the full subtree. Top-N items and the largest files anywhere use bounded heaps.
+- Hardlinked files (nlink > 1) are counted once per (device, inode). Symlinks count as 0 bytes.
+- With progress_every > 0, running totals per top-level child are streamed through
+  utils.progress.report_progress every N files.
+
+Incremental mode:
+- mode="incremental" keeps a compact per-directory index under config/disk_index/ (one JSON file per
+  root): directory mtime, own bytes/file count, subdirectory names, the largest few files and any
+  hardlinked files. On rescans each directory is stat'ed once; only directories whose mtime changed
+  are listed again, the rest reuse their record, and totals are re-aggregated upward.
+- Hardlinked files are kept apart from the per-directory largest files and counted once per
+  (device, inode) in totals and in largest_files, as in full mode; progress_every streams running
+  totals the same way (per directory rather than per file, so events land near each multiple of N).
+- Adding, removing or renaming entries changes a directory's mtime; rewriting an existing file in place
+  does not, so such growth shows up once its directory changes or after a mode="full" run.
+- Directories modified within the last two seconds are not trusted on the next run (same-tick writes).
 
 Dependencies:
-- Internal: utils.file_helpers, utils.formatting, utils.logger
-- External: os
+- Internal: utils.file_helpers, utils.formatting, utils.logger, utils.progress
+- External: os, heapq, hashlib, json, time
 
 Safety:
 - Read-only operation only.
 """
 
+import hashlib
+import heapq
+import json
 import os
+import time
+from utils.constants import Constants
 from utils.file_helpers import FileHelpers
 from utils.logger import get_logger
+from utils.progress import report_progress
 
 meta = {"id": "disk_space", "name": "Disk Space Visualizer"}
 
+INDEX_VERSION = 2
+# Largest files remembered per directory in the incremental index
+DEFAULT_INDEX_TOP_K = 20
+_RACY_WINDOW_NS = 2_000_000_000
+
+
+class _DirTotals:
+    __slots__ = ("path", "depth", "size", "files")
+
+    def __init__(self, path: str, depth: int):
+        self.path = path
+        self.depth = depth
+        self.size = 0
+        self.files = 0
+
+
+def _push_bounded(heap: list, limit: int, item: tuple) -> None:
+    if len(heap) < limit:
+        heapq.heappush(heap, item)
+    elif item > heap[0]:
+        heapq.heapreplace(heap, item)
+
+
+def _fold_totals(dirs: dict[str, _DirTotals], list_depth: int, top_n: int, item_heap: list) -> None:
+    """
+    Fold directory totals into their parents, deepest first, collecting items at `list_depth`.
+    """
+    for node in sorted(dirs.values(), key=lambda n: n.depth, reverse=True):
+        if node.depth == list_depth:
+            _push_bounded(item_heap, top_n, (node.size, node.path, "dir", node.files))
+        if node.depth > 0:
+            parent = dirs.get(os.path.dirname(node.path))
+            if parent is not None:
+                parent.size += node.size
+                parent.files += node.files
+
+
+def build_size_tree(helpers: FileHelpers, root: str, list_depth: int, top_n: int,
+                    exclude=None, progress=None, progress_every: int = 0) -> dict:
+    """
+    Single-pass size aggregation under `root`.
+    Returns {"dirs": {path: _DirTotals}, "items": [(size, path, type, files)], "largest": [(size, path)],
+             "total_size", "total_files", "hardlinks_skipped"}; items/largest are sorted largest first.
+    """
+    root = os.path.abspath(root)
+    prefix = len(root.rstrip(os.sep)) + 1
+    dirs: dict[str, _DirTotals] = {root: _DirTotals(root, 0)}
+    seen_inodes: set[tuple[int, int]] = set()
+    item_heap: list = []
+    largest_heap: list = []
+    running: dict[str, int] = {}
+    total_files = hardlinks_skipped = 0
+
+    for entry in helpers.scan_entries(root, exclude=exclude, include_dirs=True):
+        rel = entry.path[prefix:]
+        depth = rel.count(os.sep) + 1
+        if entry.is_dir:
+            dirs[entry.path] = _DirTotals(entry.path, depth)
+            continue
+        size = 0 if entry.is_symlink else entry.size
+        if entry.nlink > 1 and not entry.is_symlink:
+            key = (entry.device, entry.inode)
+            if key in seen_inodes:
+                hardlinks_skipped += 1
+                size = 0
+            else:
+                seen_inodes.add(key)
+        parent = dirs.get(os.path.dirname(entry.path))
+        if parent is not None:
+            parent.size += size
+            parent.files += 1
+        total_files += 1
+        _push_bounded(largest_heap, top_n, (size, entry.path))
+        if depth == list_depth:
+            _push_bounded(item_heap, top_n, (size, entry.path, "file", 1))
+        if progress is not None and progress_every > 0:
+            top = rel.split(os.sep, 1)[0]
+            running[top] = running.get(top, 0) + size
+            if total_files % progress_every == 0:
+                progress({"files": total_files, "bytes": sum(running.values()), "children": dict(running)})
+
+    _fold_totals(dirs, list_depth, top_n, item_heap)
+    return {
+        "dirs": dirs,
+        "items": sorted(item_heap, reverse=True),
+        "largest": sorted(largest_heap, reverse=True),
+        "total_size": dirs[root].size,
+        "total_files": total_files,
+        "hardlinks_skipped": hardlinks_skipped,
+    }
+
+
+def _index_path(root: str) -> str:
+    digest = hashlib.sha1(os.path.normcase(root).encode("utf-8")).hexdigest()
+    return os.path.join(Constants.DISK_INDEX_DIR, f"{digest}.json")
+
+
+def _load_index(index_path: str) -> dict:
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as exc:
+        get_logger(__name__).warning(f"Ignoring unreadable disk index {index_path}: {exc}")
+        return {}
+
+
+def _scan_record(helpers: FileHelpers, root: str, path: str, exclude, keep: int) -> dict:
+    """
+    List one directory into an index record: own size/count, subdirs, top files, hardlinked files.
+    """
+    own_size = own_files = 0
+    top: list = []
+    links: list[list] = []
+    subdirs: list[str] = []
+    for entry in helpers.scan_dir(path, root=root, exclude=exclude):
+        name = os.path.basename(entry.path)
+        if entry.is_dir:
+            if not entry.is_symlink:
+                subdirs.append(name)
+            continue
+        size = 0 if entry.is_symlink else entry.size
+        own_files += 1
+        if entry.nlink > 1 and not entry.is_symlink:
+            # Sized (and ranked) once per inode when the tree is aggregated
+            links.append([entry.device, entry.inode, size, name])
+        else:
+            own_size += size
+            _push_bounded(top, keep, (size, name))
+    return {"s": own_size, "n": own_files, "d": subdirs, "t": [list(t) for t in sorted(top, reverse=True)], "h": links}
+
+
+def incremental_size_tree(helpers: FileHelpers, root: str, list_depth: int, top_n: int,
+                          exclude=None, index_path: str | None = None, progress=None, progress_every: int = 0) -> dict:
+    """
+    Like build_size_tree, but reuses the persisted per-directory index for directories whose mtime is
+    unchanged and rewrites the index afterwards. Adds "dirs_skipped", "dirs_rescanned" and "index".
+    """
+    root = os.path.abspath(root)
+    index_path = index_path or _index_path(root)
+    keep = max(top_n, DEFAULT_INDEX_TOP_K)
+    old = _load_index(index_path)
+    reusable = (old.get("version") == INDEX_VERSION and old.get("root") == root
+                and old.get("exclude") == exclude and old.get("keep", 0) >= keep)
+    old_dirs: dict[str, dict] = old.get("dirs", {}) if reusable else {}
+    if reusable:
+        keep = old["keep"]
+
+    records: dict[str, dict] = {}
+    dirs: dict[str, _DirTotals] = {}
+    seen_inodes: set[tuple[int, int]] = set()
+    item_heap: list = []
+    largest_heap: list = []
+    running: dict[str, int] = {}
+    skipped = rescanned = total_files = hardlinks_skipped = 0
+    now = time.time_ns()
+    stack = [""]
+    while stack:
+        rel = stack.pop()
+        path = os.path.join(root, rel) if rel else root
+        try:
+            st = os.stat(path)
+        except OSError as exc:
+            get_logger(__name__).warning(f"Cannot stat {path}: {exc}")
+            continue
+        rec = old_dirs.get(rel)
+        if rec is not None and rec.get("m") == st.st_mtime_ns:
+            skipped += 1
+        else:
+            rec = _scan_record(helpers, root, path, exclude, keep)
+            rec["m"] = st.st_mtime_ns if now - st.st_mtime_ns >= _RACY_WINDOW_NS else None
+            rescanned += 1
+        records[rel] = rec
+        stack.extend(os.path.join(rel, name) if rel else name for name in reversed(rec["d"]))
+
+        node = _DirTotals(path, rel.count(os.sep) + 1 if rel else 0)
+        node.size, node.files = rec["s"], rec["n"]
+        files = [(size, name) for size, name in rec["t"]]
+        for device, inode, size, name in rec["h"]:
+            if (device, inode) in seen_inodes:
+                hardlinks_skipped += 1
+                size = 0
+            else:
+                seen_inodes.add((device, inode))
+                node.size += size
+            files.append((size, name))
+        for size, name in files:
+            file_path = os.path.join(path, name)
+            _push_bounded(largest_heap, top_n, (size, file_path))
+            if node.depth + 1 == list_depth:
+                _push_bounded(item_heap, top_n, (size, file_path, "file", 1))
+        dirs[path] = node
+        if progress is not None and progress_every > 0 and rec["n"]:
+            top = rel.split(os.sep, 1)[0] if rel else ""
+            running[top] = running.get(top, 0) + node.size
+            if (total_files + rec["n"]) // progress_every > total_files // progress_every:
+                progress({"files": total_files + rec["n"], "bytes": sum(running.values()),
+                          "children": dict(running)})
+        total_files += rec["n"]
+    _fold_totals(dirs, list_depth, top_n, item_heap)
+
+    res = helpers.atomic_write_json(index_path, {
+        "version": INDEX_VERSION,
+        "root": root,
+        "exclude": exclude,
+        "keep": keep,
+        "updated_at": int(time.time()),
+        "dirs": records,
+    }, indent=None)
+    if not res.get("success", False):
+        get_logger(__name__).warning(f"Failed to save disk index {index_path}: {res.get('message')}")
+
+    return {
+        "dirs": dirs,
+        "items": sorted(item_heap, reverse=True),
+        "largest": sorted(largest_heap, reverse=True),
+        "total_size": dirs[root].size if root in dirs else 0,
+        "total_files": total_files,
+        "hardlinks_skipped": hardlinks_skipped,
+        "dirs_skipped": skipped,
+        "dirs_rescanned": rescanned,
+        "index": index_path,
+    }
+
 
 def run(args: dict | None = None, ctx: dict | None = None) -> dict:
     logger = get_logger(__name__)
@@ -34,40 +289,64 @@ def run(args: dict | None = None, ctx: dict | None = None) -> dict:
     args = args or {}
     path = args.get("path", ".")
     top_n = int(args.get("top_n", 20))
-    depth = args.get("depth")
+    depth = max(1, int(args.get("depth") or 1))
     human_readable = bool(args.get("human_readable", True))
+    exclude = args.get("exclude")
+    progress_every = int(args.get("progress_every", 0))
+    mode = args.get("mode", "full")
 
     if not os.path.isdir(path):
         return {"success": False, "data": None, "message": f"Invalid directory: {path}"}
+    if mode not in {"full", "incremental"}:
+        return {"success": False, "data": None, "message": f"Unsupported mode: {mode}"}
 
-    items: list[tuple[str, int]] = []
+    def _progress(event: dict) -> None:
+        report_progress(ctx, {"feature": "disk_space", "path": path, **event})
 
     try:
-        with os.scandir(path) as it:
-            for entry in it:
-                try:
-                    size = 0
-                    if entry.is_file(follow_symlinks=False):
-                        size = entry.stat().st_size
-                    elif entry.is_dir(follow_symlinks=False):
-                        size = helpers.folder_size(entry.path, depth=depth)
-                    items.append((entry.path, size))
-                except Exception:
-                    logger.exception(f"Failed to stat/size {entry.path}")
+        if mode == "incremental":
+            tree = incremental_size_tree(helpers, path, depth, top_n, exclude=exclude, progress=_progress,
+                                         progress_every=progress_every)
+        else:
+            tree = build_size_tree(helpers, path, depth, top_n, exclude=exclude, progress=_progress,
+                                   progress_every=progress_every)
     except Exception as exc:
+        logger.exception(f"Failed to size {path}")
         return {"success": False, "data": None, "message": str(exc)}
 
-    items.sort(key=lambda t: t[1], reverse=True)
-    items = items[:top_n]
+    def _hr(size: int) -> str | None:
+        try:
+            return formatting.human_readable_size(size)
+        except Exception:
+            return None
 
     result_rows: list[dict] = []
-    for p, s in items:
-        row = {"path": p, "size": s}
+    for s, p, kind, files in tree["items"]:
+        row = {"path": p, "size": s, "type": kind, "files": files}
         if human_readable and formatting:
-            try:
-                row["size_hr"] = formatting.human_readable_size(s)
-            except Exception:
-                row["size_hr"] = None
+            row["size_hr"] = _hr(s)
         result_rows.append(row)
 
-    return {"success": True, "data": result_rows, "message": None}
+    largest_files = []
+    for s, p in tree["largest"]:
+        row = {"path": p, "size": s}
+        if human_readable and formatting:
+            row["size_hr"] = _hr(s)
+        largest_files.append(row)
+
+    return {
+        "success": True,
+        "data": result_rows,
+        "message": None,
+        "metadata": {
+            "total_size": tree["total_size"],
+            "total_files": tree["total_files"],
+            "directories": len(tree["dirs"]),
+            "hardlinks_skipped": tree["hardlinks_skipped"],
+            "largest_files": largest_files,
+            "mode": mode,
+            "dirs_skipped": tree.get("dirs_skipped", 0),
+            "dirs_rescanned": tree.get("dirs_rescanned", len(tree["dirs"])),
+            "index": tree.get("index"),
+        },
+    }
@@ -6,8 +6,23 @@ Purpose:
 
 API:
 - run(args: dict = None, ctx: dict = None) -> dict
-    - args: {"path": str, "algorithm": "md5"|"sha256", "min_size": int, "action": "report"|"move"|"delete", "target": str|None, "dry_run": bool}
-    - return: {"success": True, "data": [{"hash": str, "files": [paths]}], "message": str}
+    - args: {"path": str, "algorithm": "md5"|"sha256"|"blake2b-64"|"xxh3-64"|"fast", "min_size": int, "action": "report"|"move"|"delete", "target": str|None, "dry_run": bool,
+             "partial_kib": int, "use_cache": bool, "workers": int|None, "exclude": list[str]|None, "scan_workers": int}
+    - return: {"success": True, "data": {"groups": [{"hash": str, "files": [paths]}], "actions": [...], "stages": [...], "bytes_read": int,
+               "hash_cache": {"hits": int, "misses": int, "evicted": int}}, "message": str}
+
+Pipeline:
+- Files come from FileHelpers.scan_entries (one stat per file; `exclude` globs prune directories,
+  `scan_workers` > 1 lists directories in parallel for network shares).
+- Stage 1 (size): group files by size from that stat; unique sizes cannot have duplicates.
+- Stage 2 (partial_hash): hash the first/last `partial_kib` KiB of each size collision.
+- Stage 3 (full_hash): full-hash only files whose partial digests still collide.
+- Each stage reports candidates in, eliminated and remaining in data["stages"].
+- Hashing runs on FileHelpers.file_hash_many's bounded thread pool (workers, default from CPU count).
+- "blake2b-64"/"xxh3-64"/"fast" are non-cryptographic speed modes (see FileHelpers.resolve_algorithm);
+  a 64-bit collision would also have to share the file size and head/tail bytes to matter.
+- Partial and full digests go through the shared hash cache (use_cache, default True), so unchanged
+  files are not re-read on later runs.
 
 Dependencies:
 - Internal: utils.file_helpers, utils.logger, utils.formatting
@@ -19,9 +34,84 @@ Safety:
 
 import os
 from collections import defaultdict
-from utils.file_helpers import FileHelpers
+from utils.file_helpers import FileEntry, FileHelpers, resolve_algorithm
 from utils.logger import get_logger
 
+SUPPORTED_ALGORITHMS = {"sha256", "md5", "blake2b-64", "xxh3-64", "fast"}
+
+# Bytes hashed from each end of a file in the partial-hash stage
+DEFAULT_PARTIAL_KIB = 64
+
+
+def _stage(name: str, candidates: int, remaining: int, bytes_read: int = 0) -> dict:
+    return {
+        "stage": name,
+        "candidates": candidates,
+        "eliminated": candidates - remaining,
+        "remaining": remaining,
+        "bytes_read": bytes_read,
+    }
+
+
+def _find_groups(helpers: FileHelpers, entries, algorithm: str, min_size: int, edge_size: int,
+                 use_cache: bool, workers: int | None, logger) -> tuple[list[dict], list[dict]]:
+    """
+    Run the size -> partial hash -> full hash pipeline over FileEntry objects.
+    Returns (groups, stages); groups and their files keep directory walk order.
+    """
+    order: dict[str, int] = {}
+    by_size: dict[int, list[FileEntry]] = defaultdict(list)
+    for entry in entries:
+        if entry.size < min_size:
+            continue
+        order[entry.path] = len(order)
+        by_size[entry.size].append(entry)
+
+    stages: list[dict] = []
+    candidates_in = [entry for same in by_size.values() if len(same) > 1 for entry in same]
+    stages.append(_stage("size", len(order), len(candidates_in)))
+
+    # Stage 2: partial hashes. Small files are read whole here, so their digest is already final.
+    by_partial: dict[tuple[int, str], list[FileEntry]] = defaultdict(list)
+    hashed_before = helpers.bytes_hashed
+    for entry, digest in helpers.file_hash_many(candidates_in, algorithm=algorithm, workers=workers,
+                                                use_cache=use_cache, edge_size=edge_size):
+        if isinstance(digest, Exception):
+            logger.error(f"Failed hashing {entry.path}: {digest}")
+            continue
+        by_partial[(entry.size, digest)].append(entry)
+
+    final: dict[str, list[str]] = defaultdict(list)
+    survivors: list[FileEntry] = []
+    for (size, digest), same in by_partial.items():
+        if len(same) < 2:
+            continue
+        if size <= 2 * edge_size:
+            final[digest].extend(entry.path for entry in same)
+        else:
+            survivors.extend(same)
+    remaining = sum(len(files) for files in final.values()) + len(survivors)
+    stages.append(_stage("partial_hash", len(candidates_in), remaining, helpers.bytes_hashed - hashed_before))
+
+    # Stage 3: full hashes for the survivors only
+    by_full: dict[str, list[str]] = defaultdict(list)
+    hashed_before = helpers.bytes_hashed
+    for entry, digest in helpers.file_hash_many(survivors, algorithm=algorithm, workers=workers, use_cache=use_cache):
+        if isinstance(digest, Exception):
+            logger.error(f"Failed hashing {entry.path}: {digest}")
+            continue
+        by_full[digest].append(entry.path)
+    full_remaining = 0
+    for digest, same in by_full.items():
+        if len(same) > 1:
+            final[digest].extend(same)
+            full_remaining += len(same)
+    stages.append(_stage("full_hash", len(survivors), full_remaining, helpers.bytes_hashed - hashed_before))
+
+    groups = [{"hash": h, "files": sorted(files, key=order.__getitem__)} for h, files in final.items() if len(files) > 1]
+    groups.sort(key=lambda g: order[g["files"][0]])
+    return groups, stages
+
 
 def run(args: dict | None = None, ctx: dict | None = None) -> dict:
     logger = get_logger(__name__)
@@ -34,13 +124,24 @@ def run(args: dict | None = None, ctx: dict | None = None) -> dict:
     action = args.get("action", "report")
     target_in = args.get("target")
     dry_run = bool(args.get("dry_run", True))
+    edge_size = int(args.get("partial_kib", DEFAULT_PARTIAL_KIB)) * 1024
+    use_cache = bool(args.get("use_cache", True))
+    workers = args.get("workers")
+    exclude = args.get("exclude")
+    scan_workers = int(args.get("scan_workers", 1))
 
     if not path or not os.path.isdir(path):
         return {"success": False, "data": None, "message": f"Invalid directory: {path}"}
-    if algorithm not in {"sha256", "md5"}:
+    if algorithm not in SUPPORTED_ALGORITHMS:
         return {"success": False, "data": None, "message": f"Unsupported algorithm: {algorithm}"}
+    try:
+        algorithm = resolve_algorithm(algorithm)
+    except ValueError as exc:
+        return {"success": False, "data": None, "message": str(exc)}
     if action not in {"report", "move", "delete"}:
         return {"success": False, "data": None, "message": f"Unsupported action: {action}"}
+    if edge_size <= 0:
+        return {"success": False, "data": None, "message": "partial_kib must be positive"}
 
     target: str | None = None
     if action == "move":
@@ -49,19 +150,11 @@ def run(args: dict | None = None, ctx: dict | None = None) -> dict:
         target = target_in
         os.makedirs(target, exist_ok=True)
 
-    hash_to_files: dict[str, list[str]] = defaultdict(list)
-
-    for file_path in helpers.iterate_files(path):
-        try:
-            if os.path.getsize(file_path) < min_size:
-                continue
-            file_hash = helpers.file_hash(file_path, algorithm=algorithm)
-            hash_to_files[file_hash].append(file_path)
-        except Exception:
-            logger.exception(f"Failed hashing {file_path}")
-
-    groups = [{"hash": h, "files": files} for h, files in hash_to_files.items() if len(files) > 1]
-
+    try:
+        entries = helpers.scan_entries(path, exclude=exclude, workers=scan_workers)
+        groups, stages = _find_groups(helpers, entries, algorithm, min_size, edge_size, use_cache, workers, logger)
+    finally:
+        helpers.close_hash_cache()
     # Apply actions on duplicates (keep first, act on rest)
     acted: list[dict] = []
     if action in {"move", "delete"} and groups:
@@ -89,6 +182,13 @@ def run(args: dict | None = None, ctx: dict | None = None) -> dict:
 
     return {
         "success": True,
-        "data": {"groups": groups, "actions": acted},
+        "data": {
+            "groups": groups,
+            "actions": acted,
+            "stages": stages,
+            "bytes_read": sum(stage["bytes_read"] for stage in stages),
+            "algorithm": algorithm,
+            "hash_cache": helpers.hash_cache_stats(),
+        },
         "message": None,
     }
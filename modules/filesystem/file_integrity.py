@@ -6,76 +6,356 @@ Purpose:
 
 API:
 - run(args: dict = None, ctx: dict = None) -> dict
-    - args: {"path": str, "action":"generate"|"verify", "out": str|None, "algorithm":"sha256"}
-    - return: {"success": True, "data": {"mismatches": [...]} , "message": None}
+    - args: {"path": str, "action":"generate"|"verify", "out": str|None, "algorithm":"sha256"|"blake2b-64"|"fast"|..., "use_cache": bool,
+             "workers": int|None, "exclude": list[str]|None, "mode": "full"|"quick", "max_bytes_per_sec": int|None,
+             "merkle": bool, "subdir": str|None, "against": str|None, "root_hash": str|None}
+      action may also be "diff" (Merkle manifests only)
+    - return: {"success": True, "data": {"mismatches": [...], "checked": int, "bytes_hashed": int, "mode": str,
+               "hash_cache": {...}} , "message": None}
+      mismatch "issue" values: "missing", "untracked", "hash_mismatch", "hash_error" (full mode),
+      "size_mismatch", "mtime_mismatch" (quick mode). "untracked" (a file on disk that the manifest does
+      not list) is new with JSONL manifests; the old checksums.json verify only reported missing and
+      changed files.
+    - message is None, except when the default manifest name is involved in the checksums.json ->
+      checksums.jsonl migration: generate then says that a legacy checksums.json next to the new
+      manifest is no longer updated, and verify says when it read a legacy checksums.json.
+
+Files are listed with FileHelpers.scan_entries (one stat per file, `exclude` globs prune directories) and
+hashed on FileHelpers.file_hash_many's bounded thread pool (workers, default from CPU count).
+
+Manifest format:
+- Manifests are streamed JSONL (utils.manifest): a header line with the algorithm, then one sorted
+  record per file with path, size, mtime_ns and hash. The default is <path>/checksums.jsonl.
+- Generate walks in sorted order and writes records as hashes complete, in order; verify merge-joins
+  the manifest with a sorted walk. Memory stays flat regardless of tree size.
+- Verify reports "missing" (in manifest, not on disk), "untracked" (on disk, not in manifest),
+  "hash_mismatch" and "hash_error".
+- Legacy checksums.json manifests are still verified; without `out`, verify falls back to one when no
+  checksums.jsonl exists. The manifest files themselves are never listed.
+- Verify uses the manifest's algorithm unless `algorithm` is given.
+
+Merkle trees:
+- generate with merkle=True also writes <manifest>.tree (utils.merkle): one digest per directory over
+  its files' and subdirectories' digests, plus the byte span of its own records in the manifest.
+- action="diff" compares the manifest's tree with `against` (another Merkle manifest, e.g. from a
+  replica) or, without it, with a fresh rescan of `path` (hash cache on by default). Identical
+  subtrees are skipped by digest, so reading and comparing is proportional to what changed. Returns
+  "added" / "removed" / "changed" entries.
+- action="verify" with subdir="a/b" rehashes only that subtree, reports differences against the stored
+  subtree, and recomputes the root digest from the live subtree digest and the stored siblings on the
+  path; "root_verified" is True when it equals the stored root (or the `root_hash` argument).
+
+Verify modes:
+- "full" (default): rehash every tracked file on the bounded worker pool and compare digests.
+- "quick": compare only the size and mtime_ns recorded in the manifest against the walk's stat
+  ("size_mismatch" / "mtime_mismatch"); nothing is read. Legacy manifests carry no stat data, so
+  they only support "full".
+- Each mismatch is streamed through utils.progress.report_progress as soon as it is found
+  ({"feature": "file_integrity", "event": "mismatch", ...}) and also collected in the result.
+- max_bytes_per_sec caps the combined read rate of all hashing workers (utils.throttle), so audits
+  can run during working hours; it applies to generate as well. It must be a positive number (or None
+  for no cap); anything else is rejected before any file is read.
+
+Hash cache:
+- Digests go through the shared hash cache in utils.hash_cache. It is on by default for generate.
+- For verify it is off by default: a cache hit only proves size/mtime are unchanged, which cannot
+  detect silent corruption. Pass use_cache=True for fast change detection instead of a full audit.
 
 Dependencies:
-- Internal: utils.file_helpers, utils.config_manager, utils.logger
-- External: hashlib, json, os
+- Internal: utils.file_helpers, utils.manifest, utils.merkle, utils.logger, utils.progress
+- External: collections, os, tempfile
 
 Safety:
 - Verification is read-only.
 """
 
 import os
-from utils.file_helpers import FileHelpers
+import tempfile
+from collections import deque
+from utils.file_helpers import FileHelpers, resolve_algorithm
 from utils.logger import get_logger
+from utils.manifest import (LEGACY_MANIFEST_NAME, MANIFEST_NAME, ManifestWriter, merge_walk, open_manifest,
+                            to_rel)
+from utils.merkle import TREE_SUFFIX, MerkleTree, diff_trees, dir_digest
+from utils.progress import report_progress
+
+
+def _manifest_files(root: str, manifest_path: str) -> set[str]:
+    """
+    Root-relative paths of manifest files (and their temp files) that must not be checksummed.
+    """
+    paths = {os.path.abspath(manifest_path), os.path.join(root, MANIFEST_NAME), os.path.join(root, LEGACY_MANIFEST_NAME)}
+    skip = set()
+    for p in paths:
+        for candidate in (p, f"{p}.tmp", f"{p}{TREE_SUFFIX}", f"{p}{TREE_SUFFIX}.tmp"):
+            rel = to_rel(candidate, root)
+            if not rel.startswith("../"):
+                skip.add(rel)
+    return skip
+
+
+def _walk(helpers: FileHelpers, root: str, exclude, skip: set[str]):
+    prefix = len(root.rstrip(os.sep)) + 1
+    for entry in helpers.scan_entries(root, exclude=exclude, sort=True):
+        if entry.path[prefix:].replace(os.sep, "/") not in skip:
+            yield entry
+
+
+def _write_manifest(helpers: FileHelpers, root: str, out_path: str, algorithm: str, exclude, workers, use_cache: bool,
+                    merkle: bool, skip: set[str], logger) -> tuple[ManifestWriter, int]:
+    """
+    Hash every file under `root` in sorted order and stream the records into `out_path`.
+    Returns (closed writer with count/root_hash, number of files that failed to hash).
+    """
+    entries = _walk(helpers, root, exclude, skip)
+    results = helpers.file_hash_many(entries, algorithm=algorithm, workers=workers, use_cache=use_cache, ordered=True)
+    errors = 0
+    with ManifestWriter(out_path, algorithm, root=root, merkle=merkle) as writer:
+        for entry, digest in results:
+            if isinstance(digest, Exception):
+                logger.error(f"Hash failed for {entry.path}: {digest}")
+                errors += 1
+                continue
+            writer.write(to_rel(entry.path, root), entry.size, entry.mtime_ns, digest)
+    return writer, errors
+
+
+def _rescan_tree(helpers: FileHelpers, root: str, tmp_dir: str, algorithm: str, exclude, workers, use_cache: bool,
+                 skip: set[str], logger) -> MerkleTree:
+    """
+    Build a fresh Merkle manifest of `root` in `tmp_dir` (the hash cache makes unchanged files cheap).
+    """
+    out_path = os.path.join(tmp_dir, MANIFEST_NAME)
+    _write_manifest(helpers, root, out_path, algorithm, exclude, workers, use_cache, True, skip, logger)
+    return MerkleTree.load(out_path)
+
+
+def _load_tree(manifest_path: str) -> MerkleTree:
+    if not os.path.isfile(manifest_path + TREE_SUFFIX):
+        raise ValueError(f"No Merkle tree for {manifest_path}; generate it with merkle=True")
+    return MerkleTree.load(manifest_path)
+
+
+def _chain_root(tree: MerkleTree, subdir: str, subdir_hash: str) -> str:
+    """
+    Recompute the root digest from `subdir_hash`, using the stored siblings and own files of each ancestor.
+    """
+    digest, child = subdir_hash, subdir
+    while child:
+        parent, _, name = child.rpartition("/")
+        record = tree.dirs[parent]
+        files = [(r["path"].rpartition("/")[2], r["hash"]) for r in tree.files(parent)]
+        dirs = [(d, digest if d == name else tree.dirs[f"{parent}/{d}" if parent else d]["hash"]) for d in record["dirs"]]
+        digest = dir_digest(tree.algorithm, files, dirs)
+        child = parent
+    return digest
+
+
+def _find_manifest(root: str, out) -> str:
+    if isinstance(out, str) and out:
+        return out
+    manifest_path = os.path.join(root, MANIFEST_NAME)
+    if not os.path.isfile(manifest_path) and os.path.isfile(os.path.join(root, LEGACY_MANIFEST_NAME)):
+        return os.path.join(root, LEGACY_MANIFEST_NAME)
+    return manifest_path
+
+
+def _migration_message(root: str, out, action: str) -> str | None:
+    """
+    Note for callers still expecting the pre-JSONL default manifest name, or None.
+    """
+    if isinstance(out, str) and out:
+        return None
+    legacy = os.path.join(root, LEGACY_MANIFEST_NAME)
+    if not os.path.isfile(legacy):
+        return None
+    if action == "generate":
+        return (f"Manifest written to {MANIFEST_NAME} (the default changed from {LEGACY_MANIFEST_NAME}); "
+                f"the existing {legacy} was left untouched and is no longer updated")
+    if not os.path.isfile(os.path.join(root, MANIFEST_NAME)):
+        return (f"Verified the legacy {LEGACY_MANIFEST_NAME}; run generate to migrate to {MANIFEST_NAME}, "
+                f"which also records size/mtime for quick verify")
+    return None
 
 
 def run(args: dict | None = None, ctx: dict | None = None) -> dict:
     logger = get_logger(__name__)
-    helpers = FileHelpers()
-
     args = args or {}
     path = args.get("path")
     action = args.get("action", "generate")
-    algorithm = args.get("algorithm", "sha256")
+    algorithm = args.get("algorithm")
     out = args.get("out")
+    use_cache = bool(args.get("use_cache", action in ("generate", "diff")))
+    workers = args.get("workers")
+    exclude = args.get("exclude")
+    mode = args.get("mode", "full")
+    max_bytes_per_sec = args.get("max_bytes_per_sec")
+    merkle = bool(args.get("merkle", False))
+    subdir = (args.get("subdir") or "").replace(os.sep, "/").strip("/")
 
     if not path or not os.path.isdir(path):
         return {"success": False, "data": None, "message": f"Invalid directory: {path}"}
+    root = os.path.abspath(path)
+    if mode not in {"full", "quick"}:
+        return {"success": False, "data": None, "message": f"Unsupported mode: {mode}"}
+    if max_bytes_per_sec is not None and (isinstance(max_bytes_per_sec, bool)
+                                          or not isinstance(max_bytes_per_sec, (int, float))
+                                          or not max_bytes_per_sec > 0):
+        return {"success": False, "data": None,
+                "message": f"max_bytes_per_sec must be a positive number: {max_bytes_per_sec!r}"}
+    helpers = FileHelpers(max_bytes_per_sec=max_bytes_per_sec)
 
-    manifest: dict[str, str] = {}
     if action == "generate":
-        for file_path in helpers.iterate_files(path):
-            try:
-                rel = os.path.relpath(file_path, start=path)
-                manifest[rel] = helpers.file_hash(file_path, algorithm=algorithm)
-            except Exception:
-                logger.exception(f"Hash failed for {file_path}")
-        # Determine output
-        out_path = out if isinstance(out, str) and out else os.path.join(path, "checksums.json")
-        res = helpers.atomic_write_json(out_path, manifest)
-        if not res.get("success", False):
-            return {"success": False, "data": None, "message": res.get("message", "write failed")}
-        return {"success": True, "data": {"manifest": out_path, "count": len(manifest)}, "message": None}
+        try:
+            algorithm = resolve_algorithm(algorithm or "sha256")
+        except ValueError as exc:
+            return {"success": False, "data": None, "message": str(exc)}
+        out_path = out if isinstance(out, str) and out else os.path.join(root, MANIFEST_NAME)
+        try:
+            writer, errors = _write_manifest(helpers, root, out_path, algorithm, exclude, workers, use_cache, merkle,
+                                     _manifest_files(root, out_path), logger)
+        except OSError as exc:
+            return {"success": False, "data": None, "message": f"Failed to write manifest: {exc}"}
+        finally:
+            helpers.close_hash_cache()
+        data = {"manifest": out_path, "count": writer.count, "errors": errors,
+                "hash_cache": helpers.hash_cache_stats()}
+        if merkle:
+            data["root_hash"] = writer.root_hash
+        return {"success": True, "data": data, "message": _migration_message(root, out, "generate")}
+
+    elif action == "diff":
+        manifest_path = _find_manifest(root, out)
+        against = args.get("against")
+        stats: dict = {}
+        try:
+            stored = _load_tree(manifest_path)
+            if against:
+                other = _load_tree(against)
+                if other.algorithm != stored.algorithm:
+                    return {"success": False, "data": None,
+                            "message": f"Algorithms differ: {stored.algorithm} vs {other.algorithm}"}
+                changes = list(diff_trees(stored, other, stats=stats))
+            else:
+                with tempfile.TemporaryDirectory(prefix="integrity-") as tmp_dir:
+                    other = _rescan_tree(helpers, root, tmp_dir, stored.algorithm, exclude, workers, use_cache,
+                                         _manifest_files(root, manifest_path), logger)
+                    changes = list(diff_trees(stored, other, stats=stats))
+        except (OSError, ValueError, KeyError) as exc:
+            return {"success": False, "data": None, "message": f"Diff failed: {exc}"}
+        finally:
+            helpers.close_hash_cache()
+        for change in changes:
+            report_progress(ctx, {"feature": "file_integrity", "event": "mismatch", **change})
+        return {
+            "success": True,
+            "data": {"changes": changes, "identical": not changes, "root_hash": stored.root_hash,
+                     "other_root_hash": other.root_hash, **stats, "hash_cache": helpers.hash_cache_stats()},
+            "message": None,
+        }
+
+    elif action == "verify" and subdir:
+        manifest_path = _find_manifest(root, out)
+        sub_root = os.path.join(root, *subdir.split("/"))
+        if not os.path.isdir(sub_root):
+            return {"success": False, "data": None, "message": f"Invalid subdirectory: {subdir}"}
+        try:
+            stored = _load_tree(manifest_path)
+            stored_record = stored.dirs.get(subdir)
+            skip = {rel[len(subdir) + 1:] for rel in _manifest_files(root, manifest_path) if rel.startswith(subdir + "/")}
+            with tempfile.TemporaryDirectory(prefix="integrity-") as tmp_dir:
+                live = _rescan_tree(helpers, sub_root, tmp_dir, stored.algorithm, exclude, workers, use_cache, skip,
+                                    logger)
+                changes = list(diff_trees(stored, live, a_root=subdir, b_root=""))
+            stored_hash = stored_record["hash"] if stored_record else None
+            recomputed_root = _chain_root(stored, subdir, live.root_hash) if stored_record else None
+        except (OSError, ValueError, KeyError) as exc:
+            return {"success": False, "data": None, "message": f"Subtree verify failed: {exc}"}
+        finally:
+            helpers.close_hash_cache()
+        expected_root = args.get("root_hash") or stored.root_hash
+        mismatches = [{**change, "path": f"{subdir}/{change['path']}"} for change in changes]
+        for mismatch in mismatches:
+            report_progress(ctx, {"feature": "file_integrity", "event": "mismatch", **mismatch})
+        return {
+            "success": True,
+            "data": {"mismatches": mismatches, "subdir": subdir, "subdir_hash": stored_hash,
+                     "live_hash": live.root_hash, "root_hash": expected_root, "recomputed_root_hash": recomputed_root,
+                     "root_verified": recomputed_root == expected_root, "hash_cache": helpers.hash_cache_stats()},
+            "message": None,
+        }
 
     elif action == "verify":
-        manifest_path = out if isinstance(out, str) and out else os.path.join(path, "checksums.json")
+        manifest_path = _find_manifest(root, out)
         if not os.path.isfile(manifest_path):
             return {"success": False, "data": None, "message": f"Manifest not found: {manifest_path}"}
         try:
-            import json
-            with open(manifest_path, "r", encoding="utf-8") as f:
-                manifest = json.load(f)
+            reader = open_manifest(manifest_path)
         except Exception as exc:
             return {"success": False, "data": None, "message": f"Failed to read manifest: {exc}"}
 
-        mismatches: list[dict] = []
-        for rel, expected in manifest.items():
-            abs_path = os.path.join(path, rel)
-            if not os.path.exists(abs_path):
-                mismatches.append({"path": rel, "issue": "missing"})
-                continue
+        with reader:
             try:
-                actual = helpers.file_hash(abs_path, algorithm=algorithm)
-                if actual != expected:
-                    mismatches.append({"path": rel, "issue": "hash_mismatch", "expected": expected, "actual": actual})
-            except Exception:
-                logger.exception(f"Hash failed for {abs_path}")
-                mismatches.append({"path": rel, "issue": "hash_error"})
-
-        return {"success": True, "data": {"mismatches": mismatches}, "message": None}
+                if algorithm and reader.algorithm and resolve_algorithm(algorithm) != reader.algorithm:
+                    return {"success": False, "data": None,
+                            "message": f"Manifest was generated with {reader.algorithm}, not {algorithm}"}
+                algorithm = resolve_algorithm(algorithm or reader.algorithm or "sha256")
+            except ValueError as exc:
+                return {"success": False, "data": None, "message": str(exc)}
+            if mode == "quick" and reader.legacy:
+                return {"success": False, "data": None,
+                        "message": "Legacy manifests have no size/mtime data; use mode='full'"}
+
+            skip = _manifest_files(root, manifest_path)
+            records = (rec for rec in reader if rec.path not in skip)
+            mismatches: list[dict] = []
+            expected: deque = deque()
+            checked = 0
+
+            def _report(mismatch: dict) -> None:
+                mismatches.append(mismatch)
+                report_progress(ctx, {"feature": "file_integrity", "event": "mismatch", **mismatch})
+
+            def _to_hash():
+                nonlocal checked
+                for rel, rec, entry in merge_walk(records, _walk(helpers, root, exclude, skip), root):
+                    if entry is None:
+                        _report({"path": rel, "issue": "missing"})
+                    elif rec is None:
+                        _report({"path": rel, "issue": "untracked"})
+                    elif mode == "quick":
+                        checked += 1
+                        if entry.size != rec.size:
+                            _report({"path": rel, "issue": "size_mismatch", "expected": rec.size, "actual": entry.size})
+                        elif entry.mtime_ns != rec.mtime_ns:
+                            _report({"path": rel, "issue": "mtime_mismatch", "expected": rec.mtime_ns,
+                                     "actual": entry.mtime_ns})
+                    else:
+                        expected.append(rec)
+                        yield entry
+
+            try:
+                results = helpers.file_hash_many(_to_hash(), algorithm=algorithm, workers=workers,
+                                                 use_cache=use_cache, ordered=True)
+                for entry, actual in results:
+                    rec = expected.popleft()
+                    checked += 1
+                    if isinstance(actual, Exception):
+                        logger.error(f"Hash failed for {entry.path}: {actual}")
+                        _report({"path": rec.path, "issue": "hash_error"})
+                    elif actual != rec.hash:
+                        _report({"path": rec.path, "issue": "hash_mismatch", "expected": rec.hash, "actual": actual})
+            except ValueError as exc:
+                return {"success": False, "data": None, "message": f"Failed to read manifest: {exc}"}
+            finally:
+                helpers.close_hash_cache()
+
+        return {
+            "success": True,
+            "data": {"mismatches": mismatches, "checked": checked, "bytes_hashed": helpers.bytes_hashed, "mode": mode,
+                     "hash_cache": helpers.hash_cache_stats()},
+            "message": _migration_message(root, out, "verify"),
+        }
 
     else:
         return {"success": False, "data": None, "message": f"Unsupported action: {action}"}
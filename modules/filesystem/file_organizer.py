@@ -2,25 +2,172 @@
 File Organizer feature.
 
 Purpose:
-- Organize files in a directory into subfolders based on extension rules defined in config/file_organizer.json.
+- Organize files in a directory into subfolders based on rules defined in config/file_organizer.json.
 
 API:
 - run(args: dict = None, ctx: dict = None) -> dict
-    - args: {"path": str, "config": str|None, "dry_run": bool, "overwrite": bool}
-    - return: {"success": True, "data": {"moved": [{"src":dst}]}, "message": None}
+    - args: {"path": str, "config": str|None, "rules": dict|list|None, "dry_run": bool, "overwrite": bool,
+             "recursive": bool}
+    - return: {"success": True, "data": {"moved": [{"src":dst}], "summary": {"matched", "moved", "skipped",
+               "renamed_fast", "copied", "by_folder": {folder: int}}}, "message": None}
+
+Rules:
+- The legacy format maps extensions to folders: {"jpg": "Images", "pdf": "Documents"}.
+- The rule format is {"rules": [...]} (or a bare list), checked in order; the first match wins:
+    {"folder": "Logs", "glob": "*.log*"}            name glob (or list of globs)
+    {"folder": "Invoices", "regex": "^INV-\\d+"}    regex searched in the file name
+    {"folder": "Images", "ext": ["jpg", "png"]}     extensions, case-insensitive
+    {"folder": "Big", "min_size": 1073741824}       size bounds in bytes (min_size / max_size)
+    {"folder": "Old", "min_age_days": 365}          age bounds by mtime (min_age_days / max_age_days)
+  Criteria in one rule are ANDed. Legacy ext keys may be mixed into the rule format's top level.
+- `rules` in args overrides the config file.
+
+Implementation notes:
+- RuleSet compiles rules once: globs of the form "*.ext" become extension constraints, other globs and
+  regexes become compiled patterns, and a dispatch index maps each extension to the ordered rules that
+  can match it, so a file is only tested against its candidates.
+- recursive=True also organizes files in subfolders (top-level rule destination folders are not
+  descended). Files are listed with scandir (FileHelpers.scan_dir / scan_entries), one stat each.
+- Each destination directory is created (and listed, for collision checks) once per run; dry runs
+  create nothing.
+- Files move with a single rename when source and destination are on the same device, falling back
+  to FileHelpers.safe_move (copy + delete) across devices. Without overwrite the rename is
+  FileHelpers.rename_noreplace, which refuses an existing destination atomically: the per-destination
+  name set only saves work, it does not protect files created after it was listed or names that differ
+  only in case on case-insensitive filesystems.
 
 Dependencies:
 - Internal: utils.file_helpers, utils.config_manager, utils.formatting, utils.logger
-- External: os, shutil
+- External: os, errno, fnmatch, re, time
 
 Safety:
 - Never overwrite files unless overwrite arg set and confirmed.
 """
 
+import errno
+import fnmatch
 import os
+import re
+import time
 from utils.file_helpers import FileHelpers
 from utils.logger import get_logger
 
+_SIMPLE_EXT_GLOB = re.compile(r"^\*\.([^*?\[\].]+)$")
+
+
+class _Rule:
+    __slots__ = ("index", "folder", "exts", "pattern", "min_size", "max_size", "min_mtime_ns", "max_mtime_ns")
+
+    def __init__(self, index: int, folder: str, spec: dict, now_ns: int):
+        self.index = index
+        self.folder = folder
+        exts = spec.get("ext") or spec.get("exts")
+        if isinstance(exts, str):
+            exts = [exts]
+        self.exts = {e.lower().lstrip(".") for e in exts} if exts else None
+
+        globs = spec.get("glob")
+        globs = [globs] if isinstance(globs, str) else list(globs or [])
+        simple = [_SIMPLE_EXT_GLOB.match(g) for g in globs]
+        if globs and all(simple) and self.exts is None:
+            # "*.log" globs are plain extension rules and go through the dispatch index
+            self.exts = {m.group(1).lower() for m in simple}
+            globs = []
+        parts = []
+        if globs:
+            parts.append("(?i:" + "|".join(fnmatch.translate(g) for g in globs) + ")")
+        if spec.get("regex"):
+            parts.append(f".*?(?:{spec['regex']})")
+        self.pattern = re.compile("".join(f"(?={p})" for p in parts)) if parts else None
+
+        self.min_size = spec.get("min_size")
+        self.max_size = spec.get("max_size")
+        day_ns = 86400 * 1_000_000_000
+        # Older than min_age_days means mtime <= now - min_age
+        self.max_mtime_ns = now_ns - int(spec["min_age_days"] * day_ns) if spec.get("min_age_days") is not None else None
+        self.min_mtime_ns = now_ns - int(spec["max_age_days"] * day_ns) if spec.get("max_age_days") is not None else None
+
+    def matches(self, name: str, size: int, mtime_ns: int) -> bool:
+        if self.min_size is not None and size < self.min_size:
+            return False
+        if self.max_size is not None and size > self.max_size:
+            return False
+        if self.max_mtime_ns is not None and mtime_ns > self.max_mtime_ns:
+            return False
+        if self.min_mtime_ns is not None and mtime_ns < self.min_mtime_ns:
+            return False
+        if self.pattern is not None and not self.pattern.match(name):
+            return False
+        return True
+
+
+class RuleSet:
+    """
+    Compiled organizer rules with an extension dispatch index.
+    """
+
+    def __init__(self, config):
+        now_ns = time.time_ns()
+        specs: list[dict] = []
+        if isinstance(config, list):
+            specs = [s for s in config if isinstance(s, dict)]
+        elif isinstance(config, dict):
+            for key, value in config.items():
+                if key == "rules" and isinstance(value, list):
+                    specs.extend(s for s in value if isinstance(s, dict))
+                elif isinstance(value, str):
+                    specs.append({"ext": [key], "folder": value})
+        self.rules = [_Rule(i, s["folder"], s, now_ns) for i, s in enumerate(specs) if s.get("folder")]
+        self.folders = {r.folder for r in self.rules}
+        generic = [r for r in self.rules if r.exts is None]
+        by_ext: dict[str, list[_Rule]] = {}
+        for rule in self.rules:
+            for ext in rule.exts or ():
+                by_ext.setdefault(ext, []).append(rule)
+        self._generic = generic
+        self._by_ext = {ext: sorted(rules + generic, key=lambda r: r.index) for ext, rules in by_ext.items()}
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    def match(self, name: str, size: int, mtime_ns: int) -> str | None:
+        ext = os.path.splitext(name)[1][1:].lower()
+        for rule in self._by_ext.get(ext, self._generic):
+            if rule.matches(name, size, mtime_ns):
+                return rule.folder
+        return None
+
+
+def _iter_sources(helpers: FileHelpers, root: str, recursive: bool, skip_top: set[str]):
+    """
+    Files directly in `root`, plus (recursive) files in its subfolders except rule destination folders.
+    """
+    for entry in helpers.scan_dir(root):
+        if not entry.is_dir:
+            yield entry
+        elif recursive and not entry.is_symlink and os.path.basename(entry.path) not in skip_top:
+            yield from helpers.scan_entries(entry.path)
+
+
+def _move(helpers: FileHelpers, src: str, dest: str, same_device: bool, overwrite: bool) -> str:
+    """
+    Move one file; returns "renamed" for the same-device fast path or "copied" for the fallback.
+    """
+    if same_device:
+        try:
+            if overwrite:
+                os.replace(src, dest)
+            else:
+                helpers.rename_noreplace(src, dest)
+            return "renamed"
+        except OSError as exc:
+            if exc.errno != errno.EXDEV:
+                raise
+    res = helpers.safe_move(src, dest, overwrite=overwrite)
+    if not res.get("success"):
+        raise OSError(res.get("message"))
+    return "copied"
+
 
 def run(args: dict | None = None, ctx: dict | None = None) -> dict:
     logger = get_logger(__name__)
@@ -31,39 +178,69 @@ def run(args: dict | None = None, ctx: dict | None = None) -> dict:
     config_name = args.get("config", "file_organizer.json")
     dry_run = bool(args.get("dry_run", True))
     overwrite = bool(args.get("overwrite", False))
+    recursive = bool(args.get("recursive", False))
 
     if not path or not os.path.isdir(path):
         return {"success": False, "data": None, "message": f"Invalid directory: {path}"}
 
     # Load rules
-    rules = {}
-    if isinstance(ctx, dict) and ctx.get("config_manager"):
-        try:
-            rules = ctx["config_manager"].load_json(config_name, default={})
-        except Exception as exc:
-            logger.error(f"Failed to load organizer rules: {exc}")
-            rules = {}
+    config = args.get("rules")
+    if config is None:
+        config = {}
+        if isinstance(ctx, dict) and ctx.get("config_manager"):
+            try:
+                config = ctx["config_manager"].load_json(config_name, default={})
+            except Exception as exc:
+                logger.error(f"Failed to load organizer rules: {exc}")
+                config = {}
+    try:
+        rules = RuleSet(config)
+    except (re.error, TypeError, ValueError) as exc:
+        return {"success": False, "data": None, "message": f"Invalid organizer rules: {exc}"}
 
+    skip_top = {folder.replace("\\", "/").split("/", 1)[0] for folder in rules.folders}
+    # dest_dir -> (device, names already present); filled once per destination per run
+    destinations: dict[str, tuple[int | None, set[str]]] = {}
     moved = []
-    for entry in os.listdir(path):
-        src = os.path.join(path, entry)
-        if not os.path.isfile(src):
-            continue
-        ext = os.path.splitext(entry)[1].lstrip(".").lower()
-        if not ext or ext not in rules:
+    summary = {"matched": 0, "moved": 0, "skipped": 0, "renamed_fast": 0, "copied": 0, "by_folder": {}}
+
+    for file_entry in _iter_sources(helpers, path, recursive, skip_top):
+        src = file_entry.path
+        entry = os.path.basename(src)
+        folder = rules.match(entry, file_entry.size, file_entry.mtime_ns)
+        if folder is None:
             continue
-        folder = rules[ext]
+        summary["matched"] += 1
         dest_dir = os.path.join(path, folder)
         dest = os.path.join(dest_dir, entry)
-        os.makedirs(dest_dir, exist_ok=True)
         if dry_run:
             logger.info(f"[DRY RUN] Would move {src} -> {dest}")
             moved.append({src: dest})
-        else:
-            res = helpers.safe_move(src, dest, overwrite=overwrite)
-            if res.get("success"):
-                moved.append({src: dest})
-            else:
-                logger.warning(f"Skip move {src}: {res.get('message')}")
+            continue
+
+        if dest_dir not in destinations:
+            try:
+                os.makedirs(dest_dir, exist_ok=True)
+                st = os.stat(dest_dir)
+                destinations[dest_dir] = (st.st_dev, set(os.listdir(dest_dir)))
+            except OSError as exc:
+                logger.warning(f"Cannot prepare {dest_dir}: {exc}")
+                destinations[dest_dir] = (None, set())
+        device, present = destinations[dest_dir]
+        if device is None or (entry in present and not overwrite):
+            logger.warning(f"Skip move {src}: {'Destination exists' if device is not None else 'No destination'}")
+            summary["skipped"] += 1
+            continue
+        try:
+            how = _move(helpers, src, dest, file_entry.device == device, overwrite)
+        except OSError as exc:
+            logger.warning(f"Skip move {src}: {exc}")
+            summary["skipped"] += 1
+            continue
+        present.add(entry)
+        moved.append({src: dest})
+        summary["moved"] += 1
+        summary["renamed_fast" if how == "renamed" else "copied"] += 1
+        summary["by_folder"][folder] = summary["by_folder"].get(folder, 0) + 1
 
-    return {"success": True, "data": {"moved": moved}, "message": None}
+    return {"success": True, "data": {"moved": moved, "summary": summary}, "message": None}
@@ -0,0 +1,85 @@
+"""
+FS Watcher feature.
+
+Purpose:
+- Watch a directory tree for changes and keep a hot in-memory index of it, so other features
+  (disk_space, duplicate_finder, disk_cleanup, file_organizer, ...) can list the tree without rescanning.
+
+API:
+- run(args: dict = None, ctx: dict = None) -> dict
+    - args: {"action": "start"|"stop"|"status"|"changes", "path": str|None, "exclude": list[str]|None,
+             "backend": "auto"|"inotify"|"polling", "poll_interval": float = 5.0,
+             "since": int = 0, "limit": int|None}
+    - return:
+        - start/stop/status: {"success": True, "data": {"watchers": [{"root", "backend", "running", "entries",
+          "directories", "watches", "unwatched", "watch_limit_hits", "overflows", "events", "rescans", "seq",
+          ...}]}, "message": None}
+        - changes: {"success": True, "data": {"changes": [{"seq", "kind", "path", "is_dir"}], "seq": int,
+          "truncated": bool}, "message": None}
+
+Implementation notes:
+- Watchers live in utils.fs_watch for the lifetime of the process (the agent or UI); while one runs,
+  FileHelpers.scan_entries answers listings of its root (or any folder below it) from the index.
+- backend="auto" uses inotify on Linux (through ctypes) and falls back to periodic polling elsewhere.
+  If the inotify watch limit is hit, only the subtree that could not be watched is polled.
+- Only inotify-watched trees answer scan_entries: a polling watcher (or a listing that overlaps a polled
+  subtree) could be up to poll_interval stale, so those listings still walk the disk. Polling watchers
+  keep status and the change log.
+- status without a path lists every running watcher.
+- changes returns the log entries after `since` (pass the returned "seq" next time); truncated=True
+  means older changes were evicted and the caller should rescan instead.
+
+Dependencies:
+- Internal: utils.fs_watch, utils.logger
+- External: os
+
+Safety:
+- Read-only: watching never modifies the tree.
+"""
+
+import os
+from utils.fs_watch import BACKENDS, DEFAULT_POLL_INTERVAL, get_watcher, start_watch, stop_watch, watchers
+from utils.logger import get_logger
+
+
+def run(args: dict | None = None, ctx: dict | None = None) -> dict:
+    logger = get_logger(__name__)
+
+    args = args or {}
+    action = args.get("action", "status")
+    path = args.get("path")
+
+    if action == "status" and not path:
+        return {"success": True, "data": {"watchers": [w.status() for w in watchers()]}, "message": None}
+    if not path:
+        return {"success": False, "data": None, "message": "path is required"}
+
+    if action == "start":
+        backend = args.get("backend", "auto")
+        if backend not in BACKENDS:
+            return {"success": False, "data": None, "message": f"Unsupported backend: {backend}"}
+        if not os.path.isdir(path):
+            return {"success": False, "data": None, "message": f"Invalid directory: {path}"}
+        try:
+            watcher = start_watch(path, exclude=args.get("exclude"), backend=backend,
+                                  poll_interval=float(args.get("poll_interval", DEFAULT_POLL_INTERVAL)))
+        except OSError as exc:
+            return {"success": False, "data": None, "message": f"Cannot watch {path}: {exc}"}
+        logger.info(f"Watching {watcher.root} ({watcher.backend})")
+        return {"success": True, "data": {"watchers": [watcher.status()]}, "message": None}
+
+    if action == "stop":
+        if not stop_watch(path):
+            return {"success": False, "data": None, "message": f"Not watching: {path}"}
+        return {"success": True, "data": {"watchers": [w.status() for w in watchers()]}, "message": None}
+
+    watcher = get_watcher(path)
+    if watcher is None:
+        return {"success": False, "data": None, "message": f"Not watching: {path}"}
+    if action == "status":
+        return {"success": True, "data": {"watchers": [watcher.status()]}, "message": None}
+    if action == "changes":
+        limit = args.get("limit")
+        changes, truncated, seq = watcher.changes(int(args.get("since", 0)), int(limit) if limit else None)
+        return {"success": True, "data": {"changes": changes, "seq": seq, "truncated": truncated}, "message": None}
+    return {"success": False, "data": None, "message": f"Unsupported action: {action}"}
@@ -6,21 +6,170 @@ Purpose:
 
 API:
 - run(args: dict = None, ctx: dict = None) -> dict
-    - args: {"path": str, "hash_method":"phash"|"ahash", "threshold": int, "dry_run": True}
-    - return: {"success": True, "data": [{"group": [paths]}], "message": None}
+    - args: {"path": str, "hash_method":"phash"|"ahash", "threshold": int, "dry_run": True,
+             "workers": int|None, "fast_decode": bool, "use_cache": bool, "exclude": list[str]|None}
+    - return: {"success": True, "data": [{"group": [paths]}], "message": None,
+               "metadata": {"images": int, "decoded": int, "hash_cache": {...}}}
+
+Hashing:
+- Images are decoded and hashed in a process pool (workers, default CPU count).
+- fast_decode (default True) uses Pillow's JPEG draft mode to decode straight to a small grayscale
+  image; phash/ahash only look at a 32x32/8x8 thumbnail. Draft hashes can differ by a bit or two
+  from full-decode hashes, so they are cached under a separate key.
+- Hashes are persisted in the shared hash cache (utils.hash_cache) keyed on path, size and mtime,
+  so reruns only decode new or changed images.
+
+Grouping:
+- Perceptual hashes are compared by Hamming distance through HammingIndex (multi-index hashing),
+  so each threshold query only touches candidate neighbours instead of every other image.
+- Groups are identical to the greedy pairwise scan: images are visited in walk order and each
+  unvisited image claims every later unvisited image within `threshold`.
 
 Dependencies:
 - Internal: utils.file_helpers, utils.logger
-- External: Pillow, imagehash
+- External: Pillow, imagehash, concurrent.futures, itertools, math
 
 Safety:
 - Default to dry-run; do not delete/move images without confirmation.
 """
 
+import math
 import os
-from typing import Any
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
 from utils.logger import get_logger
-from utils.file_helpers import FileHelpers
+from utils.file_helpers import FileEntry, FileHelpers
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"}
+# JPEG draft target; comfortably above the 32x32 image phash resamples to
+DRAFT_SIZE = 128
+# Below this many images the pool start-up costs more than it saves
+_MIN_POOL_BATCH = 8
+
+
+def _hash_image(file_path: str, method: str, fast_decode: bool) -> tuple[str | None, str | None]:
+    """
+    Decode and hash one image. Runs in worker processes; returns (hex_digest, error).
+    """
+    try:
+        from PIL import Image  # type: ignore
+        import imagehash  # type: ignore
+        with Image.open(file_path) as img:
+            if fast_decode and img.format == "JPEG":
+                img.draft("L", (DRAFT_SIZE, DRAFT_SIZE))
+            if method == "ahash":
+                return str(imagehash.average_hash(img)), None
+            return str(imagehash.phash(img)), None
+    except Exception as exc:
+        return None, f"{type(exc).__name__}: {exc}"
+
+
+class HammingIndex:
+    """
+    Multi-index hash over fixed-width integer hashes for Hamming radius queries.
+
+    The `bits`-wide hash is split into m bands. If two hashes differ in at most `radius` bits,
+    at least one band differs in at most radius // m bits (pigeonhole), so a query only probes
+    band keys within that sub-radius and verifies the candidates it finds. m is chosen from the
+    number of hashes and the radius to keep both probes and bucket sizes small.
+    """
+
+    def __init__(self, values: list[int], bits: int, radius: int):
+        self.bits = bits
+        self.radius = radius
+        # Identical hashes share one entry; queries return indices into `values`
+        self._indices: dict[int, list[int]] = {}
+        for i, value in enumerate(values):
+            self._indices.setdefault(value, []).append(i)
+        self._alive: set[int] = set(self._indices)
+
+        bands = self._choose_bands(len(self._indices), bits, radius)
+        widths = [bits // bands + (1 if b < bits % bands else 0) for b in range(bands)]
+        self._bands: list[tuple[int, int]] = []  # (shift, mask)
+        shift = 0
+        for width in widths:
+            self._bands.append((shift, (1 << width) - 1))
+            shift += width
+        self._sub_radius = radius // bands
+        self._flips = [self._flip_masks(width, self._sub_radius) for width in widths]
+        self._tables: list[dict[int, list[int]]] = [{} for _ in range(bands)]
+        for value in self._indices:
+            for table, (shift, mask) in zip(self._tables, self._bands):
+                table.setdefault((value >> shift) & mask, []).append(value)
+
+    @staticmethod
+    def _flip_masks(width: int, radius: int) -> list[int]:
+        masks = [0]
+        for k in range(1, radius + 1):
+            for positions in combinations(range(width), k):
+                m = 0
+                for p in positions:
+                    m |= 1 << p
+                masks.append(m)
+        return masks
+
+    @staticmethod
+    def _choose_bands(count: int, bits: int, radius: int) -> int:
+        # Estimated cost per query: probes * (1 + expected bucket occupancy)
+        best, best_cost = 1, float("inf")
+        for bands in range(1, min(radius + 1, bits) + 1):
+            width = bits // bands
+            sub = radius // bands
+            probes = bands * sum(math.comb(width, k) for k in range(sub + 1))
+            cost = probes * (1 + count / float(2 ** width))
+            if cost < best_cost:
+                best, best_cost = bands, cost
+        return best
+
+    def query(self, value: int) -> list[int]:
+        """
+        Return indices of all live hashes within `radius` of `value`, in ascending order.
+        """
+        seen: set[int] = set()
+        found: list[int] = []
+        for table, (shift, mask), flips in zip(self._tables, self._bands, self._flips):
+            key = (value >> shift) & mask
+            for flip in flips:
+                bucket = table.get(key ^ flip)
+                if not bucket:
+                    continue
+                for other in bucket:
+                    if other in seen or other not in self._alive:
+                        continue
+                    seen.add(other)
+                    if (value ^ other).bit_count() <= self.radius:
+                        found.extend(self._indices[other])
+        found.sort()
+        return found
+
+    def discard(self, value: int) -> None:
+        """
+        Stop returning `value` from queries (all images with this hash are grouped).
+        """
+        self._alive.discard(value)
+
+
+def group_near_duplicates(values: list[int], bits: int, threshold: int) -> list[list[int]]:
+    """
+    Greedy grouping by Hamming distance; returns groups (index lists) with more than one member.
+    """
+    index = HammingIndex(values, bits, threshold)
+    used = bytearray(len(values))
+    groups: list[list[int]] = []
+    for i, value in enumerate(values):
+        if used[i]:
+            continue
+        used[i] = 1
+        group = [i]
+        # Every index before i is already used, so only later images can join
+        for j in index.query(value):
+            if not used[j]:
+                used[j] = 1
+                group.append(j)
+        index.discard(value)
+        if len(group) > 1:
+            groups.append(group)
+    return groups
 
 
 def run(args: dict | None = None, ctx: dict | None = None) -> dict:
@@ -31,58 +180,68 @@ def run(args: dict | None = None, ctx: dict | None = None) -> dict:
     path = args.get("path")
     method = args.get("hash_method", "phash")
     threshold = int(args.get("threshold", 5))
+    workers = int(args.get("workers") or os.cpu_count() or 1)
+    fast_decode = bool(args.get("fast_decode", True))
+    use_cache = bool(args.get("use_cache", True))
 
     if not path or not os.path.isdir(path):
         return {"success": False, "data": None, "message": f"Invalid directory: {path}"}
 
     try:
-        from PIL import Image  # type: ignore
-        import imagehash  # type: ignore
+        import PIL  # type: ignore  # noqa: F401
+        import imagehash  # type: ignore  # noqa: F401
     except Exception:
         return {"success": False, "data": None, "message": "Pillow and imagehash are required for image_deduper"}
 
-    def compute_hash(file_path: str):
-        try:
-            with Image.open(file_path) as img:
-                if method == "ahash":
-                    return imagehash.average_hash(img)
-                else:
-                    return imagehash.phash(img)
-        except Exception:
-            logger.exception(f"Hashing failed for {file_path}")
-            return None
-
     # Collect images
-    exts = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"}
-    img_files = [p for p in helpers.iterate_files(path) if os.path.splitext(p)[1].lower() in exts]
+    entries = [e for e in helpers.scan_entries(path, exclude=args.get("exclude"))
+               if os.path.splitext(e.path)[1].lower() in IMAGE_EXTS]
+    img_files = [e.path for e in entries]
 
-    hashes: list[tuple[str, Any]] = []
+    # Serve unchanged images from the cache, decode the rest in the pool
+    cache_key = f"image:{method}:{'draft' if fast_decode else 'full'}"
+    cache = helpers.get_hash_cache() if use_cache else None
+    digests: dict[str, str] = {}
+    pending: list[tuple[str, FileEntry]] = []
+    for entry in entries:
+        if cache is not None:
+            cached = cache.lookup(entry.path, entry, cache_key)
+            if cached is not None:
+                digests[entry.path] = cached
+                continue
+        pending.append((entry.path, entry))
+
+    todo = [p for p, _ in pending]
+    if workers > 1 and len(todo) >= _MIN_POOL_BATCH:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, min(64, len(todo) // (workers * 4)))
+            results = list(pool.map(_hash_image, todo, [method] * len(todo), [fast_decode] * len(todo), chunksize=chunksize))
+    else:
+        results = [_hash_image(p, method, fast_decode) for p in todo]
+
+    for (p, st), (digest, error) in zip(pending, results):
+        if digest is None:
+            logger.error(f"Hashing failed for {p}: {error}")
+            continue
+        digests[p] = digest
+        if cache is not None:
+            cache.store(p, st, cache_key, digest)
+    helpers.close_hash_cache()
+
+    hashes: list[tuple[str, int]] = []
+    bits = 64
     for p in img_files:
-        h = compute_hash(p)
-        if h is not None:
-            hashes.append((p, h))
+        digest = digests.get(p)
+        if digest is not None:
+            bits = len(digest) * 4
+            hashes.append((p, int(digest, 16)))
 
     # Group by near-duplicates using threshold on Hamming distance
-    groups: list[list[str]] = []
-    used = set()
-    for i in range(len(hashes)):
-        if i in used:
-            continue
-        base_path, base_hash = hashes[i]
-        group = [base_path]
-        used.add(i)
-        for j in range(i + 1, len(hashes)):
-            if j in used:
-                continue
-            other_path, other_hash = hashes[j]
-            try:
-                dist = base_hash - other_hash  # imagehash defines distance via subtraction
-            except Exception:
-                dist = 999
-            if dist <= threshold:
-                group.append(other_path)
-                used.add(j)
-        if len(group) > 1:
-            groups.append(group)
+    groups = [[hashes[i][0] for i in group] for group in group_near_duplicates([h for _, h in hashes], bits, threshold)]
 
-    return {"success": True, "data": [{"group": g} for g in groups], "message": None}
+    return {
+        "success": True,
+        "data": [{"group": g} for g in groups],
+        "message": None,
+        "metadata": {"images": len(img_files), "decoded": len(todo), "hash_cache": helpers.hash_cache_stats()},
+    }
@@ -0,0 +1,13 @@
+"""
+Shared pytest setup for the filesystem package tests.
+
+Purpose:
+- Make the repository root importable (utils.*, modules.*) when pytest is run from any directory.
+"""
+
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
@@ -0,0 +1,143 @@
+"""
+Unit tests for modules.filesystem.auto_renamer.
+
+Purpose:
+- Plan and run renames through run() in a tmp_path directory.
+- Crash chained and cyclic rename plans part-way (after a rename, before its "done" record, and before a
+  rename) and check that recovery in both directions restores a consistent directory and only then
+  removes the journal.
+"""
+
+import os
+import pytest
+from modules.filesystem import auto_renamer
+from modules.filesystem.auto_renamer import AutoRenamer, _Journal, _journal_path, _names_at
+from utils.constants import Constants
+
+
+class _Crash(BaseException):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def journal_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(Constants, "RENAME_JOURNAL_DIR", str(tmp_path / "journals"))
+
+
+def _chain():
+    # a -> b while b -> c: b has to move first
+    return AutoRenamer()._order_steps([("a", "b"), ("b", "c")], {"a", "b", "c"})[0]
+
+
+def _cycle():
+    return AutoRenamer()._order_steps([("a", "b"), ("b", "c"), ("c", "a")], {"a", "b", "c"})[0]
+
+
+def _make(directory, names):
+    directory.mkdir()
+    for name in names:
+        (directory / name).write_text(name)
+
+
+def _contents(directory):
+    return {p.name: p.read_text() for p in directory.iterdir()}
+
+
+def _final(steps, initial):
+    files = {name: name for name in initial}
+    for src, dst in steps:
+        files[dst] = files.pop(src)
+    return files
+
+
+def _crash_execute(directory, steps, crash_step, after_rename, monkeypatch):
+    """
+    Run the plan and die at `crash_step`: right after its rename (no "done" record) or right before it.
+    """
+    renamer = AutoRenamer()
+    journal = _Journal(_journal_path(str(directory)))
+    journal.create(str(directory), steps)
+    real_record, real_rename = _Journal.record, os.rename
+
+    def record(self, kind, i, sync=False):
+        if after_rename and kind == "done" and i == crash_step:
+            raise _Crash()
+        return real_record(self, kind, i, sync)
+
+    def rename(src, dst):
+        if not after_rename and os.path.basename(src) == steps[crash_step][0]:
+            raise _Crash()
+        return real_rename(src, dst)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(_Journal, "record", record)
+        patch.setattr(auto_renamer.os, "rename", rename)
+        with pytest.raises(_Crash):
+            renamer._execute(str(directory), steps, 0, journal, 1000, False)
+    journal.close()
+
+
+@pytest.mark.parametrize("plan", [_chain, _cycle], ids=["chain", "cycle"])
+@pytest.mark.parametrize("after_rename", [True, False], ids=["after-rename", "before-rename"])
+@pytest.mark.parametrize("direction", ["forward", "back"])
+def test_recover_mid_batch(tmp_path, monkeypatch, plan, after_rename, direction):
+    steps = plan()
+    initial = sorted(_names_at(steps, 0)[0])
+    for crash_step in range(len(steps)):
+        directory = tmp_path / f"files{crash_step}"
+        _make(directory, initial)
+        _crash_execute(directory, steps, crash_step, after_rename, monkeypatch)
+        result = auto_renamer.run({"path": str(directory), "action": "recover", "direction": direction})
+        assert result["success"], result["message"]
+        assert not os.path.exists(_journal_path(str(directory)))
+        expected = _final(steps, initial) if direction == "forward" else {name: name for name in initial}
+        assert _contents(directory) == expected
+
+
+def test_recover_refuses_when_disk_does_not_match(tmp_path):
+    # Both renames ran but the journal lost every progress record (old journal or power loss)
+    directory = tmp_path / "files"
+    _make(directory, ["a", "b"])
+    steps = [("b", "c"), ("a", "b")]
+    _Journal(_journal_path(str(directory))).create(str(directory), steps)
+    os.rename(directory / "b", directory / "c")
+    os.rename(directory / "a", directory / "b")
+    for direction in ("forward", "back"):
+        result = auto_renamer.run({"path": str(directory), "action": "recover", "direction": direction})
+        assert not result["success"]
+        assert os.path.exists(_journal_path(str(directory)))
+    assert _contents(directory) == {"b": "a", "c": "b"}
+
+
+def test_interrupted_rollback_can_be_resumed(tmp_path, monkeypatch):
+    steps = _cycle()
+    directory = tmp_path / "files"
+    _make(directory, ["a", "b", "c"])
+    _crash_execute(directory, steps, len(steps) - 1, True, monkeypatch)
+    real_record = _Journal.record
+
+    def record(self, kind, i, sync=False):
+        if kind == "reverted" and i == 1:
+            raise _Crash()
+        return real_record(self, kind, i, sync)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(_Journal, "record", record)
+        with pytest.raises(_Crash):
+            auto_renamer.run({"path": str(directory), "action": "recover", "direction": "back"})
+    assert not auto_renamer.run({"path": str(directory), "action": "recover", "direction": "forward"})["success"]
+    result = auto_renamer.run({"path": str(directory), "action": "recover", "direction": "back"})
+    assert result["success"], result["message"]
+    assert _contents(directory) == {"a": "a", "b": "b", "c": "c"}
+
+
+def test_run_renames_and_removes_journal(tmp_path):
+    directory = tmp_path / "files"
+    _make(directory, ["my file.txt", "my_file.txt"])
+    dry = auto_renamer.run({"path": str(directory), "rule": "spaces_to_underscores"})
+    assert dry["success"] and dry["data"]["plan"]["collisions"] == [{"my file.txt": "my_file_1.txt"}]
+    assert _contents(directory) == {"my file.txt": "my file.txt", "my_file.txt": "my_file.txt"}
+    result = auto_renamer.run({"path": str(directory), "rule": "spaces_to_underscores", "dry_run": False})
+    assert result["success"], result["message"]
+    assert _contents(directory) == {"my_file_1.txt": "my file.txt", "my_file.txt": "my_file.txt"}
+    assert not os.path.exists(_journal_path(str(directory)))
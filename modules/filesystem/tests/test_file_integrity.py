@@ -0,0 +1,113 @@
+"""
+Unit tests for modules.filesystem.file_integrity.
+
+Purpose:
+- Check Merkle manifests against digests computed by hand from the file contents.
+- Verify a subtree (subdir=...) and check that the root recomputed through _chain_root matches the stored
+  root only while the subtree is unchanged.
+- Diff a Merkle manifest against a rescan.
+- Reject invalid max_bytes_per_sec values with a result instead of an exception.
+"""
+
+import hashlib
+import os
+import pytest
+from modules.filesystem import file_integrity
+from modules.filesystem.file_integrity import _chain_root
+from utils.merkle import MerkleTree, dir_digest
+
+FILES = {"z.txt": "zed", "a/x.txt": "ex", "a/b/y.txt": "why", "a/b/w.txt": "double-u", "c/v.txt": "vee"}
+
+
+def _sha(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _make(root):
+    for rel, text in FILES.items():
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+
+def _generate(root):
+    result = file_integrity.run({"path": str(root), "action": "generate", "merkle": True, "use_cache": False})
+    assert result["success"], result["message"]
+    return result["data"]
+
+
+def test_root_hash_matches_hand_computed_tree(tmp_path):
+    _make(tmp_path)
+    data = _generate(tmp_path)
+    b = dir_digest("sha256", [("w.txt", _sha("double-u")), ("y.txt", _sha("why"))], [])
+    a = dir_digest("sha256", [("x.txt", _sha("ex"))], [("b", b)])
+    c = dir_digest("sha256", [("v.txt", _sha("vee"))], [])
+    root = dir_digest("sha256", [("z.txt", _sha("zed"))], [("a", a), ("c", c)])
+    assert data["root_hash"] == root
+    tree = MerkleTree.load(data["manifest"])
+    assert tree.root_hash == root
+    assert tree.dirs["a/b"]["hash"] == b
+    assert [r["path"] for r in tree.files("a/b")] == ["a/b/w.txt", "a/b/y.txt"]
+    # Same content, same root; one changed byte anywhere changes it
+    assert _generate(tmp_path)["root_hash"] == root
+    (tmp_path / "a" / "b" / "y.txt").write_text("whY")
+    assert _generate(tmp_path)["root_hash"] != root
+
+
+def test_chain_root_rebuilds_stored_root(tmp_path):
+    _make(tmp_path)
+    data = _generate(tmp_path)
+    tree = MerkleTree.load(data["manifest"])
+    for subdir in ("a", "a/b", "c"):
+        assert _chain_root(tree, subdir, tree.dirs[subdir]["hash"]) == data["root_hash"]
+    assert _chain_root(tree, "a/b", "0" * 64) != data["root_hash"]
+
+
+def test_subtree_verify(tmp_path):
+    _make(tmp_path)
+    data = _generate(tmp_path)
+    args = {"path": str(tmp_path), "action": "verify", "subdir": "a/b"}
+    clean = file_integrity.run(args)
+    assert clean["success"], clean["message"]
+    assert clean["data"]["mismatches"] == []
+    assert clean["data"]["root_verified"] is True
+    assert clean["data"]["recomputed_root_hash"] == data["root_hash"]
+    assert clean["data"]["live_hash"] == clean["data"]["subdir_hash"]
+
+    (tmp_path / "a" / "b" / "y.txt").write_text("changed")
+    (tmp_path / "a" / "b" / "new.txt").write_text("new")
+    # A change outside the subtree is not looked at
+    (tmp_path / "c" / "v.txt").write_text("elsewhere")
+    dirty = file_integrity.run(args)["data"]
+    assert sorted((m["path"], m["issue"]) for m in dirty["mismatches"]) == [("a/b/new.txt", "added"),
+                                                                          ("a/b/y.txt", "changed")]
+    assert dirty["root_verified"] is False
+    assert file_integrity.run({**args, "root_hash": dirty["recomputed_root_hash"]})["data"]["root_verified"]
+
+
+def test_diff_against_rescan(tmp_path):
+    _make(tmp_path)
+    _generate(tmp_path)
+    os.remove(tmp_path / "c" / "v.txt")
+    (tmp_path / "a" / "x.txt").write_text("changed")
+    result = file_integrity.run({"path": str(tmp_path), "action": "diff", "use_cache": False})
+    assert result["success"], result["message"]
+    assert sorted((c["path"], c["issue"]) for c in result["data"]["changes"]) == [("a/x.txt", "changed"),
+                                                                                 ("c/v.txt", "removed")]
+    # a/b is identical and skipped by digest
+    assert result["data"]["dirs_skipped"] >= 1
+
+
+@pytest.mark.parametrize("value", [-1, 0, "fast", True, [1]])
+def test_invalid_rate_limit_is_rejected(tmp_path, value):
+    (tmp_path / "a.txt").write_text("a")
+    for action in ("generate", "verify"):
+        result = file_integrity.run({"path": str(tmp_path), "action": action, "max_bytes_per_sec": value})
+        assert not result["success"] and "max_bytes_per_sec" in result["message"]
+    assert not (tmp_path / file_integrity.MANIFEST_NAME).exists()
+
+
+def test_rate_limited_generate(tmp_path):
+    (tmp_path / "a.txt").write_text("a")
+    result = file_integrity.run({"path": str(tmp_path), "action": "generate", "max_bytes_per_sec": 10_000_000})
+    assert result["success"] and result["data"]["count"] == 1
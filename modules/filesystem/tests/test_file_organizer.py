@@ -0,0 +1,35 @@
+"""
+Unit tests for modules.filesystem.file_organizer.
+
+Purpose:
+- Organize a tmp_path directory through run() with explicit rules.
+- Check that a destination file missing from the organizer's listing (created after it was taken) is
+  skipped instead of overwritten.
+"""
+
+from modules.filesystem import file_organizer
+
+
+def test_moves_matching_files(tmp_path):
+    (tmp_path / "a.log").write_text("log")
+    (tmp_path / "b.txt").write_text("txt")
+    result = file_organizer.run({"path": str(tmp_path), "rules": {"rules": [{"folder": "Logs", "glob": "*.log"}]},
+                                 "dry_run": False})
+    assert result["success"]
+    assert result["data"]["summary"]["moved"] == 1
+    assert (tmp_path / "Logs" / "a.log").read_text() == "log"
+    assert (tmp_path / "b.txt").exists()
+
+
+def test_never_replaces_destination_created_after_listing(tmp_path, monkeypatch):
+    (tmp_path / "Logs").mkdir()
+    (tmp_path / "Logs" / "a.log").write_text("existing")
+    (tmp_path / "a.log").write_text("new")
+    # The destination listing is stale: it does not show Logs/a.log
+    monkeypatch.setattr(file_organizer.os, "listdir", lambda path: [])
+    result = file_organizer.run({"path": str(tmp_path), "rules": {"log": "Logs"}, "dry_run": False})
+    assert result["success"]
+    assert result["data"]["summary"] == {"matched": 1, "moved": 0, "skipped": 1, "renamed_fast": 0, "copied": 0,
+                                         "by_folder": {}}
+    assert (tmp_path / "Logs" / "a.log").read_text() == "existing"
+    assert (tmp_path / "a.log").read_text() == "new"
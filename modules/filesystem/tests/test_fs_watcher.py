@@ -0,0 +1,188 @@
+"""
+Unit tests for modules.filesystem.fs_watcher and the hot index behind it (utils.fs_watch).
+
+Purpose:
+- Read FileHelpers.scan_entries back after every kind of write (create, append, subtree rename, delete)
+  while an inotify watcher runs, and check the listing comes from the index, not the disk.
+- Check which listings a watcher may answer: not through a symlinked path, not with a different exclude,
+  never from a polling watcher, never over a subtree left unwatched by the inotify watch limit.
+- Page through the change log with changes(since=...) and detect evicted entries (truncated).
+"""
+
+import errno
+import os
+import sys
+import pytest
+from modules.filesystem import fs_watcher
+from utils import file_helpers
+from utils.file_helpers import FileHelpers
+from utils.fs_watch import FsWatcher, HotIndex, _Inotify
+
+linux_only = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify backend is Linux-only")
+
+
+def _tree(root):
+    (root / "docs" / "deep").mkdir(parents=True)
+    (root / "docs" / "deep" / "note.txt").write_text("note")
+    (root / "docs" / "a.txt").write_text("a")
+    (root / "top.txt").write_text("top")
+    return root
+
+
+def _listing(root, **kwargs):
+    return sorted((os.path.relpath(e.path, root), e.size, e.is_dir)
+                  for e in FileHelpers().scan_entries(str(root), include_dirs=True, **kwargs))
+
+
+@pytest.fixture
+def watch():
+    started = []
+
+    def _start(root, **kwargs):
+        watcher = FsWatcher(str(root), poll_interval=kwargs.pop("poll_interval", 60), **kwargs).start()
+        started.append(watcher)
+        return watcher
+
+    yield _start
+    for watcher in started:
+        watcher.stop()
+
+
+@pytest.fixture
+def no_disk_walk(monkeypatch):
+    """
+    Fail any directory listing not made by `watcher` itself, so a passing scan_entries came from its index.
+    """
+    real_scan_dir = FileHelpers._scan_dir
+
+    def _enable(watcher):
+        def _scan_dir(self, *args, **kwargs):
+            if self is not watcher.index.helpers:
+                raise AssertionError("scan_entries walked the disk")
+            return real_scan_dir(self, *args, **kwargs)
+
+        monkeypatch.setattr(FileHelpers, "_scan_dir", _scan_dir)
+
+    return _enable
+
+
+@linux_only
+def test_read_after_write_through_scan_entries(tmp_path, watch, no_disk_walk):
+    root = _tree(tmp_path / "src")
+    watcher = watch(root, backend="inotify")
+    assert watcher.backend == "inotify" and file_helpers._find_hot_index(str(root), None) is watcher
+    no_disk_walk(watcher)
+
+    (root / "new.txt").write_text("new")
+    assert ("new.txt", 3, False) in _listing(root)
+
+    with open(root / "docs" / "a.txt", "a") as f:
+        f.write("appended")
+    assert ("docs/a.txt", 9, False) in _listing(root)
+
+    os.rename(root / "docs", root / "moved")
+    listing = _listing(root)
+    assert ("moved/deep/note.txt", 4, False) in listing
+    assert not [path for path, _, _ in listing if path.startswith("docs")]
+    # Files created in the renamed subtree are seen too: its watches moved with it
+    (root / "moved" / "deep" / "later.txt").write_text("later")
+    assert ("deep/later.txt", 5, False) in _listing(root / "moved")
+
+    os.remove(root / "top.txt")
+    assert "top.txt" not in [path for path, _, _ in _listing(root)]
+
+
+@linux_only
+def test_covers_rejects_symlinked_paths_and_other_excludes(tmp_path, watch):
+    root = _tree(tmp_path / "src")
+    os.symlink(root / "docs", tmp_path / "docs-link", target_is_directory=True)
+    watcher = watch(root, backend="inotify", exclude=["*.tmp"])
+    assert watcher.covers(str(root), ["*.tmp"])
+    assert not watcher.covers(str(root), None)
+    assert not watcher.covers(str(root), ["*.bak"])
+    # Subfolders cannot be served with an exclude list anchored at the watched root
+    assert not watcher.covers(str(root / "docs"), ["*.tmp"])
+    assert not watcher.covers(str(tmp_path / "docs-link"), ["*.tmp"])
+    assert not watcher.covers(str(tmp_path), ["*.tmp"])
+
+    plain = watch(tmp_path / "src", backend="inotify")
+    assert plain.covers(str(root / "docs"))
+    assert not plain.covers(str(tmp_path / "docs-link"))
+    assert file_helpers._find_hot_index(str(tmp_path / "docs-link"), None) is None
+
+
+def test_polling_watcher_is_never_a_hot_index(tmp_path, watch):
+    root = _tree(tmp_path / "src")
+    watcher = watch(root, backend="polling")
+    assert watcher.backend == "polling" and watcher.running
+    assert watcher not in file_helpers._HOT_INDEXES
+    assert not watcher.covers(str(root))
+    assert len(watcher.index) == 5
+    # Listings walk the disk and see writes the poller has not picked up yet
+    (root / "new.txt").write_text("new")
+    assert ("new.txt", 3, False) in _listing(root)
+
+
+@linux_only
+def test_watch_limit_leaves_subtree_polled(tmp_path, watch, monkeypatch):
+    root = _tree(tmp_path / "src")
+    (root / "other").mkdir()
+    real_add_watch = _Inotify.add_watch
+
+    def add_watch(self, path, *args):
+        if path.startswith(str(root / "docs")):
+            raise OSError(errno.ENOSPC, os.strerror(errno.ENOSPC), path)
+        return real_add_watch(self, path, *args)
+
+    monkeypatch.setattr(_Inotify, "add_watch", add_watch)
+    watcher = watch(root, backend="inotify")
+    status = watcher.status()
+    assert status["unwatched"] == [str(root / "docs")] and status["watch_limit_hits"] == 1
+    assert watcher in file_helpers._HOT_INDEXES
+
+    # Listings touching the unwatched subtree walk the disk; the rest of the tree is still served
+    assert not watcher.covers(str(root)) and not watcher.covers(str(root / "docs" / "deep"))
+    assert watcher.covers(str(root / "other"))
+    (root / "docs" / "deep" / "fresh.txt").write_text("fresh")
+    assert file_helpers._find_hot_index(str(root), None) is None
+    assert ("docs/deep/fresh.txt", 5, False) in _listing(root)
+    # No watch saw the write, so only the disk walk could have found it
+    assert "fresh.txt" not in watcher.index._dirs[str(root / "docs" / "deep")]
+    (root / "other" / "x.txt").write_text("x")
+    assert _listing(root / "other") == [("x.txt", 1, False)]
+
+
+def test_changes_since_and_truncation(tmp_path):
+    root = _tree(tmp_path / "src")
+    index = HotIndex(str(root), log_size=3)
+    index.rescan()
+    changes, truncated, latest = index.changes()
+    assert latest == 5 and truncated
+    assert [c["seq"] for c in changes] == [3, 4, 5]
+    changes, truncated, _ = index.changes(since=3)
+    assert [c["seq"] for c in changes] == [4, 5] and not truncated
+    changes, truncated, _ = index.changes(since=2, limit=1)
+    assert [c["seq"] for c in changes] == [3] and not truncated
+    assert index.changes(since=latest) == ([], False, latest)
+
+
+@linux_only
+def test_changes_action_reports_created_modified_deleted(tmp_path):
+    root = str(_tree(tmp_path / "src"))
+    started = fs_watcher.run({"action": "start", "path": root, "backend": "inotify", "poll_interval": 60})
+    try:
+        assert started["success"] and started["data"]["watchers"][0]["backend"] == "inotify"
+        seq = fs_watcher.run({"action": "changes", "path": root})["data"]["seq"]
+        with open(os.path.join(root, "top.txt"), "a") as f:
+            f.write("more")
+        os.remove(os.path.join(root, "docs", "a.txt"))
+        os.mkdir(os.path.join(root, "fresh"))
+        result = fs_watcher.run({"action": "changes", "path": root, "since": seq})["data"]
+        seen = {(c["kind"], os.path.relpath(c["path"], root), c["is_dir"]) for c in result["changes"]}
+        assert {("modified", "top.txt", False), ("deleted", os.path.join("docs", "a.txt"), False),
+                ("created", "fresh", True)} <= seen
+        assert not result["truncated"] and result["seq"] > seq
+        again = fs_watcher.run({"action": "changes", "path": root, "since": result["seq"]})["data"]
+        assert again["changes"] == [] and again["seq"] == result["seq"]
+    finally:
+        assert fs_watcher.run({"action": "stop", "path": root})["success"]
@@ -26,6 +26,7 @@ meta = {
         {"id": "file_integrity", "name": "File Integrity"},
         {"id": "image_deduper", "name": "Image Deduper"},
         {"id": "disk_cleanup", "name": "Disk Cleanup"},
+        {"id": "fs_watcher", "name": "FS Watcher"},
     ],
 }
 
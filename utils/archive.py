@@ -0,0 +1,737 @@
+"""
+Parallel ZIP archive writer, side index and random-access extraction.
+
+Responsibilities:
+- Write standard ZIP archives (readable by zipfile, unzip, Explorer) with a producer/consumer pipeline:
+    - ZipArchiveWriter(path, level=6, workers=None, readers=2, block_size=1 MiB, store_extensions=...)
+    - add_files(items) -> None: items are (arcname, path, size, mtime_ns) in archive order
+    - close() -> list[ArchiveMember]: writes the central directory; `stats` holds byte counts and timing
+- COMPRESSED_EXTENSIONS: file types stored without recompression (already compressed media/archives).
+- Side index next to each archive (`<archive>.idx`), so members can be found without reading the archive:
+    - write_index(archive_path, members, source=None) -> str
+    - rebuild_index(archive_path) -> str (from the central directory)
+    - load_index(archive_path) -> ArchiveIndex: lookup(name), select(paths), iteration, header
+    - extract(archive_path, members, target, overwrite=False, workers=None, progress=None) -> dict
+
+Pipeline:
+- Reader threads (`readers`) open files a few members ahead of the writer, read them in blocks, keep
+  each member's CRC-32 and hand every block to the compression pool.
+- Compression workers (`workers`, default one per core) deflate blocks independently: each block is a
+  raw deflate stream ended with a full flush, so concatenated blocks form one valid member (the last
+  block is finished, or a 2-byte empty final block is appended). zlib releases the GIL while compressing.
+- A single writer (the calling thread) appends members strictly in order: a local header, the blocks as
+  their futures complete, then it patches sizes/CRC into the header. The central directory (with Zip64
+  records when sizes, offsets or counts need them) is written by close().
+- Blocks in flight are bounded; the member being written may always make progress, so readers running
+  ahead can never starve the writer.
+
+Side index:
+- One JSON header line ({"format", "version", "members", "archive_size", "source"}) followed by one compact JSON
+  array per member, sorted by name: [name, header_offset, data_offset, size, compressed_size, crc, method,
+  mtime_ns, mode]. Because lines are sorted, lookup() and subtree selection binary-search the file by
+  byte offset (like look(1)) and read only the few lines they need; nothing is loaded up front.
+  Sparse members append their data extents: [..., mode, [[offset, length], ...]].
+- An index whose archive_size does not match the archive is stale and is rebuilt by load_index().
+  A rebuilt index only has the ZIP's DOS timestamps (2-second resolution) for mtimes.
+- extract() seeks straight to each member's data, inflates it as a stream, checks the CRC-32 and writes
+  through a temporary name. Members are spread over a thread pool (one archive handle per thread;
+  zlib releases the GIL while inflating), scheduled through utils.io_scheduler in data-offset order so
+  the archive is read front to back. Names that would escape `target` are refused.
+
+Sparse files:
+- Readers map sparse sources (utils.file_helpers.data_extents, SEEK_DATA/SEEK_HOLE). Blocks that lie
+  entirely in a hole are not read: their CRC-32 is advanced arithmetically (zlib's crc32_combine
+  operator) and their payload, identical for every hole block, is compressed once and reused. Only
+  data extents cost I/O. The extent map is kept as the 10th field of the member's index record.
+- extract() restores members that have an extent map sparsely: all-zero output is skipped with a seek
+  and the file is truncated to its size, so holes come back as holes.
+
+Notes:
+- level=0 stores every member; members whose extension is in store_extensions are stored regardless.
+- A member that cannot be read is dropped (the archive is truncated back to its header) and reported
+  in `stats["errors"]`.
+
+Dependencies:
+- External: datetime, functools, json, os, queue, struct, threading, time, zipfile, zlib, concurrent.futures, collections,
+  typing
+- Internal: utils.file_helpers, utils.io_scheduler, utils.logger
+"""
+
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from typing import NamedTuple
+from utils.file_helpers import data_extents, is_sparse
+from utils.io_scheduler import IOScheduler
+from utils.logger import get_logger
+
+COMPRESSED_EXTENSIONS = frozenset({
+    "7z", "aac", "apk", "avi", "avif", "br", "bz2", "docx", "epub", "flac", "gif", "gz", "heic", "jar", "jpeg",
+    "jpg", "lz4", "lzma", "m4a", "m4v", "mkv", "mov", "mp3", "mp4", "odp", "ods", "odt", "ogg", "opus", "png",
+    "pptx", "rar", "tbz2", "tgz", "txz", "webm", "webp", "whl", "xlsx", "xz", "zip", "zst",
+})
+
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+INDEX_SUFFIX = ".idx"
+# Smallest all-zero run written back as a hole when restoring a sparse member
+_SPARSE_MIN = 4096
+INDEX_FORMAT = "zip-side-index"
+INDEX_VERSION = 1
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+
+_ZIP32_MAX = 0xFFFFFFFF
+_ZIP16_MAX = 0xFFFF
+# Sizes/offsets/counts at or above these need Zip64 records
+_ZIP64_LIMIT = _ZIP32_MAX
+_ZIP64_COUNT_LIMIT = _ZIP16_MAX
+_FLAG_UTF8 = 0x800
+_FINAL_EMPTY_BLOCK = b"\x03\x00"
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+_END_RECORD = struct.Struct("<IHHHHIIH")
+_ZIP64_END_RECORD = struct.Struct("<IQHHIIQQQQ")
+_ZIP64_LOCATOR = struct.Struct("<IIQI")
+
+
+class ArchiveMember(NamedTuple):
+    name: str
+    header_offset: int
+    data_offset: int
+    size: int
+    compressed_size: int
+    crc: int
+    method: int
+    mtime_ns: int
+    mode: int
+    # Data regions [(offset, length)] of a sparse source file, None for ordinary files
+    extents: tuple | None = None
+
+
+def _gf2_times(matrix, vector):
+    total = 0
+    for row in matrix:
+        if not vector:
+            break
+        if vector & 1:
+            total ^= row
+        vector >>= 1
+    return total
+
+
+def _gf2_square(matrix):
+    return [_gf2_times(matrix, row) for row in matrix]
+
+
+def _shift_zeros(register, count):
+    """
+    Raw CRC-32 register advanced over `count` zero bytes, in O(log count) (zlib's crc32_combine operator).
+    """
+    odd = [0xEDB88320] + [1 << n for n in range(31)]  # one zero bit
+    even = _gf2_square(odd)  # two zero bits
+    odd = _gf2_square(even)  # four zero bits
+    while count:
+        even = _gf2_square(odd)
+        if count & 1:
+            register = _gf2_times(even, register)
+        count >>= 1
+        if not count:
+            break
+        odd = _gf2_square(even)
+        if count & 1:
+            register = _gf2_times(odd, register)
+        count >>= 1
+    return register
+
+
+@lru_cache(maxsize=16)
+def _zeros_operator(count):
+    # The shift is linear in the register: keep its image of every bit and reuse it per hole block
+    return [_shift_zeros(1 << bit, count) for bit in range(32)]
+
+
+def _crc32_zeros(crc, count):
+    """
+    zlib.crc32(bytes(count), crc) without touching `count` bytes.
+    """
+    if count <= 0:
+        return crc
+    return _gf2_times(_zeros_operator(count), crc ^ 0xFFFFFFFF) ^ 0xFFFFFFFF
+
+
+def _dos_datetime(mtime_ns):
+    t = time.localtime(mtime_ns / 1_000_000_000)
+    if t.tm_year < 1980:
+        return 0, (1 << 5) | 1
+    return ((t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+            ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday)
+
+
+def _deflate_block(data, level, last):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_FULL_FLUSH)
+
+
+class _Member:
+    __slots__ = ("index", "name", "path", "size", "mtime_ns", "mode", "method", "zip64", "blocks", "crc",
+                 "read", "holes", "extents", "terminate", "error")
+
+    def __init__(self, index, name, path, size, mtime_ns, method):
+        self.index = index
+        self.name = name
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.mode = 0o100644
+        self.method = method
+        # Deflate can expand incompressible data slightly; leave headroom before switching to Zip64
+        self.zip64 = size + size // 100 + 64 >= _ZIP64_LIMIT
+        self.blocks = queue.Queue()
+        self.crc = 0
+        self.read = 0
+        self.holes = 0
+        self.extents = None
+        self.terminate = False
+        self.error = None
+
+
+class ZipArchiveWriter:
+    def __init__(self, path, level=6, workers=None, readers=2, block_size=DEFAULT_BLOCK_SIZE,
+                 store_extensions=COMPRESSED_EXTENSIONS):
+        self.logger = get_logger(__name__)
+        self.path = path
+        self.level = int(level)
+        self.workers = max(1, int(workers or os.cpu_count() or 1))
+        self.readers = max(1, int(readers))
+        self.block_size = int(block_size)
+        self.store_extensions = {e.lower().lstrip(".") for e in store_extensions or ()}
+        self.members: list[ArchiveMember] = []
+        self.stats = {"files": 0, "stored": 0, "deflated": 0, "bytes_in": 0, "bytes_out": 0, "holes": 0,
+                      "errors": [],
+                      "elapsed": 0.0}
+        self._f = open(path, "wb")
+        self._limit = 4 * self.workers
+        self._in_flight = 0
+        self._current = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._zero_blocks = {}
+
+    # Block budget shared by readers and the writer
+
+    def _acquire(self, member):
+        with self._cond:
+            # The member being written may use a second budget so the writer always has work
+            while not (self._in_flight < self._limit
+                       or (member.index == self._current and self._in_flight < 2 * self._limit)):
+                self._cond.wait()
+            self._in_flight += 1
+
+    def _release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def _advance(self, index):
+        with self._cond:
+            self._current = index
+            self._cond.notify_all()
+
+    # Pipeline stages
+
+    def _zero_block(self, member, length, last):
+        """
+        Payload for `length` bytes of a hole: identical for every hole block, so built once.
+        """
+        key = (member.method, length, last)
+        payload = self._zero_blocks.get(key)
+        if payload is None:
+            zeros = bytes(length)
+            payload = _deflate_block(zeros, self.level, last) if member.method == ZIP_DEFLATED else zeros
+            self._zero_blocks[key] = payload
+        return payload
+
+    def _read_member(self, member, pool):
+        try:
+            with open(member.path, "rb") as f:
+                st = os.fstat(f.fileno())
+                member.mode = st.st_mode
+                extents = data_extents(f.fileno(), st.st_size) if is_sparse(st) else None
+                if extents is not None:
+                    member.extents = tuple(extents)
+                pos = 0
+                next_extent = 0
+                while True:
+                    length = min(self.block_size, st.st_size - pos)
+                    hole = False
+                    if extents is not None and length > 0:
+                        # Skip extents that end before this block; the block is a hole if the next starts after it
+                        while next_extent < len(extents) and sum(extents[next_extent]) <= pos:
+                            next_extent += 1
+                        hole = next_extent >= len(extents) or extents[next_extent][0] >= pos + length
+                    if hole:
+                        # Nothing allocated here: no read, CRC advanced arithmetically, payload from cache
+                        f.seek(pos + length)
+                        last = length < self.block_size
+                        member.crc = _crc32_zeros(member.crc, length)
+                        member.holes += length
+                        data = None
+                    else:
+                        data = f.read(self.block_size)
+                        if not data:
+                            member.terminate = member.method == ZIP_DEFLATED
+                            break
+                        length = len(data)
+                        last = length < self.block_size
+                        member.crc = zlib.crc32(data, member.crc)
+                    member.read += length
+                    pos += length
+                    self._acquire(member)
+                    if data is None:
+                        member.blocks.put(self._zero_block(member, length, last))
+                    elif member.method == ZIP_DEFLATED:
+                        member.blocks.put(pool.submit(_deflate_block, data, self.level, last))
+                    else:
+                        member.blocks.put(data)
+                    if last:
+                        break
+        except OSError as exc:
+            member.error = exc
+        finally:
+            member.blocks.put(None)
+
+    def _write_member(self, member):
+        f = self._f
+        header_offset = f.tell()
+        name = member.name.encode("utf-8")
+        extra = struct.pack("<HHQQ", 1, 16, 0, 0) if member.zip64 else b""
+        dos_time, dos_date = _dos_datetime(member.mtime_ns)
+        version = 45 if member.zip64 else (20 if member.method == ZIP_DEFLATED else 10)
+        f.write(_LOCAL_HEADER.pack(0x04034B50, version, _FLAG_UTF8, member.method, dos_time, dos_date, 0, 0, 0,
+                                   len(name), len(extra)))
+        f.write(name)
+        f.write(extra)
+        data_offset = f.tell()
+        written = 0
+        while True:
+            item = member.blocks.get()
+            if item is None:
+                break
+            try:
+                data = item if isinstance(item, bytes) else item.result()
+            finally:
+                self._release()
+            if member.error is None:
+                f.write(data)
+                written += len(data)
+        if member.error is None and member.terminate:
+            f.write(_FINAL_EMPTY_BLOCK)
+            written += len(_FINAL_EMPTY_BLOCK)
+        if member.error is None and not member.zip64 and max(written, member.read) >= _ZIP64_LIMIT:
+            member.error = OSError(f"{member.path} grew past the Zip64 threshold while being archived")
+        if member.error is not None:
+            f.seek(header_offset)
+            f.truncate()
+            self.stats["errors"].append({"path": member.path, "error": str(member.error)})
+            return
+        # Patch CRC and sizes into the local header
+        end = f.tell()
+        f.seek(header_offset + 14)
+        if member.zip64:
+            f.write(struct.pack("<III", member.crc, _ZIP32_MAX, _ZIP32_MAX))
+            f.seek(header_offset + _LOCAL_HEADER.size + len(name) + 4)
+            f.write(struct.pack("<QQ", member.read, written))
+        else:
+            f.write(struct.pack("<III", member.crc, written, member.read))
+        f.seek(end)
+        self.members.append(ArchiveMember(member.name, header_offset, data_offset, member.read, written, member.crc,
+                                          member.method, member.mtime_ns, member.mode, member.extents))
+        self.stats["files"] += 1
+        self.stats["stored" if member.method == ZIP_STORED else "deflated"] += 1
+        self.stats["bytes_in"] += member.read
+        self.stats["holes"] += member.holes
+        self.stats["bytes_out"] += written
+
+    def _method_for(self, name):
+        if self.level <= 0:
+            return ZIP_STORED
+        ext = os.path.splitext(name)[1][1:].lower()
+        return ZIP_STORED if ext in self.store_extensions else ZIP_DEFLATED
+
+    def add_files(self, items):
+        """
+        Archive (arcname, path, size, mtime_ns) items in order.
+        """
+        started = time.perf_counter()
+        items = iter(items)
+        window = deque()
+        next_index = len(self.members) + len(self.stats["errors"])
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="zip-deflate") as pool, \
+                ThreadPoolExecutor(max_workers=self.readers, thread_name_prefix="zip-read") as read_pool:
+
+            def _fill():
+                nonlocal next_index
+                while len(window) < self.readers * 2:
+                    item = next(items, None)
+                    if item is None:
+                        return
+                    name, path, size, mtime_ns = item
+                    member = _Member(next_index, name.replace(os.sep, "/"), path, size, mtime_ns,
+                                     self._method_for(name))
+                    next_index += 1
+                    read_pool.submit(self._read_member, member, pool)
+                    window.append(member)
+
+            _fill()
+            while window:
+                member = window.popleft()
+                self._advance(member.index)
+                self._write_member(member)
+                _fill()
+        self.stats["elapsed"] += time.perf_counter() - started
+
+    def close(self):
+        if self._closed:
+            return self.members
+        self._closed = True
+        f = self._f
+        cd_offset = f.tell()
+        for member in self.members:
+            name = member.name.encode("utf-8")
+            fields = []
+            size, csize, offset = member.size, member.compressed_size, member.header_offset
+            if size >= _ZIP64_LIMIT:
+                fields.append(size)
+                size = _ZIP32_MAX
+            if csize >= _ZIP64_LIMIT:
+                fields.append(csize)
+                csize = _ZIP32_MAX
+            if offset >= _ZIP64_LIMIT:
+                fields.append(offset)
+                offset = _ZIP32_MAX
+            extra = struct.pack(f"<HH{len(fields)}Q", 1, 8 * len(fields), *fields) if fields else b""
+            version = 45 if fields else (20 if member.method == ZIP_DEFLATED else 10)
+            dos_time, dos_date = _dos_datetime(member.mtime_ns)
+            f.write(_CENTRAL_HEADER.pack(0x02014B50, (3 << 8) | version, version, _FLAG_UTF8, member.method,
+                                         dos_time, dos_date, member.crc, csize, size, len(name), len(extra), 0, 0,
+                                         0, (member.mode & 0xFFFF) << 16, offset))
+            f.write(name)
+            f.write(extra)
+        cd_end = f.tell()
+        count, cd_size = len(self.members), cd_end - cd_offset
+        if count >= _ZIP64_COUNT_LIMIT or cd_offset >= _ZIP64_LIMIT or cd_size >= _ZIP64_LIMIT:
+            f.write(_ZIP64_END_RECORD.pack(0x06064B50, 44, 45, 45, 0, 0, count, count, cd_size, cd_offset))
+            f.write(_ZIP64_LOCATOR.pack(0x07064B50, 0, cd_end, 1))
+            count, cd_size, cd_offset = _ZIP16_MAX, _ZIP32_MAX, _ZIP32_MAX
+        f.write(_END_RECORD.pack(0x06054B50, 0, 0, count, count, cd_size, cd_offset, 0))
+        f.close()
+        return self.members
+
+    def abort(self):
+        self._closed = True
+        self._f.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+# Side index
+
+def index_path(archive_path):
+    return archive_path + INDEX_SUFFIX
+
+
+def write_index(archive_path, members, source=None):
+    """
+    Write the sorted side index for `members` of `archive_path`; returns the index path.
+    """
+    path = index_path(archive_path)
+    header = {"format": INDEX_FORMAT, "version": INDEX_VERSION, "members": len(members),
+              "archive_size": os.path.getsize(archive_path), "source": source}
+    temp = f"{path}.tmp"
+    with open(temp, "w", encoding="utf-8", newline="\n") as f:
+        f.write(json.dumps(header, separators=(",", ":")) + "\n")
+        for m in sorted(members, key=lambda m: m.name):
+            record = [m.name, m.header_offset, m.data_offset, m.size, m.compressed_size, m.crc, m.method, m.mtime_ns,
+                      m.mode]
+            if m.extents is not None:
+                record.append([list(extent) for extent in m.extents])
+            f.write(json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n")
+    os.replace(temp, path)
+    return path
+
+
+def rebuild_index(archive_path):
+    """
+    Recreate the side index of a ZIP archive from its central directory (one local-header read per member).
+    """
+    members = []
+    with zipfile.ZipFile(archive_path) as zf, open(archive_path, "rb") as f:
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            f.seek(info.header_offset)
+            header = f.read(_LOCAL_HEADER.size)
+            if len(header) != _LOCAL_HEADER.size or header[:4] != b"PK\x03\x04":
+                raise zipfile.BadZipFile(f"Bad local header for {info.filename}")
+            fields = _LOCAL_HEADER.unpack(header)
+            data_offset = info.header_offset + _LOCAL_HEADER.size + fields[9] + fields[10]
+            mtime_ns = int(datetime(*info.date_time).timestamp()) * 1_000_000_000
+            members.append(ArchiveMember(info.filename, info.header_offset, data_offset, info.file_size,
+                                         info.compress_size, info.CRC, info.compress_type, mtime_ns,
+                                         (info.external_attr >> 16) or 0o100644))
+    return write_index(archive_path, members)
+
+
+def _member_from_line(line):
+    record = json.loads(line)
+    if len(record) > 9 and record[9] is not None:
+        record[9] = tuple(tuple(extent) for extent in record[9])
+    return ArchiveMember(*record)
+
+
+class ArchiveIndex:
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, "rb")
+        self._size = os.fstat(self._f.fileno()).st_size
+        first = self._f.readline()
+        try:
+            self.header = json.loads(first)
+        except ValueError:
+            self.header = {}
+        if self.header.get("format") != INDEX_FORMAT:
+            self._f.close()
+            raise ValueError(f"Not an archive index: {path}")
+        self._start = len(first)
+
+    def __len__(self):
+        return int(self.header.get("members", 0))
+
+    def __iter__(self):
+        self._f.seek(self._start)
+        for line in self._f:
+            yield _member_from_line(line)
+
+    def _line_at_or_after(self, pos):
+        """
+        (start, line) of the first line starting at or after byte `pos`.
+        """
+        if pos <= self._start:
+            self._f.seek(self._start)
+        else:
+            self._f.seek(pos - 1)
+            self._f.readline()
+        start = self._f.tell()
+        return start, self._f.readline()
+
+    def _seek_first(self, name):
+        """
+        Position the file at the first record whose name is >= `name`.
+        """
+        lo, hi = self._start, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start, line = self._line_at_or_after(mid)
+            if not line or json.loads(line)[0] >= name:
+                hi = mid
+            else:
+                lo = start + len(line)
+        start, _ = self._line_at_or_after(lo)
+        self._f.seek(start)
+
+    def lookup(self, name):
+        self._seek_first(name)
+        line = self._f.readline()
+        if line:
+            member = _member_from_line(line)
+            if member.name == name:
+                return member
+        return None
+
+    def iter_prefix(self, prefix):
+        """
+        Members equal to `prefix` or below the `prefix/` directory, in name order.
+        """
+        self._seek_first(prefix)
+        for line in self._f:
+            member = _member_from_line(line)
+            if not member.name.startswith(prefix):
+                break
+            if member.name == prefix or member.name[len(prefix)] == "/":
+                yield member
+
+    def select(self, paths=None):
+        """
+        All members, or those matching any of `paths` (file names or directory prefixes).
+        """
+        if not paths:
+            return list(self)
+        seen = {}
+        for path in paths:
+            prefix = path.replace(os.sep, "/").strip("/")
+            for member in (self if not prefix else self.iter_prefix(prefix)):
+                seen.setdefault(member.name, member)
+        return [seen[name] for name in sorted(seen)]
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def load_index(archive_path):
+    """
+    Open the side index of `archive_path`, (re)building it from the central directory if missing or stale.
+    """
+    path = index_path(archive_path)
+    if os.path.exists(path):
+        index = ArchiveIndex(path)
+        if index.header.get("archive_size") == os.path.getsize(archive_path):
+            return index
+        index.close()
+    rebuild_index(archive_path)
+    return ArchiveIndex(path)
+
+
+# Random-access extraction
+
+def _write_out(out, data, sparse):
+    # Sparse members: all-zero pieces (hole blocks inflate to exactly one block) become holes again
+    if sparse and len(data) >= _SPARSE_MIN and data == bytes(len(data)):
+        out.seek(len(data), os.SEEK_CUR)
+    else:
+        out.write(data)
+
+
+def _extract_member(f, member, dest, buffer_size=DEFAULT_BLOCK_SIZE):
+    if member.method not in (ZIP_STORED, ZIP_DEFLATED):
+        raise OSError(f"Unsupported compression method {member.method}")
+    os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+    temp = f"{dest}.restore-tmp"
+    crc = 0
+    written = 0
+    sparse = member.extents is not None
+    try:
+        with open(temp, "wb") as out:
+            f.seek(member.data_offset)
+            remaining = member.compressed_size
+            inflater = zlib.decompressobj(-15) if member.method == ZIP_DEFLATED else None
+            while True:
+                # Bounded output per step: long zero runs inflate ~1000x
+                if inflater is not None and inflater.unconsumed_tail:
+                    data = inflater.decompress(inflater.unconsumed_tail, buffer_size)
+                elif remaining > 0:
+                    data = f.read(min(buffer_size, remaining))
+                    if not data:
+                        raise OSError("Archive is truncated")
+                    remaining -= len(data)
+                    if inflater is not None:
+                        data = inflater.decompress(data, buffer_size)
+                else:
+                    break
+                crc = zlib.crc32(data, crc)
+                written += len(data)
+                _write_out(out, data, sparse)
+            if inflater is not None:
+                tail = inflater.flush()
+                crc = zlib.crc32(tail, crc)
+                written += len(tail)
+                _write_out(out, tail, sparse)
+            if sparse:
+                out.truncate(written)
+        if crc != member.crc or written != member.size:
+            raise OSError(f"Checksum mismatch for {member.name}")
+        os.chmod(temp, member.mode & 0o7777 or 0o644)
+        os.utime(temp, ns=(member.mtime_ns, member.mtime_ns))
+        os.replace(temp, dest)
+    except BaseException:
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+        raise
+    return written
+
+
+class _ExtractKey(NamedTuple):
+    device: int
+    inode: int
+    size: int
+
+
+def extract(archive_path, members, target, overwrite=False, workers=None, progress=None):
+    """
+    Extract `members` (from the side index) under `target`.
+    Returns {"restored", "skipped", "failed", "bytes", "devices"}.
+    """
+    target = os.path.abspath(target)
+    result = {"restored": [], "skipped": [], "failed": [], "bytes": 0}
+    jobs = []
+    for member in members:
+        dest = os.path.normpath(os.path.join(target, *member.name.split("/")))
+        if not dest.startswith(target + os.sep):
+            result["failed"].append({"path": member.name, "error": "Path escapes the restore target"})
+        elif os.path.lexists(dest) and not overwrite:
+            result["skipped"].append(member.name)
+        else:
+            jobs.append((member, dest))
+    handles = threading.local()
+    opened = []
+    lock = threading.Lock()
+
+    def _run(job):
+        if getattr(handles, "f", None) is None:
+            handles.f = open(archive_path, "rb")
+            with lock:
+                opened.append(handles.f)
+        return _extract_member(handles.f, *job)
+
+    # Every read hits the archive's device; ordering jobs by data offset keeps reads sequential
+    device = os.stat(archive_path).st_dev
+    scheduler = IOScheduler(workers_per_device=max(1, int(workers or min(8, (os.cpu_count() or 1) * 2))),
+                            order="inode")
+    try:
+        for (member, _), outcome in scheduler.map(_run, jobs,
+                                                  key=lambda job: _ExtractKey(device, job[0].data_offset, job[0].size)):
+            if isinstance(outcome, (OSError, zlib.error)):
+                result["failed"].append({"path": member.name, "error": str(outcome)})
+            elif isinstance(outcome, Exception):
+                raise outcome
+            else:
+                result["bytes"] += outcome
+                result["restored"].append(member.name)
+            if progress is not None:
+                progress({"done": len(result["restored"]) + len(result["failed"]), "total": len(jobs),
+                          "bytes": result["bytes"]})
+    finally:
+        for f in opened:
+            f.close()
+    result["devices"] = scheduler.stats()
+    result["restored"].sort()
+    return result
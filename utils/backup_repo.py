@@ -0,0 +1,582 @@
+"""
+Deduplicating backup repository.
+
+Responsibilities:
+- Store snapshots of directory trees as lists of content-defined chunks (utils.chunker); each unique
+  chunk is stored once, compressed, inside pack files:
+    - BackupRepository.init(path, chunk params, compression level) / BackupRepository(path) to open
+    - backup(source, exclude=None, parent="auto", reuse_unchanged=True, workers=None, progress=None) -> dict
+    - snapshots() -> list[dict], load_snapshot(snapshot_id) -> dict, latest(source=None) -> dict|None
+    - catalog() -> SnapshotCatalog, rebuild_catalog() -> int
+    - iter_tree(snapshot_id) -> iterator of TreeEntry
+    - restore(snapshot_id, target, paths=None, overwrite=False, progress=None) -> dict
+
+Layout:
+    <repo>/config.json                 {"format": "utility-suite-repo", "version": 1, "hash": "sha256",
+                                        "chunker": {...}, "compression": "zlib", "level": int, "pack_size": int}
+    <repo>/packs/<xx>/<pack>.pack      concatenated chunk blobs (zlib-compressed, or stored when that is smaller)
+    <repo>/index/<pack>.idx            fixed-size records per blob: digest, offset, length, raw size, codec
+    <repo>/trees/<snapshot>.jsonl      one TreeEntry per line: files and file symlinks in manifest order
+                                       (utils.manifest.path_key), then directories and directory symlinks
+    <repo>/snapshots/<snapshot>.json   snapshot metadata: id, time, source, parent, counts and byte totals
+    <repo>/catalog.sqlite3             snapshot catalog (utils.snapshot_catalog), derived from snapshots/
+
+Notes:
+- A pack and its index are written under temporary names and renamed when the pack is full; the snapshot
+  metadata file is written last. An interrupted backup therefore leaves at most unreferenced packs, never
+  a snapshot pointing at missing chunks.
+- With reuse_unchanged, files whose size, mtime and inode match the parent snapshot reuse its chunk list
+  without being read (the parent tree is merged with the live walk in one pass, not loaded). Otherwise
+  every file is read and chunked, and only chunks not yet in the repository are compressed and written,
+  so a changed multi-GB file costs the bytes around its edits.
+- New chunks are compressed on a thread pool (zlib releases the GIL); the repository is locked against
+  concurrent writers with an OS lock on <repo>/lock (flock/msvcrt.locking), released by the kernel if
+  the holder dies.
+- The snapshot metadata files are the source of truth; each backup also adds its row to the catalog,
+  which answers listings and latest() without reading every snapshot file. A missing catalog is rebuilt
+  from snapshots/ on first use (rebuild_catalog() forces it).
+- Restores verify every chunk digest and write each file under a temporary name before renaming it.
+
+Dependencies:
+- External: hashlib, json, os, secrets, struct, threading, time, zlib, concurrent.futures, collections, typing,
+  fcntl (POSIX) / msvcrt (Windows)
+- Internal: utils.chunker, utils.file_helpers, utils.manifest, utils.snapshot_catalog, utils.logger
+"""
+
+import hashlib
+import json
+import os
+import secrets
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import NamedTuple
+from utils.chunker import Chunker
+from utils.file_helpers import FileHelpers, _default_workers
+from utils.logger import get_logger
+from utils.manifest import merge_walk, to_rel
+from utils.snapshot_catalog import CATALOG_NAME, SnapshotCatalog
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+REPO_FORMAT = "utility-suite-repo"
+REPO_VERSION = 1
+DEFAULT_HASH = "sha256"
+DEFAULT_LEVEL = 3
+DEFAULT_PACK_SIZE = 32 * 1024 * 1024
+
+CODEC_STORED = 0
+CODEC_ZLIB = 1
+_INDEX_MAGIC = b"USIX\x01"
+_MAX_OPEN_PACKS = 32
+
+
+class TreeEntry(NamedTuple):
+    path: str
+    type: str
+    size: int
+    mtime_ns: int
+    mode: int
+    ino: int | None = None
+    chunks: list | None = None
+    target: str | None = None
+
+    def to_json(self):
+        record = {"path": self.path, "type": self.type, "size": self.size, "mtime_ns": self.mtime_ns, "mode": self.mode}
+        if self.ino is not None:
+            record["ino"] = self.ino
+        if self.chunks is not None:
+            record["chunks"] = self.chunks
+        if self.target is not None:
+            record["target"] = self.target
+        return json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, line):
+        obj = json.loads(line)
+        return cls(obj["path"], obj["type"], obj.get("size", 0), obj.get("mtime_ns", 0), obj.get("mode", 0),
+                   obj.get("ino"), obj.get("chunks"), obj.get("target"))
+
+
+class RepositoryError(Exception):
+    pass
+
+
+class _RepoLock:
+    """
+    Exclusive OS lock on <repo>/lock (fcntl.flock on POSIX, msvcrt.locking on Windows). The kernel drops it
+    when the holder exits, so a crashed backup never leaves a stale lock and no PID has to be probed. The
+    file itself stays in place: unlinking it on release would let a waiter lock an orphaned inode.
+    """
+
+    def __init__(self, repo_path):
+        self.path = os.path.join(repo_path, "lock")
+        self._fd = None
+
+    def __enter__(self):
+        fd = os.open(self.path, os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            os.close(fd)
+            raise RepositoryError(f"Repository is locked by another process ({self.path})") from None
+        # The PID is informational only (the lock is what excludes other writers)
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode("ascii"))
+        self._fd = fd
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                else:
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            except OSError:
+                pass
+            os.close(fd)
+        return False
+
+
+class _PackWriter:
+    """
+    Appends blobs to the current pack; finishes a pack (data + index) once it reaches pack_size.
+    """
+
+    def __init__(self, repo):
+        self.repo = repo
+        self.packs_written = 0
+        self.bytes_written = 0
+        self._f = None
+        self._id = None
+        self._records = []
+        self._offset = 0
+
+    def add(self, digest, blob, raw_size, codec):
+        if self._f is None:
+            self._id = secrets.token_hex(16)
+            path = self.repo._pack_path(self._id)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._f = open(path + ".tmp", "wb")
+            self._records = []
+            self._offset = 0
+        self._f.write(blob)
+        self._records.append((digest, self._offset, len(blob), raw_size, codec))
+        self.repo._index[digest] = (self._id, self._offset, len(blob), raw_size, codec)
+        self._offset += len(blob)
+        self.bytes_written += len(blob)
+        if self._offset >= self.repo.pack_size:
+            self.flush()
+
+    def flush(self):
+        if self._f is None:
+            return
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._f.close()
+        self._f = None
+        path = self.repo._pack_path(self._id)
+        os.replace(path + ".tmp", path)
+        self.repo._write_pack_index(self._id, self._records)
+        self.packs_written += 1
+
+    def abort(self):
+        if self._f is None:
+            return
+        self._f.close()
+        self._f = None
+        for digest, *_ in self._records:
+            self.repo._index.pop(digest, None)
+        try:
+            os.remove(self.repo._pack_path(self._id) + ".tmp")
+        except OSError:
+            pass
+
+
+class BackupRepository:
+    def __init__(self, path):
+        self.logger = get_logger(__name__)
+        self.path = os.path.abspath(path)
+        config_path = os.path.join(self.path, "config.json")
+        try:
+            with open(config_path, "r", encoding="utf-8") as f:
+                self.config = json.load(f)
+        except FileNotFoundError:
+            raise RepositoryError(f"Not a backup repository: {self.path}") from None
+        if self.config.get("format") != REPO_FORMAT:
+            raise RepositoryError(f"Not a backup repository: {self.path}")
+        if int(self.config.get("version", 0)) > REPO_VERSION:
+            raise RepositoryError(f"Unsupported repository version: {self.config.get('version')}")
+        self.hash_name = self.config.get("hash", DEFAULT_HASH)
+        self.chunker = Chunker.from_params(self.config["chunker"])
+        self.level = int(self.config.get("level", DEFAULT_LEVEL))
+        self.pack_size = int(self.config.get("pack_size", DEFAULT_PACK_SIZE))
+        self.helpers = FileHelpers()
+        self._digest_size = hashlib.new(self.hash_name).digest_size
+        self._record = struct.Struct(f">{self._digest_size}sQIIB")
+        self._index = None
+        self._packs = OrderedDict()
+        self._packs_lock = threading.Lock()
+        self._catalog = None
+
+    @classmethod
+    def init(cls, path, min_size=None, avg_size=None, max_size=None, level=DEFAULT_LEVEL,
+             hash_name=DEFAULT_HASH, pack_size=DEFAULT_PACK_SIZE):
+        path = os.path.abspath(path)
+        if os.path.exists(os.path.join(path, "config.json")):
+            raise RepositoryError(f"Repository already exists: {path}")
+        hashlib.new(hash_name)
+        chunker = Chunker(**{k: v for k, v in {"min_size": min_size, "avg_size": avg_size,
+                                                "max_size": max_size}.items() if v is not None})
+        for sub in ("packs", "index", "trees", "snapshots"):
+            os.makedirs(os.path.join(path, sub), exist_ok=True)
+        config = {"format": REPO_FORMAT, "version": REPO_VERSION, "hash": hash_name, "chunker": chunker.params(),
+                  "compression": "zlib", "level": int(level), "pack_size": int(pack_size),
+                  "created_at": int(time.time())}
+        FileHelpers().atomic_write_json(os.path.join(path, "config.json"), config)
+        return cls(path)
+
+    @classmethod
+    def open_or_init(cls, path, **kwargs):
+        if os.path.exists(os.path.join(path, "config.json")):
+            return cls(path)
+        return cls.init(path, **kwargs)
+
+    # Chunk index
+
+    def _pack_path(self, pack_id):
+        return os.path.join(self.path, "packs", pack_id[:2], f"{pack_id}.pack")
+
+    def _write_pack_index(self, pack_id, records):
+        path = os.path.join(self.path, "index", f"{pack_id}.idx")
+        with open(path + ".tmp", "wb") as f:
+            f.write(_INDEX_MAGIC)
+            for record in records:
+                f.write(self._record.pack(*record))
+        os.replace(path + ".tmp", path)
+
+    def _load_index(self):
+        if self._index is not None:
+            return self._index
+        index = {}
+        index_dir = os.path.join(self.path, "index")
+        for name in os.listdir(index_dir):
+            if not name.endswith(".idx"):
+                continue
+            pack_id = name[:-4]
+            with open(os.path.join(index_dir, name), "rb") as f:
+                data = f.read()
+            if not data.startswith(_INDEX_MAGIC):
+                self.logger.warning(f"Skipping unreadable pack index {name}")
+                continue
+            for digest, offset, length, raw_size, codec in self._record.iter_unpack(data[len(_INDEX_MAGIC):]):
+                index[digest] = (pack_id, offset, length, raw_size, codec)
+        self._index = index
+        return index
+
+    def chunk_count(self):
+        return len(self._load_index())
+
+    def read_chunk(self, digest):
+        """
+        Raw bytes of one chunk (by binary digest), verified against the digest.
+        """
+        location = self._load_index().get(digest)
+        if location is None:
+            raise RepositoryError(f"Missing chunk {digest.hex()}")
+        pack_id, offset, length, _raw_size, codec = location
+        with self._packs_lock:
+            f = self._packs.pop(pack_id, None)
+            if f is None:
+                f = open(self._pack_path(pack_id), "rb")
+                if len(self._packs) >= _MAX_OPEN_PACKS:
+                    self._packs.popitem(last=False)[1].close()
+            self._packs[pack_id] = f
+            f.seek(offset)
+            blob = f.read(length)
+        data = zlib.decompress(blob) if codec == CODEC_ZLIB else blob
+        if hashlib.new(self.hash_name, data).digest() != digest:
+            raise RepositoryError(f"Chunk {digest.hex()} is corrupt (pack {pack_id})")
+        return data
+
+    def close(self):
+        with self._packs_lock:
+            for f in self._packs.values():
+                f.close()
+            self._packs.clear()
+        if self._catalog is not None:
+            self._catalog.close()
+            self._catalog = None
+
+    # Snapshots
+
+    def catalog(self):
+        if self._catalog is None:
+            catalog = SnapshotCatalog(os.path.join(self.path, CATALOG_NAME))
+            missing = not catalog.exists
+            self._catalog = catalog
+            if missing:
+                self.rebuild_catalog()
+        return self._catalog
+
+    def rebuild_catalog(self):
+        """
+        Recreate the catalog from the snapshot metadata files; returns the number of snapshots.
+        """
+        if self._catalog is None:
+            self._catalog = SnapshotCatalog(os.path.join(self.path, CATALOG_NAME))
+        count = self._catalog.rebuild({**s, "kind": "repo"} for s in self.snapshots())
+        self.logger.info(f"Catalog of {self.path} rebuilt with {count} snapshot(s)")
+        return count
+
+    def snapshots(self):
+        """
+        Metadata of every snapshot, oldest first.
+        """
+        result = []
+        snap_dir = os.path.join(self.path, "snapshots")
+        for name in os.listdir(snap_dir):
+            if name.endswith(".json"):
+                try:
+                    with open(os.path.join(snap_dir, name), "r", encoding="utf-8") as f:
+                        result.append(json.load(f))
+                except (OSError, ValueError) as exc:
+                    self.logger.warning(f"Skipping unreadable snapshot {name}: {exc}")
+        result.sort(key=lambda s: (s.get("time", 0), s.get("id", "")))
+        return result
+
+    def load_snapshot(self, snapshot_id):
+        if snapshot_id == "latest":
+            snapshot = self.latest()
+            if snapshot is None:
+                raise RepositoryError("Repository has no snapshots")
+            return snapshot
+        try:
+            with open(os.path.join(self.path, "snapshots", f"{snapshot_id}.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise RepositoryError(f"Unknown snapshot: {snapshot_id}") from None
+
+    def latest(self, source=None):
+        row = self.catalog().latest(source)
+        return self.load_snapshot(row["id"]) if row else None
+
+    def iter_tree(self, snapshot_id):
+        snapshot = self.load_snapshot(snapshot_id)
+        with open(os.path.join(self.path, "trees", f"{snapshot['id']}.jsonl"), "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield TreeEntry.from_json(line)
+
+    # Backup
+
+    def backup(self, source, exclude=None, parent="auto", reuse_unchanged=True, workers=None, progress=None):
+        """
+        Snapshot `source` into the repository. parent: snapshot id, "auto" (latest snapshot of the same
+        source) or None. Returns the snapshot metadata with run statistics.
+        """
+        source = os.path.abspath(source)
+        if not os.path.isdir(source):
+            raise RepositoryError(f"Invalid source directory: {source}")
+        workers = max(1, int(workers or _default_workers()))
+        parent_snapshot = self.latest(source) if parent == "auto" else (self.load_snapshot(parent) if parent else None)
+        started = time.time()
+        snapshot_id = time.strftime("%Y%m%d-%H%M%S", time.gmtime(started)) + "-" + secrets.token_hex(3)
+        stats = {"files": 0, "dirs": 0, "symlinks": 0, "bytes": 0, "bytes_read": 0, "files_reused": 0,
+                 "chunks": 0, "new_chunks": 0, "new_bytes": 0, "stored_bytes": 0, "errors": 0}
+        index = self._load_index()
+        tree_path = os.path.join(self.path, "trees", f"{snapshot_id}.jsonl")
+
+        with _RepoLock(self.path), ThreadPoolExecutor(max_workers=workers, thread_name_prefix="repo") as pool:
+            packs = _PackWriter(self)
+            # future -> (digest, raw size); pending holds digests queued but not yet in the index
+            in_flight = {}
+            pending = set()
+
+            def _drain(return_when):
+                done, _ = wait(in_flight, return_when=return_when)
+                for future in done:
+                    digest, raw_size = in_flight.pop(future)
+                    blob, codec = future.result()
+                    packs.add(digest, blob, raw_size, codec)
+                    stats["stored_bytes"] += len(blob)
+
+            def _store(data):
+                digest = hashlib.new(self.hash_name, data).digest()
+                stats["chunks"] += 1
+                if digest in index or digest in pending:
+                    return digest
+                stats["new_chunks"] += 1
+                stats["new_bytes"] += len(data)
+                pending.add(digest)
+                in_flight[pool.submit(self._compress, data)] = (digest, len(data))
+                if len(in_flight) >= workers * 2:
+                    _drain(FIRST_COMPLETED)
+                return digest
+
+            trailing = []
+
+            def _entries():
+                for entry in self.helpers.scan_entries(source, exclude=exclude, sort=True, include_dirs=True):
+                    if entry.is_dir:
+                        trailing.append(entry)
+                    else:
+                        yield entry
+
+            parent_records = ()
+            if parent_snapshot is not None and reuse_unchanged:
+                parent_records = (r for r in self.iter_tree(parent_snapshot["id"]) if r.type != "dir")
+            try:
+                with open(tree_path + ".tmp", "w", encoding="utf-8", newline="\n") as tree:
+                    for rel, record, entry in merge_walk(parent_records, _entries(), source):
+                        if entry is None:
+                            continue
+                        out = self._entry_record(rel, record, entry, _store, stats)
+                        if out is not None:
+                            tree.write(out.to_json() + "\n")
+                            if progress is not None and stats["files"] % 1000 == 0 and out.type == "file":
+                                progress(dict(stats))
+                    for entry in trailing:
+                        out = self._dir_record(to_rel(entry.path, source), entry, stats)
+                        if out is not None:
+                            tree.write(out.to_json() + "\n")
+                    _drain(ALL_COMPLETED)
+                    packs.flush()
+                os.replace(tree_path + ".tmp", tree_path)
+            except BaseException:
+                packs.abort()
+                try:
+                    os.remove(tree_path + ".tmp")
+                except OSError:
+                    pass
+                raise
+
+            snapshot = {"id": snapshot_id, "time": started, "source": source,
+                        "parent": parent_snapshot["id"] if parent_snapshot else None,
+                        "files": stats["files"], "dirs": stats["dirs"], "symlinks": stats["symlinks"],
+                        "bytes": stats["bytes"], "new_bytes": stats["new_bytes"],
+                        "stored_bytes": stats["stored_bytes"], "elapsed": round(time.time() - started, 3)}
+            self.helpers.atomic_write_json(os.path.join(self.path, "snapshots", f"{snapshot_id}.json"), snapshot)
+            self.catalog().add({**snapshot, "kind": "repo"})
+        return {**snapshot, "stats": {**stats, "packs": packs.packs_written}}
+
+    def _compress(self, data):
+        blob = zlib.compress(data, self.level)
+        if len(blob) >= len(data):
+            return data, CODEC_STORED
+        return blob, CODEC_ZLIB
+
+    def _entry_record(self, rel, parent_record, entry, store, stats):
+        try:
+            if entry.is_symlink:
+                st = os.lstat(entry.path)
+                stats["symlinks"] += 1
+                return TreeEntry(rel, "symlink", 0, st.st_mtime_ns, st.st_mode & 0o7777,
+                                 target=os.readlink(entry.path))
+            st = os.stat(entry.path)
+            mode = st.st_mode & 0o7777
+            stats["files"] += 1
+            stats["bytes"] += entry.size
+            if (parent_record is not None and parent_record.type == "file" and parent_record.size == entry.size
+                    and parent_record.mtime_ns == entry.mtime_ns and parent_record.ino == entry.inode):
+                stats["files_reused"] += 1
+                return parent_record._replace(mode=mode)
+            chunks = []
+            with open(entry.path, "rb") as f:
+                for data in self.chunker.chunks(f):
+                    stats["bytes_read"] += len(data)
+                    chunks.append(store(data).hex())
+            return TreeEntry(rel, "file", entry.size, entry.mtime_ns, mode, entry.inode, chunks)
+        except OSError as exc:
+            self.logger.warning(f"Skipping {entry.path}: {exc}")
+            stats["errors"] += 1
+            return None
+
+    def _dir_record(self, rel, entry, stats):
+        try:
+            st = os.lstat(entry.path)
+        except OSError as exc:
+            self.logger.warning(f"Skipping {entry.path}: {exc}")
+            stats["errors"] += 1
+            return None
+        if entry.is_symlink:
+            stats["symlinks"] += 1
+            return TreeEntry(rel, "symlink", 0, st.st_mtime_ns, st.st_mode & 0o7777, target=os.readlink(entry.path))
+        stats["dirs"] += 1
+        return TreeEntry(rel, "dir", 0, st.st_mtime_ns, st.st_mode & 0o7777)
+
+    # Restore
+
+    def restore(self, snapshot_id, target, paths=None, overwrite=False, progress=None):
+        """
+        Restore a snapshot (or only `paths`: relative files or directory prefixes) under `target`.
+        Returns {"snapshot", "restored": [rel], "skipped": [rel], "failed": [{"path", "error"}], "bytes"}.
+        """
+        snapshot = self.load_snapshot(snapshot_id)
+        target = os.path.abspath(target)
+        prefixes = [p.replace(os.sep, "/").strip("/") for p in paths or []]
+        result = {"snapshot": snapshot["id"], "restored": [], "skipped": [], "failed": [], "bytes": 0}
+        dirs = []
+        for entry in self.iter_tree(snapshot["id"]):
+            if prefixes and not any(entry.path == p or entry.path.startswith(p + "/") for p in prefixes):
+                continue
+            dest = os.path.join(target, *entry.path.split("/"))
+            if entry.type == "dir":
+                dirs.append((dest, entry))
+                continue
+            if os.path.lexists(dest) and not overwrite:
+                result["skipped"].append(entry.path)
+                continue
+            try:
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                if entry.type == "symlink":
+                    if os.path.lexists(dest):
+                        os.remove(dest)
+                    os.symlink(entry.target, dest)
+                else:
+                    self._restore_file(entry, dest)
+                    result["bytes"] += entry.size
+                result["restored"].append(entry.path)
+            except (OSError, RepositoryError, zlib.error) as exc:
+                result["failed"].append({"path": entry.path, "error": str(exc)})
+            if progress is not None and len(result["restored"]) % 1000 == 0:
+                progress({"restored": len(result["restored"]), "bytes": result["bytes"]})
+        # Directory metadata last, deepest first, so restoring files does not bump their mtimes again
+        for dest, entry in sorted(dirs, key=lambda item: item[1].path.count("/"), reverse=True):
+            try:
+                os.makedirs(dest, exist_ok=True)
+                os.chmod(dest, entry.mode)
+                os.utime(dest, ns=(entry.mtime_ns, entry.mtime_ns))
+            except OSError as exc:
+                result["failed"].append({"path": entry.path, "error": str(exc)})
+        self.close()
+        return result
+
+    def _restore_file(self, entry, dest):
+        temp = f"{dest}.restore-tmp"
+        try:
+            with open(temp, "wb") as f:
+                for chunk in entry.chunks or ():
+                    f.write(self.read_chunk(bytes.fromhex(chunk)))
+            os.chmod(temp, entry.mode)
+            os.utime(temp, ns=(entry.mtime_ns, entry.mtime_ns))
+            os.replace(temp, dest)
+        except BaseException:
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+            raise
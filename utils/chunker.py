@@ -0,0 +1,128 @@
+"""
+Content-defined chunking.
+
+Responsibilities:
+- Split byte streams into variable-size chunks whose boundaries depend on the content, so an insertion
+  or edit only changes the chunks around it and every other chunk deduplicates against earlier copies:
+    - Chunker(min_size=512 KiB, avg_size=1 MiB, max_size=8 MiB)
+    - chunks(f) -> iterator of bytes (reads the binary file object `f` to the end)
+    - cut(buf, start, end) -> int: end of the chunk starting at `start` inside `buf`
+    - params() -> dict, Chunker.from_params(dict): persisted by callers so later runs cut identically
+
+Notes:
+- Boundaries use a gear rolling hash over a 32-byte window: h = (h << 1) + GEAR[byte] (mod 2**32).
+  A chunk ends after byte i when the top `bits` bits of the hash at i are zero, no earlier than
+  min_size and no later than max_size; bits = log2(avg_size - min_size).
+- The hash at i depends only on bytes i-31..i (older bytes are shifted out), so it can be computed for
+  a whole block at once: with numpy (optional) the window sum is built in five shift-and-add passes
+  (1, 2, 4, 8, 16 bytes) over the block. Without numpy a per-byte loop gives identical boundaries.
+- The GEAR table is derived from BLAKE2b and must never change: repositories rely on stable cut points.
+
+Dependencies:
+- External: hashlib, math, numpy (optional)
+"""
+
+import hashlib
+import math
+
+try:
+    import numpy as _np
+except Exception:  # optional dependency
+    _np = None
+
+WINDOW = 32
+_MASK32 = 0xFFFFFFFF
+GEAR = tuple(int.from_bytes(hashlib.blake2b(bytes([i]), digest_size=4, person=b"us-gear-v1").digest(), "little")
+             for i in range(256))
+_GEAR_NP = _np.array(GEAR, dtype=_np.uint32) if _np is not None else None
+
+DEFAULT_MIN_SIZE = 512 * 1024
+DEFAULT_AVG_SIZE = 1024 * 1024
+DEFAULT_MAX_SIZE = 8 * 1024 * 1024
+
+
+class Chunker:
+    def __init__(self, min_size=DEFAULT_MIN_SIZE, avg_size=DEFAULT_AVG_SIZE, max_size=DEFAULT_MAX_SIZE):
+        if not WINDOW <= min_size < avg_size <= max_size:
+            raise ValueError("Chunk sizes must satisfy 32 <= min_size < avg_size <= max_size")
+        self.min_size = int(min_size)
+        self.avg_size = int(avg_size)
+        self.max_size = int(max_size)
+        self.bits = max(1, min(31, round(math.log2(self.avg_size - self.min_size))))
+        self.mask = ((1 << self.bits) - 1) << (32 - self.bits)
+        # Hash this many bytes at a time while looking for a boundary
+        self.segment = max(64 * 1024, self.avg_size - self.min_size)
+
+    def params(self):
+        return {"algorithm": "gear32", "min_size": self.min_size, "avg_size": self.avg_size, "max_size": self.max_size}
+
+    @classmethod
+    def from_params(cls, params):
+        if params.get("algorithm", "gear32") != "gear32":
+            raise ValueError(f"Unsupported chunker: {params.get('algorithm')}")
+        return cls(params["min_size"], params["avg_size"], params["max_size"])
+
+    def cut(self, buf, start, end):
+        """
+        End offset of the chunk beginning at `start`, looking at buf[start:end]. When fewer than max_size
+        bytes are available and no boundary is found, returns `end` (callers only do that at EOF).
+        """
+        limit = min(end, start + self.max_size)
+        lo = start + self.min_size
+        if lo >= limit:
+            return limit
+        find = self._find_numpy if _np is not None else self._find_python
+        while lo < limit:
+            hi = min(limit, lo + self.segment)
+            hit = find(buf, lo, hi)
+            if hit is not None:
+                return hit + 1
+            lo = hi
+        return limit
+
+    def _find_numpy(self, buf, lo, hi):
+        # Window hashes for positions lo..hi-1; the block starts WINDOW-1 bytes earlier to fill the window
+        data = _np.frombuffer(buf, dtype=_np.uint8, count=hi - lo + WINDOW - 1, offset=lo - WINDOW + 1)
+        h = _GEAR_NP[data]
+        shift = 1
+        while shift < WINDOW:
+            h[shift:] += h[:-shift] << _np.uint32(shift)
+            shift <<= 1
+        hits = _np.flatnonzero((h[WINDOW - 1:] & _np.uint32(self.mask)) == 0)
+        return lo + int(hits[0]) if hits.size else None
+
+    def _find_python(self, buf, lo, hi):
+        gear, mask = GEAR, self.mask
+        h = 0
+        for i in range(lo - WINDOW + 1, lo):
+            h = ((h << 1) + gear[buf[i]]) & _MASK32
+        for i in range(lo, hi):
+            h = ((h << 1) + gear[buf[i]]) & _MASK32
+            if not h & mask:
+                return i
+        return None
+
+    def chunks(self, f, read_size=None):
+        """
+        Yield the chunks of binary file object `f` as bytes objects.
+        """
+        read_size = read_size or self.max_size
+        buf = bytearray()
+        pos = 0
+        eof = False
+        while True:
+            if not eof and len(buf) - pos < self.max_size:
+                if pos >= self.max_size:
+                    del buf[:pos]
+                    pos = 0
+                while len(buf) - pos < self.max_size:
+                    data = f.read(read_size)
+                    if not data:
+                        eof = True
+                        break
+                    buf += data
+            if pos >= len(buf):
+                return
+            end = self.cut(buf, pos, len(buf))
+            yield bytes(buf[pos:end])
+            pos = end
@@ -10,6 +10,10 @@ Responsibilities:
     MODULES_DIR = "modules"
     AGENT_CONFIG = "config/agent_config.json"
     MODULES_MANIFEST = "config/modules.json"
+    HASH_CACHE = "config/hash_cache.sqlite3"
+    DISK_INDEX_DIR = "config/disk_index"
+    RENAME_JOURNAL_DIR = "config/rename_journals"
+    BACKUP_MANIFEST_DIR = "config/backup_manifests"
     DEFAULT_SCHEDULE_MAX_CONCURRENT = 2
 - Avoid runtime logic; pure constants only.
 
@@ -24,6 +28,10 @@ class Constants:
     MODULES_DIR = "modules"
     AGENT_CONFIG = "config/agent_config.json"
     MODULES_MANIFEST = "config/modules.json"
+    HASH_CACHE = "config/hash_cache.sqlite3"
+    DISK_INDEX_DIR = "config/disk_index"
+    RENAME_JOURNAL_DIR = "config/rename_journals"
+    BACKUP_MANIFEST_DIR = "config/backup_manifests"
     DEFAULT_SCHEDULE_MAX_CONCURRENT = 2
 
 
@@ -0,0 +1,275 @@
+"""
+Rolling-checksum delta transfer (rsync-style) between two local files.
+
+Responsibilities:
+- Bring a stale copy (the basis) up to date with a source file while writing only what changed:
+    - signature(basis_path, block_size=None) -> Signature: per-block weak (Adler-32) and strong (BLAKE2b-128) sums
+    - compute_delta(src_path, sig, algorithm=None) -> Delta: copy-block / literal ops, plus the source digest
+    - apply_delta(delta, src_path, basis_path, inplace=True) -> str: "unchanged" | "inplace" | "rebuilt"
+    - sync_file(src_path, basis_path, algorithm=None, inplace=True) -> dict with per-file byte counts
+- block_size_for(size): block size for a basis of `size` bytes (about sqrt(size), 2 KiB .. 128 KiB).
+
+Notes:
+- The weak checksum is zlib.adler32 of a block, which rolls one byte at a time:
+  a' = a - out + in, b' = b - L*out + a' - 1 (mod 65521). Blocks are first tried at the expected next
+  position (strong hash only), so unchanged and merely shifted regions cost one hash per block; the
+  rolling search only runs through changed regions. With numpy (optional) the weak sums for a whole
+  region come from prefix sums in one pass; without it a per-byte loop finds the same matches.
+- When every matched block stays at its original offset (edits in place, appends, truncation), the
+  basis is patched in place: only literal bytes are written and the file is truncated to size. Other
+  deltas (insertions/deletions that shift data) rebuild the file under a temporary name from basis
+  blocks and literals, then rename it over the basis.
+- The source is memory-mapped; its digest (for manifests) is computed in the same pass.
+
+Dependencies:
+- External: hashlib, math, mmap, os, zlib, numpy (optional)
+- Internal: utils.file_helpers (new_hasher)
+"""
+
+import hashlib
+import math
+import mmap
+import os
+import zlib
+from utils.file_helpers import new_hasher
+
+try:
+    import numpy as _np
+except Exception:  # optional dependency
+    _np = None
+
+_MOD = 65521
+MIN_BLOCK_SIZE = 2048
+MAX_BLOCK_SIZE = 128 * 1024
+# Upper bound on positions whose weak sums are computed at once while searching a changed region
+_SEARCH_SEGMENT = 1024 * 1024
+
+
+def block_size_for(size):
+    if size <= 0:
+        return MIN_BLOCK_SIZE
+    return max(MIN_BLOCK_SIZE, min(MAX_BLOCK_SIZE, 1 << round(math.log2(math.sqrt(size)))))
+
+
+def _strong(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+class Signature:
+    def __init__(self, block_size, size, weak, strong):
+        self.block_size = block_size
+        self.size = size
+        self.weak = weak
+        self.strong = strong
+        self.lookup: dict[int, list[int]] = {}
+        for index, value in enumerate(weak):
+            self.lookup.setdefault(value, []).append(index)
+        self._weak_np = _np.unique(_np.array(weak, dtype=_np.uint32)) if _np is not None and weak else None
+
+    def __len__(self):
+        return len(self.strong)
+
+    def block_len(self, index):
+        return min(self.block_size, self.size - index * self.block_size)
+
+
+def signature(basis_path, block_size=None):
+    size = os.path.getsize(basis_path)
+    block_size = block_size or block_size_for(size)
+    weak, strong = [], []
+    with open(basis_path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            weak.append(zlib.adler32(block))
+            strong.append(_strong(block))
+    return Signature(block_size, size, weak, strong)
+
+
+class Delta:
+    def __init__(self, size, block_size):
+        self.size = size
+        self.block_size = block_size
+        # ("copy", block index, source offset, length) or ("literal", source offset, length)
+        self.ops = []
+        self.literal_bytes = 0
+        self.matched_bytes = 0
+        self.digest = None
+
+    def copy(self, index, offset, length):
+        self.ops.append(("copy", index, offset, length))
+        self.matched_bytes += length
+
+    def literal(self, offset, length):
+        if length <= 0:
+            return
+        if self.ops and self.ops[-1][0] == "literal" and sum(self.ops[-1][1:]) == offset:
+            _, start, prev = self.ops.pop()
+            self.ops.append(("literal", start, prev + length))
+        else:
+            self.ops.append(("literal", offset, length))
+        self.literal_bytes += length
+
+    @property
+    def aligned(self):
+        """
+        True when every copied block sits at its original offset (the basis can be patched in place).
+        """
+        return all(op[2] == op[1] * self.block_size for op in self.ops if op[0] == "copy")
+
+
+def _search_python(data, sig, start, end):
+    """
+    First (position, block index) in [start, end) whose full-size window matches a basis block.
+    """
+    size = sig.block_size
+    if end - start < size:
+        return None
+    a_b = zlib.adler32(data[start:start + size])
+    a, b = a_b & 0xFFFF, a_b >> 16
+    pos = start
+    last = end - size
+    while True:
+        indices = sig.lookup.get((b << 16) | a)
+        if indices:
+            strong = _strong(data[pos:pos + size])
+            for index in indices:
+                if sig.strong[index] == strong and sig.block_len(index) == size:
+                    return pos, index
+        if pos >= last:
+            return None
+        out, new = data[pos], data[pos + size]
+        a = (a - out + new) % _MOD
+        b = (b - size * out + a - 1) % _MOD
+        pos += 1
+
+
+def _search_numpy(data, sig, start, end):
+    size = sig.block_size
+    pos = start
+    # Most changed regions are short: start with a few blocks' worth of positions and grow
+    segment = 4 * size
+    while pos + size <= end:
+        stop = min(end, pos + segment + size)
+        segment = min(segment * 2, _SEARCH_SEGMENT)
+        x = _np.frombuffer(data, dtype=_np.uint8, count=stop - pos, offset=pos).astype(_np.int64)
+        s = _np.concatenate(([0], _np.cumsum(x)))
+        t = _np.concatenate(([0], _np.cumsum(x * _np.arange(len(x), dtype=_np.int64))))
+        k = _np.arange(len(x) - size + 1, dtype=_np.int64)
+        window = s[k + size] - s[k]
+        a = (1 + window) % _MOD
+        b = (size + (k + size) * window - (t[k + size] - t[k])) % _MOD
+        weak = ((b << 16) | a).astype(_np.uint32)
+        for rel in _np.flatnonzero(_np.isin(weak, sig._weak_np)):
+            candidate = pos + int(rel)
+            strong = _strong(data[candidate:candidate + size])
+            for index in sig.lookup.get(int(weak[rel]), ()):
+                if sig.strong[index] == strong and sig.block_len(index) == size:
+                    return candidate, index
+        pos += len(k)
+    return None
+
+
+def compute_delta(src_path, sig, algorithm=None):
+    """
+    Delta turning the basis described by `sig` into `src_path`. With `algorithm`, delta.digest is the
+    source file's digest.
+    """
+    size = os.path.getsize(src_path)
+    delta = Delta(size, sig.block_size)
+    hasher = new_hasher(algorithm) if algorithm else None
+    if size == 0:
+        delta.digest = hasher.hexdigest() if hasher else None
+        return delta
+    search = _search_numpy if _np is not None and sig._weak_np is not None else _search_python
+    block = sig.block_size
+    with open(src_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if hasher is not None:
+            view = memoryview(mm)
+            for offset in range(0, size, 16 * 1024 * 1024):
+                hasher.update(view[offset:offset + 16 * 1024 * 1024])
+            view.release()
+            delta.digest = hasher.hexdigest()
+        pos = 0
+        expected = 0
+        while pos < size:
+            # Fast path: the next basis block continues right here
+            if expected < len(sig):
+                length = sig.block_len(expected)
+                if pos + length <= size and _strong(mm[pos:pos + length]) == sig.strong[expected]:
+                    delta.copy(expected, pos, length)
+                    pos += length
+                    expected += 1
+                    continue
+            found = search(mm, sig, pos, size) if len(sig) else None
+            if found is None:
+                delta.literal(pos, size - pos)
+                break
+            match, index = found
+            delta.literal(pos, match - pos)
+            delta.copy(index, match, block)
+            pos = match + block
+            expected = index + 1
+    return delta
+
+
+def apply_delta(delta, src_path, basis_path, inplace=True):
+    """
+    Rewrite `basis_path` to match the source. Returns "unchanged", "inplace" or "rebuilt".
+    """
+    basis_size = os.path.getsize(basis_path)
+    if delta.literal_bytes == 0 and delta.size == basis_size and delta.aligned:
+        return "unchanged"
+    with open(src_path, "rb") as src:
+        if inplace and delta.aligned:
+            with open(basis_path, "r+b") as out:
+                for op in delta.ops:
+                    if op[0] == "literal":
+                        _, offset, length = op
+                        _copy_range(src, offset, length, out, offset)
+                out.truncate(delta.size)
+            return "inplace"
+        temp = f"{basis_path}.delta-tmp"
+        try:
+            with open(basis_path, "rb") as basis, open(temp, "wb") as out:
+                for op in delta.ops:
+                    if op[0] == "copy":
+                        _, index, offset, length = op
+                        _copy_range(basis, index * delta.block_size, length, out, offset)
+                    else:
+                        _, offset, length = op
+                        _copy_range(src, offset, length, out, offset)
+            os.replace(temp, basis_path)
+        except BaseException:
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+            raise
+    return "rebuilt"
+
+
+def _copy_range(src, src_offset, length, out, out_offset, buffer_size=1024 * 1024):
+    src.seek(src_offset)
+    out.seek(out_offset)
+    while length > 0:
+        data = src.read(min(buffer_size, length))
+        if not data:
+            raise OSError(f"Unexpected end of file while copying {length} more bytes")
+        out.write(data)
+        length -= len(data)
+
+
+def sync_file(src_path, basis_path, algorithm=None, inplace=True, block_size=None):
+    """
+    Update `basis_path` to match `src_path` by delta. Returns {"mode", "size", "literal_bytes",
+    "matched_bytes", "bytes_written", "bytes_saved", "digest"}; bytes_saved = size - bytes_written.
+    """
+    sig = signature(basis_path, block_size)
+    delta = compute_delta(src_path, sig, algorithm)
+    mode = apply_delta(delta, src_path, basis_path, inplace=inplace)
+    written = {"unchanged": 0, "inplace": delta.literal_bytes}.get(mode, delta.size)
+    return {"mode": mode, "size": delta.size, "literal_bytes": delta.literal_bytes,
+            "matched_bytes": delta.matched_bytes, "bytes_written": written, "bytes_saved": delta.size - written,
+            "digest": delta.digest}
@@ -4,41 +4,527 @@ Filesystem helpers used across packages.
 
 Responsibilities:
 - Provide safe, efficient file operations:
+    - scan_entries(root, exclude=None, max_depth=None, follow_symlinks=False, workers=1, include_dirs=False, sort=False, use_index=True)
+      -> generator[FileEntry]
+    - scan_dir(path, root=None, exclude=None) -> list[FileEntry] (one directory, no recursion)
+    - stat_entry(path) -> FileEntry|None (one path)
+    - register_hot_index(index) / unregister_hot_index(index): let scan_entries answer from a live
+      index kept by utils.fs_watch instead of walking
     - iterate_files(root, follow_symlinks=False) -> generator[str]
     - folder_size(path, depth=None) -> int (bytes)
-    - file_hash(path, algorithm="sha256", chunk_size=65536) -> str
-    - safe_copy(src, dst, overwrite=False)
+    - file_hash(path, algorithm="sha256", chunk_size=None, use_cache=False, io_mode="auto", st=None) -> str
+    - file_hash_many(items, algorithm="sha256", workers=None, use_cache=False, ordered=False)
+      -> generator[(item, str|Exception)]
+    - resolve_algorithm(algorithm) -> str / new_hasher(algorithm)
+    - partial_hash(path, algorithm="sha256", edge_size=65536, use_cache=False) -> str
+    - hash_cache_stats() / close_hash_cache() for the shared on-disk hash cache
+    - safe_copy(src, dst, overwrite=False) -> {"success", "message", "method"}
+    - copy_file(src, dst) -> str: copy contents in the kernel where possible; returns the method used
+    - copy_hashed(src, dst, algorithm="sha256", verify=False, manifest=None, rel=None) -> dict: copy and
+      hash in one read pass, optionally recording the digest in a utils.manifest.ManifestWriter
+    - read_back_hash(path, algorithm="sha256") -> str: hash a file bypassing the page cache (O_DIRECT)
+    - data_extents(fd, size) -> list[(offset, length)]|None / is_sparse(st): sparse-file layout via
+      SEEK_DATA/SEEK_HOLE
+    - copy_many(pairs, overwrite=False, scheduler=None) -> generator[(src, dst, dict|Exception)]: safe_copy
+      over utils.io_scheduler (workers per source device, inode order on rotational disks)
     - safe_move(src, dst, overwrite=False)
+    - rename_noreplace(src, dst): same-filesystem rename that fails with FileExistsError instead of
+      replacing an existing dst
     - send_to_trash(path) (uses send2trash if available)
-    - atomic_write_json(path, data)
-- Read large files in chunks for hashing and copying.
+    - send_to_trash_many(paths) / unlink_many(paths) -> {"done", "failed"} for batched deletion
+    - atomic_write_json(path, data, indent=2)
+- Walk trees with os.scandir and stat each entry exactly once; FileEntry carries the stat fields callers
+  need (size, mtime_ns, inode, device, nlink) so they never re-stat a path.
+- Read large files in chunks for hashing and copying; chunk size adapts to file size.
+- Hash many files concurrently on a bounded thread pool (hashlib releases the GIL on large buffers).
+- Besides hashlib names, accept fast non-cryptographic modes for dedup/change detection:
+    - "blake2b-64": stdlib BLAKE2b with an 8-byte digest
+    - "xxh3-64": xxhash (optional dependency)
+    - "fast": xxh3-64 when xxhash is installed, otherwise blake2b-64
+- Read large files through mmap (io_mode="auto"/"mmap") and smaller ones with readinto() into a
+  reused buffer, so hashing does not allocate a new bytes object per chunk.
+- Track bytes actually read for hashing in `bytes_hashed` so callers can report I/O saved.
+- copy_file/safe_copy avoid moving data through userspace: reflink (FICLONE, shares extents on
+  btrfs/XFS/...), then os.copy_file_range, then os.sendfile, then a buffered read/write loop; each
+  step falls back to the next when the kernel or filesystem refuses it. safe_copy keeps copy2 metadata.
+- Sparse files (fewer allocated blocks than their size) are copied extent by extent: only data regions
+  found with SEEK_DATA/SEEK_HOLE are read and written, holes are skipped with seeks and the size is
+  restored with ftruncate, so the copy stays sparse and I/O is proportional to the data. copy_hashed
+  feeds the hasher zeros for holes, so digests match those of a plain read.
+- copy_hashed feeds each buffer it reads to both the hasher and the destination, so a verified backup
+  reads the source once. It writes under a temporary name, applies copystat and renames, so a partial or
+  failed copy never replaces the destination. verify=True re-reads the temporary copy with O_DIRECT into
+  page-aligned 4 MiB buffers (falling back to fsync + POSIX_FADV_DONTNEED, then plain reads) so the
+  check sees what reached the disk rather than the page cache, and compares digests before the rename.
+- rename_noreplace checks for an existing destination in the same system call that renames: renameat2
+  with RENAME_NOREPLACE (Linux, via ctypes), else link + unlink (link never replaces), else an O_EXCL
+  placeholder that the rename then replaces; a plain os.rename on Windows, which never replaces. A
+  destination created after the caller's own existence check, or a name differing only in case on a
+  case-insensitive filesystem, is therefore never overwritten. safe_move(overwrite=False) uses it.
+- FileHelpers(max_bytes_per_sec=N) caps the combined read rate of all hashing threads (utils.throttle).
 
 Dependencies:
-- External: os, shutil, hashlib, send2trash (optional)
-- Internal: utils.logger
+- External: os, stat, shutil, errno, ctypes, fcntl (POSIX), hashlib, mmap, fnmatch, re, typing, collections, concurrent.futures, threading, send2trash (optional), xxhash (optional)
+- Internal: utils.logger, utils.throttle, utils.hash_cache (lazy), utils.io_scheduler (lazy)
 
 Safety:
 - Do not prompt for confirmation here; return structured results for caller to act upon.
 """
 
+import ctypes
+import ctypes.util
+import errno
+import fnmatch
 import hashlib
+import mmap
 import os
+import re
 import shutil
+import stat
 import json
+import threading
+from typing import NamedTuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from collections import deque
 from utils.logger import get_logger
+from utils.throttle import Throttle
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+def _chunk_size_for(size):
+    """
+    Pick a read size for hashing: small buffers for small files, large ones for big files.
+    """
+    if size < 1024 * 1024:
+        return 64 * 1024
+    if size < 64 * 1024 * 1024:
+        return 1024 * 1024
+    return 4 * 1024 * 1024
+
+
+# Linux ioctl that clones a whole file's extents (reflink)
+_FICLONE = 0x40049409
+# errnos meaning "this copy mechanism is not available here", so the next one is tried
+_COPY_FALLBACK_ERRNOS = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.ENOTTY, errno.EOPNOTSUPP, errno.EBADF,
+                         errno.EPERM}
+_COPY_BUFFER = 1024 * 1024
+
+
+_ZEROS = bytes(_COPY_BUFFER)
+
+
+def is_sparse(st):
+    """
+    True when a stat result has fewer allocated 512-byte blocks than its size needs (POSIX only).
+    """
+    blocks = getattr(st, "st_blocks", None)
+    return blocks is not None and blocks * 512 < st.st_size
+
+
+def data_extents(fd, size):
+    """
+    Data regions [(offset, length)] of an open file, found with SEEK_DATA/SEEK_HOLE; None when the
+    platform or filesystem cannot report them. Leaves the file offset at 0.
+    """
+    if not hasattr(os, "SEEK_DATA"):
+        return None
+    extents = []
+    pos = 0
+    try:
+        while pos < size:
+            try:
+                start = os.lseek(fd, pos, os.SEEK_DATA)
+            except OSError as exc:
+                if exc.errno == errno.ENXIO:  # only a hole remains
+                    break
+                raise
+            if start >= size:
+                break
+            end = min(os.lseek(fd, start, os.SEEK_HOLE), size)
+            extents.append((start, end - start))
+            pos = end
+    except OSError as exc:
+        if exc.errno in _COPY_FALLBACK_ERRNOS:
+            return None
+        raise
+    finally:
+        os.lseek(fd, 0, os.SEEK_SET)
+    return extents
+
+
+def sparse_regions(extents, size):
+    """
+    Split [0, size) into (offset, length, is_data) regions from a data_extents() map.
+    """
+    pos = 0
+    for offset, length in extents:
+        if offset > pos:
+            yield pos, offset - pos, False
+        yield offset, length, True
+        pos = offset + length
+    if pos < size:
+        yield pos, size - pos, False
+
+
+def _copy_extent(src_fd, dst_fd, offset, length):
+    end = offset + length
+    if hasattr(os, "copy_file_range"):
+        try:
+            while offset < end:
+                n = os.copy_file_range(src_fd, dst_fd, min(end - offset, 1 << 30), offset, offset)
+                if n == 0:
+                    return
+                offset += n
+            return
+        except OSError as exc:
+            if exc.errno not in _COPY_FALLBACK_ERRNOS:
+                raise
+    while offset < end:
+        data = os.pread(src_fd, min(end - offset, _COPY_BUFFER), offset)
+        if not data:
+            return
+        os.pwrite(dst_fd, data, offset)
+        offset += len(data)
+
+
+def _kernel_copy(src_fd, dst_fd, size):
+    """
+    Copy `size` bytes from the current offset of src_fd to dst_fd; returns the mechanism that finished it.
+    """
+    if fcntl is not None and size:
+        try:
+            fcntl.ioctl(dst_fd, _FICLONE, src_fd)
+            return "reflink"
+        except OSError as exc:
+            if exc.errno not in _COPY_FALLBACK_ERRNOS:
+                raise
+    extents = data_extents(src_fd, size) if size and is_sparse(os.fstat(src_fd)) else None
+    if extents is not None:
+        for offset, length in extents:
+            _copy_extent(src_fd, dst_fd, offset, length)
+        os.ftruncate(dst_fd, size)
+        return "sparse"
+    copied = 0
+    # Zero-size files (empty, or pseudo-files that report 0) are read until EOF below
+    for name in ("copy_file_range", "sendfile") if size else ():
+        if not hasattr(os, name):
+            continue
+        try:
+            while copied < size:
+                count = min(size - copied, 1 << 30)
+                if name == "copy_file_range":
+                    n = os.copy_file_range(src_fd, dst_fd, count)
+                else:
+                    n = os.sendfile(dst_fd, src_fd, None, count)
+                if n == 0:
+                    break
+                copied += n
+            return name
+        except OSError as exc:
+            # Offsets moved with every partial copy, so the next mechanism just continues
+            if exc.errno not in _COPY_FALLBACK_ERRNOS:
+                raise
+    while True:
+        data = os.read(src_fd, _COPY_BUFFER)
+        if not data:
+            return "userspace"
+        view = memoryview(data)
+        while view:
+            view = view[os.write(dst_fd, view):]
+
+
+_AT_FDCWD = -100
+_RENAME_NOREPLACE = 1
+# errnos meaning "this rename mechanism is not available here", so the next one is tried
+_RENAME_FALLBACK_ERRNOS = {errno.ENOSYS, errno.EINVAL, errno.EPERM, errno.EOPNOTSUPP, errno.EMLINK}
+_renameat2 = None
+
+
+def _load_renameat2():
+    """
+    libc renameat2 (glibc >= 2.28) or False when it cannot be used.
+    """
+    global _renameat2
+    if _renameat2 is None:
+        _renameat2 = False
+        if os.name == "posix":
+            try:
+                libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+                func = libc.renameat2
+                func.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+                func.restype = ctypes.c_int
+                _renameat2 = func
+            except (OSError, AttributeError):
+                pass
+    return _renameat2
+
+
+# Read-back verification buffer: a multiple of the usual direct I/O alignment (4 KiB)
+VERIFY_BUFFER = 4 * 1024 * 1024
+
+# Files at least this large are hashed through mmap in io_mode="auto"
+MMAP_THRESHOLD = 16 * 1024 * 1024
+IO_MODES = ("auto", "read", "mmap")
+
+
+def resolve_algorithm(algorithm):
+    """
+    Map an algorithm name to the concrete one that will be used.
+    "fast" becomes "xxh3-64" if xxhash is importable, else "blake2b-64".
+    Raises ValueError for unknown or unavailable algorithms.
+    """
+    if algorithm == "fast":
+        try:
+            import xxhash  # noqa: F401
+            return "xxh3-64"
+        except Exception:
+            return "blake2b-64"
+    if algorithm == "blake2b-64":
+        return algorithm
+    if algorithm == "xxh3-64":
+        try:
+            import xxhash  # noqa: F401
+        except Exception:
+            raise ValueError("xxh3-64 requires the optional xxhash package")
+        return algorithm
+    if algorithm not in hashlib.algorithms_available:
+        raise ValueError(f"Unsupported algorithm: {algorithm}")
+    return algorithm
+
+
+def new_hasher(algorithm):
+    """
+    Return a fresh hasher (update()/hexdigest() interface) for `algorithm`.
+    """
+    algorithm = resolve_algorithm(algorithm)
+    if algorithm == "blake2b-64":
+        return hashlib.blake2b(digest_size=8)
+    if algorithm == "xxh3-64":
+        import xxhash
+        return xxhash.xxh3_64()
+    return hashlib.new(algorithm)
+
+
+def _default_workers():
+    return min(16, (os.cpu_count() or 1) * 2)
+
+
+class FileEntry(NamedTuple):
+    """
+    One file (or directory, with include_dirs) yielded by FileHelpers.scan_entries.
+    Stat fields come from a single stat call; on Windows inode/device/nlink may be 0.
+    """
+    path: str
+    size: int
+    mtime_ns: int
+    inode: int
+    device: int
+    nlink: int
+    is_symlink: bool
+    is_dir: bool = False
+
+    def stat_key(self):
+        return (self.device, self.inode, self.size, self.mtime_ns)
+
+
+def _compile_excludes(patterns):
+    """
+    Compile glob patterns into one regex matched against entry names and root-relative paths ("/" separated).
+    """
+    if not patterns:
+        return None
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    return re.compile("|".join(f"(?:{fnmatch.translate(p)})" for p in patterns))
+
+
+# Live indexes (utils.fs_watch.HotIndex) that scan_entries may answer from instead of walking
+_HOT_INDEXES = []
+_HOT_LOCK = threading.Lock()
+
+
+def register_hot_index(index):
+    with _HOT_LOCK:
+        if index not in _HOT_INDEXES:
+            _HOT_INDEXES.append(index)
+
+
+def unregister_hot_index(index):
+    with _HOT_LOCK:
+        if index in _HOT_INDEXES:
+            _HOT_INDEXES.remove(index)
+
+
+def _find_hot_index(root, exclude):
+    with _HOT_LOCK:
+        candidates = list(_HOT_INDEXES)
+    for index in candidates:
+        if index.covers(root, exclude):
+            return index
+    return None
 
 
 class FileHelpers:
-    def __init__(self):
+    def __init__(self, hash_cache=None, max_bytes_per_sec=None):
         self.logger = get_logger(__name__)
+        self.hash_cache = hash_cache
+        self.bytes_hashed = 0
+        self.throttle = Throttle(max_bytes_per_sec) if max_bytes_per_sec else None
+        self._lock = threading.Lock()
+
+    def scan_entries(self, root, exclude=None, max_depth=None, follow_symlinks=False, workers=1,
+                     include_dirs=False, sort=False, use_index=True):
+        """
+        Recursively yield FileEntry objects under root using os.scandir.
+
+        - exclude: glob pattern(s) matched against entry names and root-relative paths; excluded
+          directories are pruned, not descended.
+        - max_depth: 0 yields only files directly in root, 1 adds one level of subfolders, etc.
+        - follow_symlinks: descend into symlinked directories (loops are detected by device/inode).
+          Symlinks to files are always yielded, with the target's stat when it resolves.
+        - workers > 1: list directories on a thread pool (useful on network filesystems); yield order
+          is then nondeterministic.
+        - include_dirs: also yield directory entries (is_dir=True, size 0).
+        - sort: deterministic order (ignores workers): each directory's files by name, then its
+          subdirectories by name, depth first.
+        - use_index: when a filesystem watcher (utils.fs_watch) keeps a hot index covering root, answer
+          from it (after applying pending events) instead of walking the disk.
+        Unreadable directories and entries are logged and skipped.
+        """
+        excludes = _compile_excludes(exclude)
+        root = os.fspath(root)
+        if use_index and not follow_symlinks and _HOT_INDEXES:
+            index = _find_hot_index(root, exclude)
+            if index is not None:
+                yield from index.iter_entries(root, excludes, max_depth, include_dirs, sort)
+                return
+        visited = set()
+        if follow_symlinks:
+            try:
+                st = os.stat(root)
+                visited.add((st.st_dev, st.st_ino))
+            except OSError:
+                pass
+        scan = lambda path, depth: self._scan_dir(root, path, depth, excludes, max_depth, follow_symlinks,
+                                                  include_dirs, sort, visited)
+
+        if workers and workers > 1 and not sort:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan") as pool:
+                pending = {pool.submit(scan, root, 0)}
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        entries, subdirs = future.result()
+                        yield from entries
+                        for sub, depth in subdirs:
+                            pending.add(pool.submit(scan, sub, depth))
+            return
+
+        stack = [(root, 0)]
+        while stack:
+            path, depth = stack.pop()
+            entries, subdirs = scan(path, depth)
+            yield from entries
+            stack.extend(reversed(subdirs))
+
+    def _scan_dir(self, root, path, depth, excludes, max_depth, follow_symlinks, include_dirs, sort, visited):
+        """
+        List one directory: return (entries to yield, [(subdir, depth)] to descend into).
+        """
+        entries, subdirs = [], []
+        try:
+            with os.scandir(path) as it:
+                listing = list(it)
+        except OSError as exc:
+            self.logger.warning(f"Cannot scan {path}: {exc}")
+            return entries, subdirs
+        if sort:
+            listing.sort(key=lambda e: e.name)
+        prefix = len(root.rstrip("/\\")) + 1
+        dirs = []
+        for entry in listing:
+            if excludes is not None:
+                rel = entry.path[prefix:].replace(os.sep, "/")
+                if excludes.match(entry.name) or excludes.match(rel):
+                    continue
+            try:
+                is_symlink = entry.is_symlink()
+                if entry.is_dir():
+                    dirs.append((entry, is_symlink))
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    # Broken symlink: report the link itself
+                    st = entry.stat(follow_symlinks=False)
+            except OSError as exc:
+                self.logger.warning(f"Cannot stat {entry.path}: {exc}")
+                continue
+            entries.append(FileEntry(entry.path, st.st_size, st.st_mtime_ns, st.st_ino, st.st_dev,
+                                     st.st_nlink, is_symlink))
+        for entry, is_symlink in dirs:
+            descend = max_depth is None or depth < max_depth
+            if is_symlink and not follow_symlinks:
+                descend = False
+            if not (descend or include_dirs):
+                continue
+            try:
+                st = entry.stat()
+            except OSError as exc:
+                self.logger.warning(f"Cannot stat {entry.path}: {exc}")
+                continue
+            if include_dirs:
+                entries.append(FileEntry(entry.path, 0, st.st_mtime_ns, st.st_ino, st.st_dev, st.st_nlink,
+                                         is_symlink, True))
+            if descend and follow_symlinks:
+                key = (st.st_dev, st.st_ino)
+                with self._lock:
+                    if key in visited:
+                        continue
+                    visited.add(key)
+            if descend:
+                subdirs.append((entry.path, depth + 1))
+        return entries, subdirs
+
+    def scan_dir(self, path, root=None, exclude=None):
+        """
+        List a single directory as FileEntry objects (files and directories, is_dir set), without descending.
+        Exclude patterns are matched relative to `root` (default: `path`), as in scan_entries.
+        """
+        root = os.fspath(root if root is not None else path)
+        entries, _ = self._scan_dir(root, os.fspath(path), 0, _compile_excludes(exclude), 0, False, True, False, set())
+        return entries
+
+    def stat_entry(self, path):
+        """
+        FileEntry for a single path (as scan_entries would report it), or None if it no longer exists.
+        """
+        path = os.fspath(path)
+        try:
+            lst = os.lstat(path)
+        except OSError:
+            return None
+        is_symlink = stat.S_ISLNK(lst.st_mode)
+        st = lst
+        if is_symlink:
+            try:
+                st = os.stat(path)
+            except OSError:
+                st = lst
+        if stat.S_ISDIR(st.st_mode):
+            return FileEntry(path, 0, st.st_mtime_ns, st.st_ino, st.st_dev, st.st_nlink, is_symlink, True)
+        return FileEntry(path, st.st_size, st.st_mtime_ns, st.st_ino, st.st_dev, st.st_nlink, is_symlink)
 
     def iterate_files(self, root, follow_symlinks=False):
         """
         Recursively iterate files from root, optionally following symlinks.
         """
-        for dirpath, dirnames, filenames in os.walk(root, followlinks=follow_symlinks):
-            for filename in filenames:
-                yield os.path.join(dirpath, filename)
+        for entry in self.scan_entries(root, follow_symlinks=follow_symlinks):
+            yield entry.path
 
     def folder_size(self, path, depth=None):
         """
@@ -46,57 +532,416 @@ class FileHelpers:
         If depth is provided (int), limit traversal depth relative to `path`.
         depth=0 means only direct files in `path`, depth=1 includes one level of subfolders, etc.
         """
-        total_size = 0
-        base_depth = path.rstrip(os.sep).count(os.sep)
-        for dirpath, dirnames, filenames in os.walk(path):
-            if depth is not None:
-                current_depth = dirpath.rstrip(os.sep).count(os.sep) - base_depth
-                if current_depth > depth:
-                    # prune deeper traversal
-                    dirnames[:] = []
-                    continue
-            for filename in filenames:
-                file_path = os.path.join(dirpath, filename)
-                try:
-                    total_size += os.path.getsize(file_path)
-                except Exception:
-                    # Skip unreadable files
-                    continue
-        return total_size
+        return sum(entry.size for entry in self.scan_entries(path, max_depth=depth))
 
-    def file_hash(self, path, algorithm="sha256", chunk_size=65536):
+    def get_hash_cache(self):
+        """
+        Return the shared on-disk hash cache, opening it on first use.
+        """
+        with self._lock:
+            if self.hash_cache is None:
+                from utils.hash_cache import HashCache
+                self.hash_cache = HashCache()
+        return self.hash_cache
+
+    def hash_cache_stats(self):
+        """
+        Return hit/miss counters of the hash cache (zeros if it was never used).
+        """
+        if self.hash_cache is None:
+            return {"hits": 0, "misses": 0, "evicted": 0}
+        return self.hash_cache.stats()
+
+    def close_hash_cache(self):
+        """
+        Flush and close the hash cache if it was opened.
+        """
+        if self.hash_cache is not None:
+            self.hash_cache.close()
+
+    def file_hash(self, path, algorithm="sha256", chunk_size=None, use_cache=False, io_mode="auto", st=None):
         """
         Calculate the hash of a file.
+        chunk_size=None picks a read size from the file size.
+        io_mode: "read" (readinto a reused buffer), "mmap", or "auto" (mmap from MMAP_THRESHOLD bytes up).
+        With use_cache=True, unchanged files (same device, inode, size, mtime) are served from the hash cache;
+        `st` (os.stat_result or FileEntry) avoids a second stat for the cache lookup.
         """
-        hasher = hashlib.new(algorithm)
+        if use_cache:
+            return self._cached(path, resolve_algorithm(algorithm),
+                                lambda: self.file_hash(path, algorithm, chunk_size, io_mode=io_mode), st)
+        if io_mode not in IO_MODES:
+            raise ValueError(f"Unsupported io_mode: {io_mode}")
+        hasher = new_hasher(algorithm)
         with open(path, "rb") as f:
-            while True:
-                chunk = f.read(chunk_size)
-                if not chunk:
-                    break
-                hasher.update(chunk)
+            size = os.fstat(f.fileno()).st_size
+            if chunk_size is None:
+                chunk_size = _chunk_size_for(size)
+            if size and (io_mode == "mmap" or (io_mode == "auto" and size >= MMAP_THRESHOLD)):
+                read = self._hash_mmap(f, hasher, chunk_size)
+            else:
+                read = self._hash_read(f, hasher, chunk_size)
+        self._count_hashed(read)
+        return hasher.hexdigest()
+
+    def _hash_read(self, f, hasher, chunk_size):
+        buf = bytearray(chunk_size)
+        view = memoryview(buf)
+        read = 0
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            hasher.update(view[:n])
+            read += n
+            if self.throttle is not None:
+                self.throttle.consume(n)
+        return read
+
+    def _hash_mmap(self, f, hasher, chunk_size):
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                for offset in range(0, len(mm), chunk_size):
+                    # Release each slice right away: the mmap cannot close while views of it exist
+                    with view[offset:offset + chunk_size] as chunk:
+                        hasher.update(chunk)
+                        if self.throttle is not None:
+                            self.throttle.consume(len(chunk))
+            finally:
+                view.release()
+            return len(mm)
+
+    def file_hash_many(self, items, algorithm="sha256", workers=None, use_cache=False, edge_size=None, io_mode="auto",
+                       ordered=False):
+        """
+        Hash many files on a bounded thread pool.
+        `items` are paths or FileEntry objects (whose stat is reused for cache lookups), from any
+        iterable including a generator; at most 2 * workers files are in flight.
+        Yields (item, digest) as results complete; digest is the raised Exception if hashing failed.
+        With ordered=True, results are yielded in input order instead (for streaming sorted output).
+        With edge_size set, computes partial_hash() digests instead of full ones.
+        """
+        workers = max(1, int(workers or _default_workers()))
+
+        def _one(item):
+            path, st = (item.path, item) if isinstance(item, FileEntry) else (item, None)
+            if edge_size is not None:
+                return self.partial_hash(path, algorithm=algorithm, edge_size=edge_size, use_cache=use_cache, st=st)
+            return self.file_hash(path, algorithm=algorithm, use_cache=use_cache, io_mode=io_mode, st=st)
+
+        source = iter(items)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="file_hash") as pool:
+            if ordered:
+                window = deque()
+                for item in source:
+                    window.append((item, pool.submit(_one, item)))
+                    if len(window) >= workers * 2:
+                        yield self._pop_result(window)
+                while window:
+                    yield self._pop_result(window)
+                return
+
+            pending = {}
+
+            def _fill():
+                while len(pending) < workers * 2:
+                    item = next(source, None)
+                    if item is None:
+                        return
+                    pending[pool.submit(_one, item)] = item
+
+            _fill()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as exc:
+                        result = exc
+                    yield item, result
+                _fill()
+
+    @staticmethod
+    def _pop_result(window):
+        item, future = window.popleft()
+        try:
+            return item, future.result()
+        except Exception as exc:
+            return item, exc
+
+    def partial_hash(self, path, algorithm="sha256", edge_size=65536, use_cache=False, st=None):
+        """
+        Hash only the first and last `edge_size` bytes of a file.
+        Files no larger than 2 * edge_size are hashed whole, so the digest equals file_hash().
+        """
+        if use_cache:
+            return self._cached(path, f"{resolve_algorithm(algorithm)}/partial:{edge_size}",
+                                lambda: self.partial_hash(path, algorithm, edge_size), st)
+        hasher = new_hasher(algorithm)
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size <= 2 * edge_size:
+                data = f.read()
+                hasher.update(data)
+                self._count_hashed(len(data))
+                if self.throttle is not None:
+                    self.throttle.consume(len(data))
+                return hasher.hexdigest()
+            head = f.read(edge_size)
+            f.seek(-edge_size, os.SEEK_END)
+            tail = f.read(edge_size)
+        if self.throttle is not None:
+            self.throttle.consume(len(head) + len(tail))
+        # Mix in the size so different-length files never share a partial digest
+        hasher.update(size.to_bytes(8, "little"))
+        hasher.update(head)
+        hasher.update(tail)
+        self._count_hashed(len(head) + len(tail))
         return hasher.hexdigest()
 
+    def _count_hashed(self, count):
+        with self._lock:
+            self.bytes_hashed += count
+
+    def _cached(self, path, cache_key, compute, st=None):
+        cache = self.get_hash_cache()
+        if st is None:
+            st = os.stat(path)
+        digest = cache.lookup(path, st, cache_key)
+        if digest is None:
+            digest = compute()
+            cache.store(path, st, cache_key, digest)
+        return digest
+
     def safe_copy(self, src, dst, overwrite=False):
         """
-        Copy a file safely, optionally overwriting.
+        Copy a file safely, optionally overwriting. Contents go through copy_file, metadata through copystat.
         """
         if not overwrite and os.path.exists(dst):
             return {"success": False, "message": "Destination exists"}
         os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
-        shutil.copy2(src, dst)
-        return {"success": True, "message": "File copied"}
+        if os.path.isdir(dst):
+            dst = os.path.join(dst, os.path.basename(src))
+        method = self.copy_file(src, dst)
+        shutil.copystat(src, dst)
+        return {"success": True, "message": "File copied", "method": method}
+
+    def copy_hashed(self, src, dst, algorithm="sha256", verify=False, manifest=None, rel=None):
+        """
+        Copy src to dst (contents and copystat metadata) while hashing the bytes read.
+        Returns {"digest", "size", "bytes_read", "mtime_ns", "verified", "sparse"}. With `manifest` (a ManifestWriter), the
+        record (rel, size, mtime_ns, digest) is written to it. verify=True re-reads the copy from disk
+        and raises OSError on a digest mismatch; dst is left untouched in that case.
+        """
+        hasher = new_hasher(algorithm)
+        os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+        temp = f"{dst}.copy-tmp"
+        try:
+            with open(src, "rb") as fsrc, open(temp, "wb") as fdst:
+                st = os.fstat(fsrc.fileno())
+                extents = data_extents(fsrc.fileno(), st.st_size) if is_sparse(st) else None
+                buf = bytearray(_chunk_size_for(st.st_size))
+                view = memoryview(buf)
+                zeros = memoryview(_ZEROS)
+                read = 0
+                regions = sparse_regions(extents, st.st_size) if extents is not None else [(0, None, True)]
+                for offset, length, is_data in regions:
+                    if not is_data:
+                        # Holes read as zeros: hash them without reading and leave them unallocated
+                        for start in range(0, length, len(_ZEROS)):
+                            hasher.update(zeros[:min(len(_ZEROS), length - start)])
+                        fdst.seek(offset + length)
+                        continue
+                    fsrc.seek(offset)
+                    remaining = length
+                    while remaining is None or remaining > 0:
+                        n = fsrc.readinto(view if remaining is None else view[:min(len(buf), remaining)])
+                        if not n:
+                            break
+                        hasher.update(view[:n])
+                        fdst.write(view[:n])
+                        read += n
+                        if remaining is not None:
+                            remaining -= n
+                        if self.throttle is not None:
+                            self.throttle.consume(n)
+                if extents is not None:
+                    fdst.truncate(st.st_size)
+                size = st.st_size if extents is not None else read
+            self._count_hashed(read)
+            digest = hasher.hexdigest()
+            shutil.copystat(src, temp)
+            if verify and self.read_back_hash(temp, algorithm) != digest:
+                raise OSError(f"Verification failed for {dst}: copy does not match {src}")
+            os.replace(temp, dst)
+        except BaseException:
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+            raise
+        if manifest is not None:
+            manifest.write(rel if rel is not None else os.path.basename(src), size, st.st_mtime_ns, digest)
+        return {"digest": digest, "size": size, "bytes_read": read, "mtime_ns": st.st_mtime_ns,
+                "verified": bool(verify), "sparse": extents is not None}
+
+    def read_back_hash(self, path, algorithm="sha256"):
+        """
+        Hash `path` as stored on disk: O_DIRECT reads into aligned buffers where supported, otherwise
+        fsync + drop the cached pages first (POSIX), otherwise ordinary reads.
+        """
+        direct = getattr(os, "O_DIRECT", 0)
+        fd = None
+        if direct:
+            try:
+                fd = os.open(path, os.O_RDONLY | direct)
+            except OSError:
+                fd = None
+        try:
+            if fd is not None:
+                try:
+                    return self._read_back(fd, algorithm)
+                except OSError as exc:
+                    # Some filesystems accept O_DIRECT at open time but reject the reads
+                    if exc.errno != errno.EINVAL:
+                        raise
+                os.close(fd)
+                fd = None
+            fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+            if hasattr(os, "posix_fadvise"):
+                os.fsync(fd)
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            return self._read_back(fd, algorithm)
+        finally:
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+
+    def _read_back(self, fd, algorithm):
+        hasher = new_hasher(algorithm)
+        os.lseek(fd, 0, os.SEEK_SET)
+        if not hasattr(os, "readv"):  # Windows: no O_DIRECT either, plain reads
+            while True:
+                data = os.read(fd, VERIFY_BUFFER)
+                if not data:
+                    return hasher.hexdigest()
+                hasher.update(data)
+        # Anonymous mmap memory is page-aligned, as O_DIRECT requires
+        with mmap.mmap(-1, VERIFY_BUFFER) as buf:
+            view = memoryview(buf)
+            try:
+                while True:
+                    n = os.readv(fd, [buf])
+                    if not n:
+                        break
+                    with view[:n] as chunk:
+                        hasher.update(chunk)
+            finally:
+                view.release()
+        return hasher.hexdigest()
+
+    def copy_many(self, pairs, overwrite=False, scheduler=None):
+        """
+        safe_copy every (src, dst) pair, scheduled per source device; src may be a path or a FileEntry.
+        Pass an IOScheduler to tune workers/ordering or to read its per-device stats afterwards.
+        Yields (src, dst, result dict or exception) as copies complete.
+        """
+        from utils.io_scheduler import IOScheduler
+
+        scheduler = scheduler or IOScheduler()
+        jobs = []
+        for src, dst in pairs:
+            entry = src if isinstance(src, FileEntry) else self.stat_entry(src)
+            if entry is None:
+                yield src, dst, FileNotFoundError(f"No such file: {src}")
+                continue
+            jobs.append((entry, dst))
+
+        def _copy(job):
+            return self.safe_copy(job[0].path, job[1], overwrite=overwrite)
+
+        for (entry, dst), result in scheduler.map(_copy, jobs, key=lambda job: job[0]):
+            yield entry, dst, result
+
+    def copy_file(self, src, dst):
+        """
+        Copy file contents (no metadata) from src to dst, truncating dst.
+        Returns "reflink", "sparse" (extent-by-extent copy of a sparse file), "copy_file_range", "sendfile"
+        or "userspace".
+        """
+        if os.path.exists(dst) and os.path.samefile(src, dst):
+            raise shutil.SameFileError(f"{src!r} and {dst!r} are the same file")
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            size = os.fstat(fsrc.fileno()).st_size
+            return _kernel_copy(fsrc.fileno(), fdst.fileno(), size)
 
     def safe_move(self, src, dst, overwrite=False):
         """
         Move a file safely, optionally overwriting.
+        Without overwrite, a cross-device move lands under a temporary name next to dst first and is then
+        renamed into place with rename_noreplace, so a dst created meanwhile is never replaced.
         """
         if not overwrite and os.path.exists(dst):
             return {"success": False, "message": "Destination exists"}
         os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
-        shutil.move(src, dst)
+        if overwrite or os.path.isdir(dst):
+            shutil.move(src, dst)
+            return {"success": True, "message": "File moved"}
+        try:
+            self.rename_noreplace(src, dst)
+            return {"success": True, "message": "File moved"}
+        except FileExistsError:
+            return {"success": False, "message": "Destination exists"}
+        except OSError as exc:
+            if exc.errno != errno.EXDEV:
+                raise
+        temp = os.path.join(os.path.dirname(dst) or ".", f".{os.path.basename(dst)}.{os.getpid()}.move-tmp")
+        shutil.move(src, temp)
+        try:
+            self.rename_noreplace(temp, dst)
+        except FileExistsError:
+            shutil.move(temp, src)
+            return {"success": False, "message": "Destination exists"}
         return {"success": True, "message": "File moved"}
 
+    def rename_noreplace(self, src, dst):
+        """
+        Rename src to dst on the same filesystem, raising FileExistsError if dst exists (checked atomically
+        with the rename). Other errors (EXDEV, ENOENT, ...) propagate as OSError.
+        """
+        if os.name == "nt":
+            os.rename(src, dst)  # never replaces on Windows
+            return
+        func = _load_renameat2()
+        if func:
+            if func(_AT_FDCWD, os.fsencode(src), _AT_FDCWD, os.fsencode(dst), _RENAME_NOREPLACE) == 0:
+                return
+            err = ctypes.get_errno()
+            if err == errno.EEXIST:
+                raise FileExistsError(err, os.strerror(err), dst)
+            if err not in _RENAME_FALLBACK_ERRNOS:
+                raise OSError(err, os.strerror(err), src, None, dst)
+        try:
+            os.link(src, dst, follow_symlinks=False)
+        except OSError as exc:
+            if exc.errno not in _RENAME_FALLBACK_ERRNOS:
+                raise
+        else:
+            os.unlink(src)
+            return
+        # No hardlinks here (FAT, some network filesystems): claim the name first, then replace the claim
+        fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        os.close(fd)
+        try:
+            os.replace(src, dst)
+        except BaseException:
+            os.unlink(dst)
+            raise
+
     def send_to_trash(self, path):
         """
         Send a file to the trash.
@@ -111,13 +956,70 @@ class FileHelpers:
         except Exception as exc:
             return {"success": False, "message": f"send2trash failed: {exc}"}
 
-    def atomic_write_json(self, path, data):
+    def send_to_trash_many(self, paths):
+        """
+        Send a batch of files to the trash in one send2trash call, retrying per file if the batch fails.
+        Returns {"success", "done": [paths], "failed": [(path, message)], "message"}.
+        """
+        try:
+            from send2trash import send2trash as _send2trash
+        except Exception:
+            return {"success": False, "done": [], "failed": [(p, "send2trash not available") for p in paths],
+                    "message": "send2trash not available"}
+        try:
+            _send2trash(list(paths))
+            return {"success": True, "done": list(paths), "failed": [], "message": "Files sent to trash"}
+        except Exception:
+            done, failed = [], []
+            for p in paths:
+                res = self.send_to_trash(p)
+                if res.get("success"):
+                    done.append(p)
+                else:
+                    failed.append((p, res.get("message")))
+            return {"success": not failed, "done": done, "failed": failed, "message": None}
+
+    def unlink_many(self, paths):
+        """
+        Permanently delete a batch of files. Files sharing a parent directory are unlinked relative to
+        one open directory descriptor where the platform supports it, saving a path lookup per file.
+        Returns {"success", "done": [paths], "failed": [(path, message)], "message"}.
+        """
+        done, failed = [], []
+        by_dir: dict[str, list[str]] = {}
+        for p in paths:
+            by_dir.setdefault(os.path.dirname(p), []).append(p)
+        use_dir_fd = os.unlink in os.supports_dir_fd
+        for parent, group in by_dir.items():
+            dir_fd = None
+            if use_dir_fd and len(group) > 1:
+                try:
+                    dir_fd = os.open(parent or ".", os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+                except OSError:
+                    dir_fd = None
+            try:
+                for p in group:
+                    try:
+                        if dir_fd is not None:
+                            os.unlink(os.path.basename(p), dir_fd=dir_fd)
+                        else:
+                            os.unlink(p)
+                        done.append(p)
+                    except OSError as exc:
+                        failed.append((p, str(exc)))
+            finally:
+                if dir_fd is not None:
+                    os.close(dir_fd)
+        return {"success": not failed, "done": done, "failed": failed, "message": None}
+
+    def atomic_write_json(self, path, data, indent=2):
         """
         Write JSON data atomically to a file.
+        indent=None writes compact JSON (for large machine-read indexes).
         """
         os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
         temp_path = f"{path}.tmp"
         with open(temp_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
+            json.dump(data, f, indent=indent, separators=(",", ":") if indent is None else None)
         os.replace(temp_path, path)
         return {"success": True, "message": "JSON written"}
@@ -0,0 +1,605 @@
+"""
+Filesystem change watching and hot indexes.
+
+Responsibilities:
+- Keep a live, in-memory index of a directory tree (HotIndex) up to date from change notifications, so
+  features can list a watched tree without walking the disk again:
+    - FsWatcher(root, exclude=None, backend="auto", poll_interval=5.0): start(), stop(), sync(), status(),
+      changes(since=0, limit=None)
+    - start_watch(root, ...) -> FsWatcher, stop_watch(root) -> bool, get_watcher(root), watchers()
+- Running inotify watchers register themselves with FileHelpers (register_hot_index), so
+  FileHelpers.scan_entries(root) answers from the index whenever a watcher covers `root`.
+- Record a bounded change log ({"seq", "kind": "created"|"modified"|"deleted", "path", "is_dir"}) that
+  callers can poll incrementally by sequence number.
+
+Backends:
+- "inotify" (Linux): inotify_init1 / inotify_add_watch / inotify_rm_watch through ctypes, one watch per
+  directory. Events only mark (directory, name) pairs dirty; each batch is applied with one stat per
+  dirty name, and new directories are watched before they are listed so nothing created in between is lost.
+- "polling": rescan the whole tree every poll_interval seconds and diff it against the index.
+- "auto": inotify when available, otherwise polling.
+
+Notes:
+- When the per-user watch limit is exhausted (ENOSPC from inotify_add_watch), the affected directory and
+  its subtree stay unwatched and are rescanned every poll_interval instead; the rest of the tree keeps
+  its watches. A kernel queue overflow (IN_Q_OVERFLOW) triggers a rescan of the whole root.
+- sync() applies every event already queued by the kernel, so with inotify an index read after a write
+  returns observes it. The loop thread reads and applies each batch under the same lock sync() takes,
+  so sync() never returns while a dequeued batch is still pending.
+- Only fully watched trees are served as hot indexes: polled parts (the polling backend, subtrees left
+  unwatched by the watch limit) may lag by up to poll_interval, so polling watchers never register and
+  listings that overlap an unwatched subtree fall back to walking the disk. Those watchers still keep
+  their index and change log for status()/changes().
+- Symlinked directories are indexed as entries but never descended, matching scan_entries' default.
+
+Dependencies:
+- External: ctypes, errno, os, select, struct, sys, threading, time, collections
+- Internal: utils.file_helpers, utils.logger
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from utils.file_helpers import FileHelpers, _compile_excludes, register_hot_index, unregister_hot_index
+from utils.logger import get_logger
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW)
+
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0o2000000)
+_EVENT_HEADER = struct.Struct("iIII")
+
+BACKENDS = {"auto", "inotify", "polling"}
+DEFAULT_POLL_INTERVAL = 5.0
+DEFAULT_CHANGE_LOG = 10000
+
+
+class _Inotify:
+    """
+    Minimal ctypes binding for the Linux inotify API.
+    """
+
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add = libc.inotify_add_watch
+        self._add.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._add.restype = ctypes.c_int
+        self._rm = libc.inotify_rm_watch
+        self._rm.argtypes = [ctypes.c_int, ctypes.c_int]
+        self._rm.restype = ctypes.c_int
+        self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        wd = self._add(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def rm_watch(self, wd):
+        self._rm(self.fd, wd)
+
+    def wait(self, timeout):
+        """
+        True once events are queued, False after `timeout` seconds without any.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        return bool(ready)
+
+    def read_events(self):
+        """
+        Events queued so far as (wd, mask, name) tuples; never blocks.
+        """
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(data):
+                wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+                offset += length
+                events.append((wd, mask, name))
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def _norm(path):
+    return os.path.normcase(os.path.abspath(os.fspath(path)))
+
+
+def _within(path, root):
+    return path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+
+
+class HotIndex:
+    """
+    In-memory tree of FileEntry objects: {directory: {name: FileEntry}}, plus a bounded change log.
+    """
+
+    def __init__(self, root, exclude=None, helpers=None, log_size=DEFAULT_CHANGE_LOG):
+        self.root = os.path.abspath(os.fspath(root))
+        self.real_root = _norm(os.path.realpath(self.root))
+        self.exclude = exclude
+        self.excludes = _compile_excludes(exclude)
+        self.helpers = helpers or FileHelpers()
+        self.seq = 0
+        self.rescans = 0
+        self._dirs: dict[str, dict] = {}
+        self._log = deque(maxlen=log_size)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(listing) for listing in self._dirs.values())
+
+    def _record(self, kind, entry):
+        self.seq += 1
+        self._log.append((self.seq, kind, entry.path, entry.is_dir))
+
+    def _descend(self, entry):
+        return entry.is_dir and not entry.is_symlink
+
+    def _drop(self, path, removed):
+        """
+        Forget directory `path` and everything below it, logging deletions; appends dropped dirs to `removed`.
+        """
+        stack = [path]
+        while stack:
+            current = stack.pop()
+            listing = self._dirs.pop(current, None)
+            if listing is None:
+                continue
+            removed.append(current)
+            for entry in listing.values():
+                self._record("deleted", entry)
+                if self._descend(entry):
+                    stack.append(entry.path)
+
+    def _update(self, parent, name, entry, removed, created):
+        """
+        Put `entry` (or None for gone) at parent/name, logging the change.
+        """
+        listing = self._dirs.setdefault(parent, {})
+        old = listing.get(name)
+        if entry is None:
+            if old is not None:
+                del listing[name]
+                self._record("deleted", old)
+                if self._descend(old):
+                    self._drop(old.path, removed)
+            return
+        listing[name] = entry
+        if old is None:
+            self._record("created", entry)
+        elif old.stat_key() != entry.stat_key() or old.is_dir != entry.is_dir:
+            if self._descend(old) and not self._descend(entry):
+                self._drop(old.path, removed)
+            self._record("modified", entry)
+        if self._descend(entry) and entry.path not in self._dirs:
+            created.append(entry.path)
+
+    def rescan(self, path=None, on_dir=None):
+        """
+        Re-list the subtree at `path` (default: root) from disk and diff it into the index.
+        on_dir(dir) is called before each directory is listed (the inotify backend adds its watch there).
+        Returns (directories now indexed under path, directories dropped).
+        """
+        path = os.path.abspath(os.fspath(path)) if path is not None else self.root
+        scanned, removed = [], []
+        with self._lock:
+            self.rescans += 1
+            stack = [path]
+            while stack:
+                current = stack.pop()
+                if on_dir is not None:
+                    on_dir(current)
+                if not os.path.isdir(current):
+                    self._drop(current, removed)
+                    continue
+                fresh = {os.path.basename(e.path): e for e in self.helpers.scan_dir(current, root=self.root,
+                                                                                        exclude=self.exclude)}
+                created = []
+                old = self._dirs.get(current, {})
+                for name in list(old):
+                    if name not in fresh:
+                        self._update(current, name, None, removed, created)
+                self._dirs.setdefault(current, {})
+                for name, entry in fresh.items():
+                    self._update(current, name, entry, removed, created)
+                scanned.append(current)
+                # Existing subdirectories are re-listed too: this is a full resync of the subtree
+                stack.extend(e.path for e in fresh.values() if self._descend(e))
+        return scanned, removed
+
+    def refresh(self, parent, name):
+        """
+        Re-stat one name inside an indexed directory. Returns (new directories to index, dropped directories).
+        """
+        path = os.path.join(parent, name)
+        entry = None
+        if self._included(path):
+            entry = self.helpers.stat_entry(path)
+        created, removed = [], []
+        with self._lock:
+            if parent not in self._dirs:
+                return created, removed
+            self._update(parent, name, entry, removed, created)
+        return created, removed
+
+    @property
+    def directories(self):
+        return len(self._dirs)
+
+    def _included(self, path):
+        if self.excludes is None:
+            return True
+        rel = os.path.relpath(path, self.root).replace(os.sep, "/")
+        return not (self.excludes.match(os.path.basename(path)) or self.excludes.match(rel))
+
+    def covers(self, root, exclude=None):
+        """
+        True if listing `root` with `exclude` can be answered from this index.
+        """
+        target = _norm(root)
+        base = _norm(self.root)
+        if self.exclude and not (target == base and exclude == self.exclude):
+            return False
+        if not _within(target, base):
+            return False
+        # A path reached through a symlinked directory is not part of the (non-following) index
+        return _norm(os.path.realpath(root)) == os.path.join(self.real_root, target[len(base):].lstrip(os.sep)).rstrip(os.sep)
+
+    def iter_entries(self, root, excludes, max_depth, include_dirs, sort):
+        """
+        Yield FileEntry objects under `root` in the same shape and order as FileHelpers.scan_entries,
+        with paths spelled relative to the caller's `root` string.
+        """
+        root = os.fspath(root)
+        prefix = len(root.rstrip("/\\")) + 1
+        stack = [(root, os.path.abspath(root), 0)]
+        while stack:
+            path, key, depth = stack.pop()
+            with self._lock:
+                listing = list(self._dirs.get(key, {}).items())
+            if sort:
+                listing.sort(key=lambda item: item[0])
+            files, dirs = [], []
+            for name, entry in listing:
+                caller_path = os.path.join(path, name)
+                if excludes is not None:
+                    rel = caller_path[prefix:].replace(os.sep, "/")
+                    if excludes.match(name) or excludes.match(rel):
+                        continue
+                (dirs if entry.is_dir else files).append((caller_path, entry))
+            subdirs = []
+            for caller_path, entry in files:
+                yield entry._replace(path=caller_path)
+            for caller_path, entry in dirs:
+                descend = (max_depth is None or depth < max_depth) and not entry.is_symlink
+                if include_dirs:
+                    yield entry._replace(path=caller_path)
+                if descend:
+                    subdirs.append((caller_path, entry.path, depth + 1))
+            stack.extend(reversed(subdirs))
+
+    def changes(self, since=0, limit=None):
+        """
+        Logged changes with seq > since: (list of dicts, truncated, latest seq). `truncated` is True when
+        older changes than `since` have already been evicted from the bounded log.
+        """
+        with self._lock:
+            log = list(self._log)
+            latest = self.seq
+        truncated = bool(log) and log[0][0] > since + 1
+        out = []
+        for seq, kind, path, is_dir in log:
+            if seq <= since:
+                continue
+            out.append({"seq": seq, "kind": kind, "path": path, "is_dir": is_dir})
+            if limit is not None and len(out) >= limit:
+                break
+        return out, truncated, latest
+
+
+class FsWatcher:
+    def __init__(self, root, exclude=None, backend="auto", poll_interval=DEFAULT_POLL_INTERVAL):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unsupported backend: {backend}")
+        self.logger = get_logger(__name__)
+        self.root = os.path.abspath(os.fspath(root))
+        self.requested_backend = backend
+        self.backend = None
+        self.poll_interval = max(0.1, float(poll_interval))
+        self.index = HotIndex(self.root, exclude)
+        self.started_at = None
+        self.events = 0
+        self.overflows = 0
+        self.watch_limit_hits = 0
+        self._inotify = None
+        self._wd_dirs: dict[int, str] = {}
+        self._dir_wds: dict[str, int] = {}
+        self._unwatched: set[str] = set()
+        self._apply_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_poll = 0.0
+
+    # Lifecycle
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        if self.requested_backend in {"auto", "inotify"}:
+            try:
+                self._inotify = _Inotify()
+                self.backend = "inotify"
+            except (OSError, AttributeError) as exc:
+                if self.requested_backend == "inotify":
+                    raise
+                self.logger.info(f"inotify unavailable ({exc}); polling {self.root}")
+        if self._inotify is None:
+            self.backend = "polling"
+        self.index.rescan(on_dir=self._watch if self._inotify else None)
+        self._last_poll = time.monotonic()
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._loop, name=f"fs-watch:{self.root}", daemon=True)
+        self._thread.start()
+        if self._inotify is not None:
+            register_hot_index(self)
+        return self
+
+    def stop(self):
+        unregister_hot_index(self)
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=max(2.0, self.poll_interval))
+            self._thread = None
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        self._wd_dirs.clear()
+        self._dir_wds.clear()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    # Watch bookkeeping
+
+    def _watch(self, path):
+        if path in self._dir_wds or any(_within(path, d) for d in self._unwatched):
+            return
+        try:
+            wd = self._inotify.add_watch(path)
+        except OSError as exc:
+            if exc.errno == errno.ENOSPC:
+                # Watch limit reached: this subtree is polled instead
+                self.watch_limit_hits += 1
+                if not self._unwatched:
+                    self.logger.warning(f"inotify watch limit reached under {path}; polling that subtree "
+                                        "(raise fs.inotify.max_user_watches to avoid this)")
+                self._unwatched = {d for d in self._unwatched if not _within(d, path)}
+                self._unwatched.add(path)
+            elif exc.errno not in {errno.ENOENT, errno.ENOTDIR}:
+                self.logger.warning(f"Cannot watch {path}: {exc}")
+            return
+        self._wd_dirs[wd] = path
+        self._dir_wds[path] = wd
+
+    def _unwatch(self, paths):
+        for path in paths:
+            self._unwatched.discard(path)
+            wd = self._dir_wds.pop(path, None)
+            if wd is not None:
+                self._wd_dirs.pop(wd, None)
+                if self._inotify is not None:
+                    self._inotify.rm_watch(wd)
+
+    # Event processing
+
+    def _apply(self, events):
+        dirty: dict[tuple[str, str], None] = {}
+        full_rescan = False
+        for wd, mask, name in events:
+            self.events += 1
+            if mask & IN_Q_OVERFLOW:
+                full_rescan = True
+                continue
+            path = self._wd_dirs.get(wd)
+            if path is None:
+                continue
+            if mask & IN_IGNORED:
+                self._wd_dirs.pop(wd, None)
+                if self._dir_wds.get(path) == wd:
+                    del self._dir_wds[path]
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                if path == self.root:
+                    full_rescan = True
+                else:
+                    dirty[os.path.split(path)] = None
+                continue
+            if name:
+                dirty[(path, name)] = None
+                if path != self.root:
+                    # The directory's own mtime/nlink changed too; its entry lives in the parent listing
+                    dirty[os.path.split(path)] = None
+        if full_rescan:
+            self.overflows += 1
+            self.logger.warning(f"Change queue overflowed for {self.root}; rescanning")
+            _, removed = self.index.rescan(on_dir=self._watch)
+            self._unwatch(removed)
+            return
+        for parent, name in dirty:
+            created, removed = self.index.refresh(parent, name)
+            self._unwatch(removed)
+            for path in created:
+                _, gone = self.index.rescan(path, on_dir=self._watch)
+                self._unwatch(gone)
+
+    def _poll(self):
+        if self._inotify is None:
+            self.index.rescan()
+        else:
+            for path in sorted(self._unwatched):
+                # Retry the watch first; the subtree stays polled only if the limit is still exhausted
+                self._unwatched.discard(path)
+                _, removed = self.index.rescan(path, on_dir=self._watch)
+                self._unwatch(removed)
+        self._last_poll = time.monotonic()
+
+    def sync(self):
+        """
+        Apply every change already queued by the kernel before returning.
+        """
+        if self._inotify is None:
+            return
+        with self._apply_lock:
+            if self._inotify is not None:
+                self._apply(self._inotify.read_events())
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                if self._inotify is not None:
+                    # Wait outside the lock, but dequeue and apply under it so sync() sees whole batches
+                    ready = self._inotify.wait(min(1.0, self.poll_interval))
+                    with self._apply_lock:
+                        if self._inotify is None:
+                            break
+                        if ready:
+                            self._apply(self._inotify.read_events())
+                        if self._unwatched and time.monotonic() - self._last_poll >= self.poll_interval:
+                            self._poll()
+                elif self._stop.wait(self.poll_interval):
+                    break
+                else:
+                    with self._apply_lock:
+                        self._poll()
+            except OSError as exc:
+                if self._stop.is_set():
+                    break
+                self.logger.warning(f"Watcher error on {self.root}: {exc}")
+                time.sleep(self.poll_interval)
+            except Exception:
+                self.logger.exception(f"Watcher for {self.root} failed")
+                time.sleep(self.poll_interval)
+
+    # Hot index interface (utils.file_helpers.register_hot_index)
+
+    def _polled_under(self, root):
+        """
+        Unwatched (polled) subtrees overlapping `root`; their index content may be stale.
+        """
+        target = _norm(root)
+        return [path for path in list(self._unwatched)
+                if _within(_norm(path), target) or _within(target, _norm(path))]
+
+    def covers(self, root, exclude=None):
+        return (self.running and self._inotify is not None and self.index.covers(root, exclude)
+                and not self._polled_under(root))
+
+    def iter_entries(self, root, excludes, max_depth, include_dirs, sort):
+        self.sync()
+        with self._apply_lock:
+            # A subtree may have lost its watch since covers(): rescan it now rather than answer stale
+            for path in self._polled_under(root):
+                _, removed = self.index.rescan(path)
+                self._unwatch(removed)
+        return self.index.iter_entries(root, excludes, max_depth, include_dirs, sort)
+
+    # Reporting
+
+    def changes(self, since=0, limit=None):
+        self.sync()
+        return self.index.changes(since, limit)
+
+    def status(self):
+        return {
+            "root": self.root,
+            "backend": self.backend,
+            "running": self.running,
+            "started_at": self.started_at,
+            "entries": len(self.index),
+            "directories": self.index.directories,
+            "watches": len(self._dir_wds),
+            "unwatched": sorted(self._unwatched),
+            "watch_limit_hits": self.watch_limit_hits,
+            "overflows": self.overflows,
+            "events": self.events,
+            "rescans": self.index.rescans,
+            "seq": self.index.seq,
+            "poll_interval": self.poll_interval,
+        }
+
+
+_WATCHERS: dict[str, FsWatcher] = {}
+_WATCHERS_LOCK = threading.Lock()
+
+
+def start_watch(root, exclude=None, backend="auto", poll_interval=DEFAULT_POLL_INTERVAL):
+    """
+    Start (or return the already running) watcher for `root`.
+    """
+    key = _norm(root)
+    with _WATCHERS_LOCK:
+        watcher = _WATCHERS.get(key)
+        if watcher is not None and watcher.running:
+            return watcher
+        watcher = FsWatcher(root, exclude=exclude, backend=backend, poll_interval=poll_interval).start()
+        _WATCHERS[key] = watcher
+        return watcher
+
+
+def stop_watch(root):
+    with _WATCHERS_LOCK:
+        watcher = _WATCHERS.pop(_norm(root), None)
+    if watcher is None:
+        return False
+    watcher.stop()
+    return True
+
+
+def get_watcher(root):
+    with _WATCHERS_LOCK:
+        return _WATCHERS.get(_norm(root))
+
+
+def watchers():
+    with _WATCHERS_LOCK:
+        return list(_WATCHERS.values())
@@ -0,0 +1,161 @@
+"""
+Persistent content-hash cache.
+
+Responsibilities:
+- Remember file digests across runs in a small SQLite database (config/hash_cache.sqlite3).
+- Key entries on (path, algorithm) and validate them against (device, inode, size, mtime_ns);
+  `st` may be an os.stat_result or a utils.file_helpers.FileEntry:
+    - lookup(path, st, algorithm) -> str|None
+    - store(path, st, algorithm, digest)
+    - evict_missing(root=None) -> int
+- Count hits, misses and evictions so features can report them.
+
+Dependencies:
+- External: sqlite3, os, threading, time
+- Internal: utils.constants, utils.logger
+
+Notes:
+- A lookup whose stat no longer matches evicts the stale row immediately.
+- Files modified within the last couple of seconds are not cached, because a later write in the
+  same mtime tick would be invisible to the (size, mtime_ns) check.
+- Writes are committed in batches; call flush()/close() when a run finishes.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from utils.constants import Constants
+from utils.logger import get_logger
+
+# Files younger than this (ns) are hashed but not cached
+_RACY_WINDOW_NS = 2_000_000_000
+_COMMIT_EVERY = 500
+
+
+def _stat_key(st):
+    if hasattr(st, "stat_key"):
+        return st.stat_key()
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class HashCache:
+    def __init__(self, path=None):
+        self.logger = get_logger(__name__)
+        self.path = path or Constants.HASH_CACHE
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._pending = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS hashes ("
+                " path TEXT NOT NULL,"
+                " algorithm TEXT NOT NULL,"
+                " device INTEGER NOT NULL,"
+                " inode INTEGER NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " mtime_ns INTEGER NOT NULL,"
+                " digest TEXT NOT NULL,"
+                " PRIMARY KEY (path, algorithm))"
+            )
+            self._conn = conn
+        return self._conn
+
+    def lookup(self, path, st, algorithm):
+        """
+        Return the cached digest for `path` if its stat still matches, else None.
+        """
+        key = os.path.abspath(path)
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT device, inode, size, mtime_ns, digest FROM hashes WHERE path = ? AND algorithm = ?",
+                (key, algorithm),
+            ).fetchone()
+            if row is not None:
+                device, inode, size, mtime_ns = _stat_key(st)
+                # Windows scandir stats report inode/device as 0; compare them only when both sides have them
+                same_file = not (inode and row[1]) or row[:2] == (device, inode)
+                if same_file and row[2:4] == (size, mtime_ns):
+                    self.hits += 1
+                    return row[4]
+                conn.execute("DELETE FROM hashes WHERE path = ? AND algorithm = ?", (key, algorithm))
+                self.evicted += 1
+                self._note_write()
+            self.misses += 1
+            return None
+
+    def store(self, path, st, algorithm, digest):
+        """
+        Cache `digest` for `path` as of stat result `st`.
+        """
+        device, inode, size, mtime_ns = _stat_key(st)
+        if time.time_ns() - mtime_ns < _RACY_WINDOW_NS:
+            return
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO hashes (path, algorithm, device, inode, size, mtime_ns, digest)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (os.path.abspath(path), algorithm, device, inode, size, mtime_ns, digest),
+            )
+            self._note_write()
+
+    def evict_missing(self, root=None):
+        """
+        Remove entries whose files no longer exist, optionally limited to paths under `root`.
+        """
+        with self._lock:
+            conn = self._connect()
+            if root:
+                prefix = os.path.join(os.path.abspath(root), "")
+                rows = conn.execute(
+                    "SELECT DISTINCT path FROM hashes WHERE substr(path, 1, ?) = ?", (len(prefix), prefix)
+                ).fetchall()
+            else:
+                rows = conn.execute("SELECT DISTINCT path FROM hashes").fetchall()
+            gone = [(p,) for (p,) in rows if not os.path.exists(p)]
+            conn.executemany("DELETE FROM hashes WHERE path = ?", gone)
+            conn.commit()
+            self._pending = 0
+            self.evicted += len(gone)
+            return len(gone)
+
+    def stats(self):
+        """
+        Return hit/miss/eviction counters for this instance.
+        """
+        return {"hits": self.hits, "misses": self.misses, "evicted": self.evicted}
+
+    def flush(self):
+        """
+        Commit pending writes.
+        """
+        with self._lock:
+            if self._conn is not None and self._pending:
+                self._conn.commit()
+                self._pending = 0
+
+    def close(self):
+        """
+        Commit pending writes and close the database.
+        """
+        self.flush()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _note_write(self):
+        self._pending += 1
+        if self._pending >= _COMMIT_EVERY:
+            self._conn.commit()
+            self._pending = 0
@@ -0,0 +1,217 @@
+"""
+Streaming checksum manifests.
+
+Responsibilities:
+- Write and read sorted, line-oriented manifests (JSONL) so generating or verifying never holds the
+  whole tree in memory:
+    - line 1, header: {"format": "utility-suite-manifest", "version": 1, "algorithm": str, "root": str, "created_at": int}
+    - then one record per file: {"path": "dir/name.ext", "size": int, "mtime_ns": int, "hash": str}
+- ManifestWriter(path, algorithm, root=None, merkle=False): context manager; write(rel, size, mtime_ns, digest).
+  Records must arrive in path_key() order; the file is written to a temp path and replaced on success.
+  With merkle=True, per-directory digests are built on the fly into a <path>.tree sidecar (utils.merkle)
+  and the root digest is available as `root_hash` after the block.
+- open_manifest(path) -> ManifestReader: `.header`, `.algorithm`, `.legacy`; iterating yields
+  ManifestRecord tuples in path_key() order.
+- path_key(rel) orders paths the way FileHelpers.scan_entries(sort=True) walks (a directory's files by
+  name, then its subdirectories by name, depth first), so merge_walk() can pair a manifest with a live
+  walk in a single pass.
+
+Notes:
+- Paths are stored relative to the manifest root with "/" separators.
+- Legacy manifests (one JSON object {rel_path: digest}, e.g. checksums.json) are still readable; they are
+  loaded whole and sorted, and their records have size/mtime_ns set to None.
+
+Dependencies:
+- External: json, os, time, typing
+- Internal: utils.merkle
+"""
+
+import json
+import os
+import time
+from typing import NamedTuple
+from utils.merkle import TREE_SUFFIX, MerkleBuilder
+
+MANIFEST_FORMAT = "utility-suite-manifest"
+MANIFEST_VERSION = 1
+MANIFEST_NAME = "checksums.jsonl"
+LEGACY_MANIFEST_NAME = "checksums.json"
+
+
+class ManifestRecord(NamedTuple):
+    path: str
+    size: int | None
+    mtime_ns: int | None
+    hash: str
+
+
+def path_key(rel):
+    """
+    Sort key for a "/"-separated relative path matching scan_entries(sort=True) order.
+    """
+    parts = rel.split("/")
+    return tuple((1, part) for part in parts[:-1]) + ((0, parts[-1]),)
+
+
+def to_rel(path, root):
+    """
+    Manifest-style relative path ("/" separators) of `path` under `root`.
+    """
+    return os.path.relpath(path, start=root).replace(os.sep, "/")
+
+
+class ManifestWriter:
+    def __init__(self, path, algorithm, root=None, merkle=False):
+        self.path = path
+        self.temp_path = f"{path}.tmp"
+        self.algorithm = algorithm
+        self.root = root
+        self.merkle = merkle
+        self.count = 0
+        self.root_hash = None
+        self._last_key = None
+        self._offset = 0
+        self._tree = None
+        self._f = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._f = open(self.temp_path, "wb")
+        header = {"format": MANIFEST_FORMAT, "version": MANIFEST_VERSION, "algorithm": self.algorithm,
+                  "root": self.root, "created_at": int(time.time())}
+        self._write_line(json.dumps(header, separators=(",", ":")))
+        if self.merkle:
+            self._tree = MerkleBuilder(self.path + TREE_SUFFIX, self.algorithm, os.path.basename(self.path))
+        return self
+
+    def _write_line(self, text):
+        data = (text + "\n").encode("utf-8")
+        self._f.write(data)
+        self._offset += len(data)
+        return len(data)
+
+    def write(self, rel, size, mtime_ns, digest):
+        key = path_key(rel)
+        if self._last_key is not None and key <= self._last_key:
+            raise ValueError(f"Manifest records out of order at {rel}")
+        self._last_key = key
+        record = {"path": rel, "size": size, "mtime_ns": mtime_ns, "hash": digest}
+        offset = self._offset
+        length = self._write_line(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+        if self._tree is not None:
+            self._tree.add(rel, size, digest, offset, length)
+        self.count += 1
+
+    def __exit__(self, exc_type, exc, tb):
+        self._f.close()
+        if exc_type is None:
+            if self._tree is not None:
+                self.root_hash = self._tree.finish()
+                self._tree.commit()
+            elif os.path.exists(self.path + TREE_SUFFIX):
+                # A flat manifest replaces the old one; its tree no longer matches
+                os.remove(self.path + TREE_SUFFIX)
+            os.replace(self.temp_path, self.path)
+        else:
+            if self._tree is not None:
+                self._tree.abort()
+            try:
+                os.remove(self.temp_path)
+            except OSError:
+                pass
+        return False
+
+
+class ManifestReader:
+    def __init__(self, path):
+        self.path = path
+        self.header = {}
+        self.legacy = False
+        self._legacy_items = None
+        self._f = open(path, "r", encoding="utf-8")
+        first = self._f.readline()
+        try:
+            head = json.loads(first)
+        except ValueError:
+            head = None
+        if isinstance(head, dict) and head.get("format") == MANIFEST_FORMAT:
+            if int(head.get("version", 0)) > MANIFEST_VERSION:
+                self._f.close()
+                raise ValueError(f"Unsupported manifest version: {head.get('version')}")
+            self.header = head
+            return
+        # Legacy single-object manifest
+        self._f.seek(0)
+        try:
+            data = json.load(self._f)
+        finally:
+            self._f.close()
+        if not isinstance(data, dict):
+            raise ValueError(f"Unrecognised manifest format: {path}")
+        self.legacy = True
+        self._legacy_items = sorted(((rel.replace(os.sep, "/"), digest) for rel, digest in data.items()),
+                                    key=lambda item: path_key(item[0]))
+
+    @property
+    def algorithm(self):
+        return self.header.get("algorithm")
+
+    def __iter__(self):
+        if self.legacy:
+            for rel, digest in self._legacy_items:
+                yield ManifestRecord(rel, None, None, digest)
+            return
+        for line in self._f:
+            if not line.strip():
+                continue
+            obj = json.loads(line)
+            yield ManifestRecord(obj["path"], obj.get("size"), obj.get("mtime_ns"), obj["hash"])
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def open_manifest(path):
+    return ManifestReader(path)
+
+
+def merge_walk(records, entries, root):
+    """
+    Pair manifest records with FileEntry objects from scan_entries(root, sort=True) in one pass.
+    Yields (rel, record|None, entry|None): record None = untracked file, entry None = missing file.
+    """
+    records, entries = iter(records), iter(entries)
+    prefix = len(os.fspath(root).rstrip("/\\")) + 1
+
+    def _next_record():
+        rec = next(records, None)
+        return (rec, path_key(rec.path)) if rec is not None else (None, None)
+
+    def _next_entry():
+        entry = next(entries, None)
+        if entry is None:
+            return None, None, None
+        rel = entry.path[prefix:].replace(os.sep, "/")
+        return entry, rel, path_key(rel)
+
+    rec, rkey = _next_record()
+    entry, rel, ekey = _next_entry()
+    while rec is not None or entry is not None:
+        if entry is None or (rec is not None and rkey < ekey):
+            yield rec.path, rec, None
+            rec, rkey = _next_record()
+        elif rec is None or ekey < rkey:
+            yield rel, None, entry
+            entry, rel, ekey = _next_entry()
+        else:
+            yield rel, rec, entry
+            rec, rkey = _next_record()
+            entry, rel, ekey = _next_entry()
@@ -0,0 +1,228 @@
+"""
+Merkle trees over checksum manifests.
+
+Responsibilities:
+- Build per-directory digests while a sorted manifest is being written, and persist them as a
+  sidecar next to the manifest (<manifest>.tree, JSONL):
+    - line 1, header: {"format": "utility-suite-merkle", "version": 1, "algorithm": str, "manifest": str}
+    - then one record per directory, children before parents:
+      {"path": "a/b", "hash": str, "offset": int|None, "length": int, "files": int, "size": int, "dirs": [names]}
+      where offset/length locate the directory's own file records inside the manifest.
+- MerkleBuilder(path, algorithm, manifest_name): add(rel, size, digest, offset, length) per file
+  record (in manifest order), finish() -> root digest, then commit() or abort().
+- MerkleTree.load(manifest_path): directory table plus random access to one directory's file records.
+- diff_trees(a, b, a_root="", b_root=""): compare two trees (or two subtrees) top-down, skipping any
+  directory whose digest matches, so work is proportional to what changed.
+- dir_digest(algorithm, files, dirs): digest of a directory from its children's (name, digest) pairs.
+
+Notes:
+- A directory digest covers, in manifest order, "F" name digest for each own file, then "D" name digest
+  for each subdirectory. Directories without files anywhere below them are not part of the tree.
+- The directory table is loaded whole (one entry per directory); file records are never loaded whole.
+
+Dependencies:
+- External: json, os, time
+- Internal: utils.file_helpers (new_hasher)
+"""
+
+import json
+import os
+from utils.file_helpers import new_hasher
+
+TREE_FORMAT = "utility-suite-merkle"
+TREE_VERSION = 1
+TREE_SUFFIX = ".tree"
+
+
+def _leaf(kind, name, digest):
+    return kind + name.encode("utf-8") + b"\0" + digest.encode("ascii") + b"\n"
+
+
+def dir_digest(algorithm, files, dirs):
+    """
+    Digest of a directory from its own files' and subdirectories' (name, digest) pairs, each in manifest order.
+    """
+    hasher = new_hasher(algorithm)
+    for name, digest in files:
+        hasher.update(_leaf(b"F", name, digest))
+    for name, digest in dirs:
+        hasher.update(_leaf(b"D", name, digest))
+    return hasher.hexdigest()
+
+
+class _Frame:
+    __slots__ = ("rel", "name", "hasher", "offset", "length", "files", "size", "dirs")
+
+    def __init__(self, rel, name, hasher):
+        self.rel = rel
+        self.name = name
+        self.hasher = hasher
+        self.offset = None
+        self.length = 0
+        self.files = 0
+        self.size = 0
+        self.dirs = []
+
+
+class MerkleBuilder:
+    def __init__(self, path, algorithm, manifest_name):
+        self.path = path
+        self.temp_path = f"{path}.tmp"
+        self.algorithm = algorithm
+        self.directories = 0
+        self.root_hash = None
+        self._f = open(self.temp_path, "w", encoding="utf-8", newline="\n")
+        header = {"format": TREE_FORMAT, "version": TREE_VERSION, "algorithm": algorithm, "manifest": manifest_name}
+        self._f.write(json.dumps(header, separators=(",", ":")) + "\n")
+        self._stack = [_Frame("", "", new_hasher(algorithm))]
+
+    def add(self, rel, size, digest, offset, length):
+        parent, _, name = rel.rpartition("/")
+        self._enter(parent)
+        frame = self._stack[-1]
+        if frame.offset is None:
+            frame.offset = offset
+        frame.length = offset + length - frame.offset
+        frame.files += 1
+        frame.size += size or 0
+        frame.hasher.update(_leaf(b"F", name, digest))
+
+    def _enter(self, rel):
+        # Records arrive in manifest order, so a directory is never revisited once left
+        while self._stack[-1].rel and rel != self._stack[-1].rel and not rel.startswith(self._stack[-1].rel + "/"):
+            self._close()
+        current = self._stack[-1].rel
+        if rel == current:
+            return
+        for part in (rel[len(current) + 1:] if current else rel).split("/"):
+            current = f"{current}/{part}" if current else part
+            self._stack[-1].dirs.append(part)
+            self._stack.append(_Frame(current, part, new_hasher(self.algorithm)))
+
+    def _close(self):
+        frame = self._stack.pop()
+        digest = frame.hasher.hexdigest()
+        record = {"path": frame.rel, "hash": digest, "offset": frame.offset, "length": frame.length,
+                  "files": frame.files, "size": frame.size, "dirs": frame.dirs}
+        self._f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self.directories += 1
+        if self._stack:
+            parent = self._stack[-1]
+            parent.hasher.update(_leaf(b"D", frame.name, digest))
+            parent.size += frame.size
+        return digest
+
+    def finish(self):
+        while len(self._stack) > 1:
+            self._close()
+        self.root_hash = self._close()
+        self._f.close()
+        return self.root_hash
+
+    def commit(self):
+        os.replace(self.temp_path, self.path)
+
+    def abort(self):
+        self._f.close()
+        try:
+            os.remove(self.temp_path)
+        except OSError:
+            pass
+
+
+class MerkleTree:
+    def __init__(self, tree_path):
+        self.path = tree_path
+        self.dirs = {}
+        with open(tree_path, "r", encoding="utf-8") as f:
+            self.header = json.loads(f.readline())
+            if self.header.get("format") != TREE_FORMAT:
+                raise ValueError(f"Not a Merkle tree file: {tree_path}")
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self.dirs[record["path"]] = record
+        self.algorithm = self.header.get("algorithm")
+        self.manifest_path = os.path.join(os.path.dirname(tree_path), self.header["manifest"])
+
+    @classmethod
+    def load(cls, manifest_path):
+        return cls(manifest_path + TREE_SUFFIX)
+
+    @property
+    def root_hash(self):
+        record = self.dirs.get("")
+        return record["hash"] if record else None
+
+    def files(self, rel_dir):
+        """
+        A directory's own file records as dicts (path, size, mtime_ns, hash), read from the manifest span.
+        """
+        record = self.dirs.get(rel_dir)
+        if not record or record["offset"] is None:
+            return []
+        with open(self.manifest_path, "rb") as f:
+            f.seek(record["offset"])
+            data = f.read(record["length"])
+        return [json.loads(line) for line in data.decode("utf-8").splitlines() if line.strip()]
+
+    def walk_files(self, rel_dir):
+        """
+        Every file record under `rel_dir`, in manifest order.
+        """
+        stack = [rel_dir]
+        while stack:
+            current = stack.pop()
+            yield from self.files(current)
+            stack.extend(f"{current}/{name}" if current else name
+                         for name in reversed(self.dirs.get(current, {}).get("dirs", [])))
+
+
+def _strip(rel, root):
+    return rel[len(root) + 1:] if root else rel
+
+
+def _join(root, name):
+    return f"{root}/{name}" if root else name
+
+
+def diff_trees(a, b, a_root="", b_root="", stats=None):
+    """
+    Yield {"path", "issue": "added"|"removed"|"changed", "expected", "actual"} for files that differ
+    between subtree `a_root` of `a` and subtree `b_root` of `b`. Paths are relative to the subtree roots.
+    Identical directories are skipped without reading their file records. `stats` (dict) receives
+    "dirs_compared" and "dirs_skipped" counts.
+    """
+    stats = stats if stats is not None else {}
+    stats.setdefault("dirs_compared", 0)
+    stats.setdefault("dirs_skipped", 0)
+    stack = [""]
+    while stack:
+        rel = stack.pop()
+        ra = a.dirs.get(_join(a_root, rel) if rel else a_root)
+        rb = b.dirs.get(_join(b_root, rel) if rel else b_root)
+        if ra is not None and rb is not None and ra["hash"] == rb["hash"]:
+            stats["dirs_skipped"] += 1
+            continue
+        stats["dirs_compared"] += 1
+        if ra is None or rb is None:
+            tree, root, present, issue = (b, b_root, rb, "added") if ra is None else (a, a_root, ra, "removed")
+            if present is None:
+                continue
+            for record in tree.walk_files(present["path"]):
+                entry = {"path": _strip(record["path"], root), "issue": issue}
+                entry["expected" if issue == "removed" else "actual"] = record["hash"]
+                yield entry
+            continue
+
+        own_a = {_strip(r["path"], a_root): r["hash"] for r in a.files(ra["path"])}
+        own_b = {_strip(r["path"], b_root): r["hash"] for r in b.files(rb["path"])}
+        for path in sorted(own_a.keys() | own_b.keys()):
+            if path not in own_b:
+                yield {"path": path, "issue": "removed", "expected": own_a[path]}
+            elif path not in own_a:
+                yield {"path": path, "issue": "added", "actual": own_b[path]}
+            elif own_a[path] != own_b[path]:
+                yield {"path": path, "issue": "changed", "expected": own_a[path], "actual": own_b[path]}
+        names = sorted(set(ra["dirs"]) | set(rb["dirs"]), reverse=True)
+        stack.extend(_join(rel, name) for name in names)
@@ -0,0 +1,33 @@
+"""
+Progress reporting helper for long-running features.
+
+Responsibilities:
+- Forward incremental progress events from a feature to the caller:
+    - report_progress(ctx, event) -> bool
+- Uses ctx["agent"].report_progress(event) when the caller (agent/UI) provides it; otherwise a no-op,
+  so features can report unconditionally.
+
+Dependencies:
+- Internal: utils.logger
+
+Notes:
+- Events are plain JSON-serializable dicts; include a "feature" key so consumers can route them.
+"""
+
+from utils.logger import get_logger
+
+
+def report_progress(ctx: dict | None, event: dict) -> bool:
+    """
+    Send `event` to the caller's progress sink. Returns True if it was delivered.
+    """
+    agent = ctx.get("agent") if isinstance(ctx, dict) else None
+    sink = getattr(agent, "report_progress", None)
+    if not callable(sink):
+        return False
+    try:
+        sink(event)
+        return True
+    except Exception:
+        get_logger(__name__).exception("Progress sink failed")
+        return False
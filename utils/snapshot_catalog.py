@@ -0,0 +1,202 @@
+"""
+Snapshot catalog.
+
+Responsibilities:
+- Keep one row per completed backup in a small SQLite database so listings never walk backup folders:
+    - SnapshotCatalog(path): opened lazily, WAL mode
+    - add(snapshot) records {"id", "time", "source", "parent", "files", "dirs", "bytes", "new_bytes",
+      "stored_bytes", "kind", "location"} (missing keys are stored as NULL)
+    - query(source=None, since=None, until=None, limit=None) -> list[dict], oldest first; with `limit`
+      the newest `limit` matches
+    - latest(source=None) -> dict|None, get(snapshot_id) -> dict|None, count() -> int
+    - rebuild(snapshots) -> int: replace every row (disaster recovery from the backups themselves)
+- parse_time(value): epoch seconds from a number or an ISO-8601 date/time string.
+- scan_backup_dir(dest) -> list[dict]: catalog rows recovered from the timestamped folders and .zip
+  archives full_backup writes into `dest` (archives via their side index, utils.archive).
+
+Notes:
+- Rows are indexed by time and by (source, time), so range and limit queries read only matching rows.
+- Writers commit per snapshot; a backup that fails before add() leaves no row.
+- Repositories keep their catalog at <repo>/catalog.sqlite3 (utils.backup_repo); full_backup keeps one at
+  <dest>/catalog.sqlite3 for its timestamped copies.
+
+Dependencies:
+- External: datetime, os, re, sqlite3, threading, time
+- Internal: utils.archive, utils.file_helpers, utils.logger
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from utils.archive import load_index
+from utils.file_helpers import FileHelpers
+from utils.logger import get_logger
+
+CATALOG_NAME = "catalog.sqlite3"
+_COLUMNS = ("id", "time", "source", "parent", "files", "dirs", "bytes", "new_bytes", "stored_bytes", "kind",
+            "location")
+
+# "<source name>-YYYYmmdd-HHMMSS" folders and ".zip" archives written by full_backup
+_BACKUP_NAME = re.compile(r"^.+-(\d{8}-\d{6})(\.zip)?$")
+
+
+def parse_time(value):
+    """
+    Epoch seconds for an int/float or an ISO-8601 string ("2026-03-01", "2026-03-01T12:00"); None passes through.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(str(value)).timestamp()
+
+
+class SnapshotCatalog:
+    def __init__(self, path):
+        self.logger = get_logger(__name__)
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @property
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS snapshots ("
+                " id TEXT PRIMARY KEY,"
+                " time REAL NOT NULL,"
+                " source TEXT,"
+                " parent TEXT,"
+                " files INTEGER,"
+                " dirs INTEGER,"
+                " bytes INTEGER,"
+                " new_bytes INTEGER,"
+                " stored_bytes INTEGER,"
+                " kind TEXT,"
+                " location TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS snapshots_time ON snapshots (time, id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS snapshots_source_time ON snapshots (source, time, id)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _row(snapshot):
+        return tuple(snapshot.get(column) for column in _COLUMNS)
+
+    def add(self, snapshot):
+        with self._lock:
+            conn = self._connect()
+            conn.execute(f"INSERT OR REPLACE INTO snapshots ({', '.join(_COLUMNS)})"
+                         f" VALUES ({', '.join('?' * len(_COLUMNS))})", self._row(snapshot))
+            conn.commit()
+
+    def rebuild(self, snapshots):
+        """
+        Replace the catalog contents with `snapshots` in one transaction; returns the row count.
+        """
+        rows = [self._row(s) for s in snapshots]
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM snapshots")
+                conn.executemany(f"INSERT OR REPLACE INTO snapshots ({', '.join(_COLUMNS)})"
+                                 f" VALUES ({', '.join('?' * len(_COLUMNS))})", rows)
+        return len(rows)
+
+    def query(self, source=None, since=None, until=None, limit=None):
+        where, params = [], []
+        if source is not None:
+            where.append("source = ?")
+            params.append(source)
+        if since is not None:
+            where.append("time >= ?")
+            params.append(parse_time(since))
+        if until is not None:
+            where.append("time <= ?")
+            params.append(parse_time(until))
+        sql = f"SELECT {', '.join(_COLUMNS)} FROM snapshots"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        # Newest first so LIMIT keeps the most recent matches, then flip back to oldest first
+        sql += " ORDER BY time DESC, id DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        with self._lock:
+            rows = self._connect().execute(sql, params).fetchall()
+        return [dict(zip(_COLUMNS, row)) for row in reversed(rows)]
+
+    def latest(self, source=None):
+        rows = self.query(source=source, limit=1)
+        return rows[0] if rows else None
+
+    def get(self, snapshot_id):
+        with self._lock:
+            row = self._connect().execute(f"SELECT {', '.join(_COLUMNS)} FROM snapshots WHERE id = ?",
+                                          (snapshot_id,)).fetchone()
+        return dict(zip(_COLUMNS, row)) if row else None
+
+    def count(self):
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def scan_backup_dir(dest):
+    """
+    Catalog rows for every full_backup copy found directly inside `dest` (slow path for rebuilds).
+    """
+    logger = get_logger(__name__)
+    helpers = FileHelpers()
+    rows = []
+    for name in sorted(os.listdir(dest)):
+        match = _BACKUP_NAME.match(name)
+        path = os.path.abspath(os.path.join(dest, name))
+        if not match:
+            continue
+        row = {"id": name, "time": time.mktime(time.strptime(match.group(1), "%Y%m%d-%H%M%S")), "source": None,
+               "parent": None, "location": path}
+        try:
+            if match.group(2) and os.path.isfile(path):
+                with load_index(path) as index:
+                    members = list(index)
+                    row["source"] = index.header.get("source")
+                row.update(kind="archive", files=len(members), bytes=sum(m.size for m in members),
+                           stored_bytes=os.path.getsize(path))
+            elif not match.group(2) and os.path.isdir(path):
+                entries = list(helpers.scan_entries(path))
+                row.update(kind="folder", files=len(entries), bytes=sum(e.size for e in entries))
+            else:
+                continue
+        except (OSError, ValueError) as exc:
+            logger.warning(f"Skipping unreadable backup {path}: {exc}")
+            continue
+        rows.append(row)
+    return rows
@@ -0,0 +1,44 @@
+"""
+Bandwidth throttling for long-running I/O.
+
+Responsibilities:
+- Cap the aggregate byte rate of a job across all of its worker threads:
+    - Throttle(bytes_per_sec, burst_sec=0.5)
+    - consume(nbytes): account for bytes just transferred, sleeping as needed to stay under the rate
+- Shared by FileHelpers (hashing/copy loops call consume() per chunk) so audits and backups can run
+  alongside normal workloads without saturating the disks.
+
+Dependencies:
+- External: threading, time
+
+Notes:
+- A virtual clock advances by nbytes / rate per call and callers sleep until real time catches up.
+  The clock may lag real time by at most `burst_sec`, so idle periods earn a small burst allowance.
+  Sleeping happens outside the lock so other threads keep accounting.
+"""
+
+import threading
+import time
+
+
+class Throttle:
+    def __init__(self, bytes_per_sec, burst_sec=0.5):
+        if bytes_per_sec is None or bytes_per_sec <= 0:
+            raise ValueError("bytes_per_sec must be positive")
+        self.rate = float(bytes_per_sec)
+        self.burst = float(burst_sec)
+        self.waited = 0.0
+        self._clock = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, nbytes):
+        if nbytes <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._clock = max(self._clock, now - self.burst) + nbytes / self.rate
+            delay = self._clock - now
+            if delay > 0:
+                self.waited += delay
+        if delay > 0:
+            time.sleep(delay)